@@ -1,7 +1,23 @@
-import math
 import datetime as dt
+import io
 import streamlit as st
 import json
+import os
+import uuid
+import numpy as np
+
+from uf_metrics import METRICS_ENABLED, NULL_TIMER, MetricsRegistry, registry_from_env
+from uf_model import (
+    DEFAULT_COEFFICIENTS, Coefficients, alert_text, coefficients_from_json, learn_one, load_profiles, plan_one,
+)
+from uf_export import FORMATS, export_sessions
+from uf_live import load_roster
+from uf_store import BackgroundWriter, SessionStore
+from uf_schedule import SHIFTS, TURNOVER_MIN, read_roster, schedule
+from uf_trajectory import optimize_plan
+from uf_uncertainty import INPUT_SD, monte_carlo_plan
+from uf_ward import EDIT_INPUTS, WardBoard
+from uf_whatif import DURATION_GRID, TAU_GRID, sensitivity_surface
 
 # ---------- Page setup ----------
 st.set_page_config(page_title="Individualized UF Helper", page_icon="🩺", layout="wide")
@@ -24,51 +40,179 @@ st.caption(
     "TMP/VP start–end, σύσταση διαλύματος, P_overhydration_risk, υπολειπ. διούρηση (mL/ημ), AS/MR"
 )
 
+# ---------- Session history store (κοινό για όλα τα sessions του server) ----------
+@st.cache_resource
+def get_session_store() -> SessionStore:
+    return SessionStore()
+
+
+@st.cache_resource
+def get_session_writer() -> BackgroundWriter:
+    return BackgroundWriter(get_session_store())
+
+
+# ---------- Memoized model (ίδια inputs → χωρίς επανυπολογισμό) ----------
+# Κοινό cache για όλους τους χρήστες του server, με όριο εγγραφών (LRU eviction).
+@st.cache_data(max_entries=512, show_spinner=False)
+def cached_plan(inputs: tuple, coef: Coefficients) -> dict:
+    return plan_one(dict(inputs), coef)
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def cached_learn(plan_key: tuple, actuals: tuple, coef: Coefficients) -> dict:
+    return learn_one({**dict(plan_key), **dict(actuals)}, coef, cached_plan(plan_key, coef))
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_surface(plan_key: tuple, coef: Coefficients) -> dict:
+    inputs = dict(plan_key)
+    return sensitivity_surface(
+        inputs, coef,
+        tau=np.union1d(TAU_GRID, [coef.tau_default]),
+        duration_min=np.union1d(DURATION_GRID, [inputs["duration_min"]]),
+    )
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_trajectory(plan_key: tuple, coef: Coefficients, gap_days: float, carry_L: float) -> dict:
+    return optimize_plan(dict(plan_key), coef, gap_days=gap_days, carry_L=carry_L)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_schedule(roster_csv: bytes, chairs: int, turnover: float, current: tuple) -> dict:
+    # current = (patient_id, duration_min, extra_minutes) από Plan/Learning: αντικαθιστά τις γραμμές του ασθενή
+    sessions = read_roster(io.StringIO(roster_csv.decode("utf-8"), newline=""))
+    for sess in sessions:
+        if sess["patient_id"] == current[0]:
+            sess.update(duration_min=current[1], extra_minutes=current[2])
+    return schedule(sessions, chairs, SHIFTS, turnover)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_bands(plan_key: tuple, coef: Coefficients, models: dict, input_sd: tuple, n: int, seed: int) -> dict:
+    return monte_carlo_plan(dict(plan_key), coef, n, seed, models, dict(input_sd))
+
+
+# Sections σε fragment: ένα widget μέσα τους ξανατρέχει μόνο το fragment, όχι όλο το app.
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+# ---------- Unit profiles (κοινά για όλα τα sessions, reload όταν αλλάζει το mtime) ----------
+PROFILES_PATH = os.environ.get("UF_PROFILES_PATH", "uf_profiles.json")
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _load_profiles(path: str, mtime_ns: int) -> dict:
+    return load_profiles(path)
+
+
+def get_profiles() -> dict:
+    """{name: Coefficients} από το PROFILES_PATH· {} αν δεν υπάρχει αρχείο."""
+    try:
+        mtime_ns = os.stat(PROFILES_PATH).st_mtime_ns
+    except OSError:
+        return {}
+    return _load_profiles(PROFILES_PATH, mtime_ns)
+
+
+# ---------- Stage timing (opt-in με UF_METRICS=1, βλ. uf_metrics) ----------
+@st.cache_resource
+def get_metrics() -> MetricsRegistry:
+    return registry_from_env()
+
+
+def stage_timer():
+    """Lap timer για τα stages αυτού του rerun· NULL_TIMER (no-op) όταν τα metrics είναι off."""
+    if not METRICS_ENABLED:
+        return NULL_TIMER
+    return get_metrics().timer(st.session_state.setdefault("uf_metrics_session", uuid.uuid4().hex[:8]))
+
+
+HISTORY_COLUMNS = [
+    "session_dt", "weight", "idwg", "duration_min", "r_max_dyn", "UF_recommended_L",
+    "P_overhydration_risk", "UF_actual_total", "outcome_last", "gamma0_offset_updated",
+]
+
+timer = stage_timer()
+
 # ---------- Sidebar: coefficients & thresholds ----------
 with st.sidebar:
+    # Προφίλ μονάδας: αλλάζει όλους τους συντελεστές μαζί (αρχικές τιμές των widgets)
+    base = DEFAULT_COEFFICIENTS
+    coef_models = {}  # covariance των fitted μοντέλων (έξοδος uf_fit) για το Monte Carlo
+    profile = "(defaults)"
+    try:
+        profiles = get_profiles()
+    except (ValueError, TypeError) as e:
+        profiles = {}
+        st.error(f"Μη έγκυρο αρχείο προφίλ ({PROFILES_PATH}): {e}")
+    if profiles:
+        profile = st.selectbox("Προφίλ μονάδας", ["(defaults)"] + sorted(profiles))
+        if profile in profiles:
+            base = profiles[profile]["coefficients"]
+            coef_models = profiles[profile]["models"]
+
+    # Προαιρετικά: συντελεστές από αρχείο (π.χ. έξοδος του uf_fit.py) πάνω από το προφίλ
+    coef_file = st.file_uploader("Συντελεστές από αρχείο (JSON)", type="json", help="flat {πεδίο: τιμή} ή έξοδος του uf_fit.py")
+    if coef_file is not None:
+        try:
+            coef_json = json.load(coef_file)
+            base = coefficients_from_json(coef_json, base)
+            coef_models = coef_json.get("models") or {}
+        except (ValueError, TypeError) as e:
+            st.error(f"Μη έγκυρο αρχείο συντελεστών: {e}")
+
+    # Key ανά προφίλ/αρχείο: μια αλλαγή τους ξαναδημιουργεί όλα τα widgets με τις νέες τιμές
+    # (χωρίς αυτό, ένας συντελεστής ίδιος σε δύο προφίλ θα κρατούσε τη χειροκίνητη αλλαγή)
+    coef_source = f"{profile}|{coef_file.file_id if coef_file is not None else ''}"
+
+    def coef_key(name: str) -> str:
+        return f"coef_{name}@{coef_source}"
+
     st.header("Hypotension model (logistic)")
-    gamma0 = st.number_input("γ0 (intercept)", value=-2.6, step=0.1, format="%.3f")
-    gamma1 = st.number_input("γ1 (per mL/kg/h UF)", value=0.10, step=0.01, format="%.3f")
-    g_meds = st.number_input("γ_meds (antihypertensives <6h)", value=0.25, step=0.01, format="%.3f")
-    g_tmp  = st.number_input("γ_tmp (TMP slope /h)", value=0.10, step=0.01, format="%.3f")
-    g_vp   = st.number_input("γ_vp (VP trend /h)", value=0.08, step=0.01, format="%.3f")
-    g_age  = st.number_input("γ_age (per decade >60)", value=0.12, step=0.01, format="%.3f")
-    g_dm   = st.number_input("γ_dm (DM=1)", value=0.15, step=0.01, format="%.3f")
-    g_press= st.number_input("γ_press (per 10 hPa drop)", value=0.07, step=0.01, format="%.3f")
+    gamma0 = st.number_input("γ0 (intercept)", value=base.gamma0, step=0.1, format="%.3f", key=coef_key("gamma0"))
+    gamma1 = st.number_input("γ1 (per mL/kg/h UF)", value=base.gamma1, step=0.01, format="%.3f", key=coef_key("gamma1"))
+    g_meds = st.number_input("γ_meds (antihypertensives <6h)", value=base.g_meds, step=0.01, format="%.3f", key=coef_key("g_meds"))
+    g_tmp  = st.number_input("γ_tmp (TMP slope /h)", value=base.g_tmp, step=0.01, format="%.3f", key=coef_key("g_tmp"))
+    g_vp   = st.number_input("γ_vp (VP trend /h)", value=base.g_vp, step=0.01, format="%.3f", key=coef_key("g_vp"))
+    g_age  = st.number_input("γ_age (per decade >60)", value=base.g_age, step=0.01, format="%.3f", key=coef_key("g_age"))
+    g_dm   = st.number_input("γ_dm (DM=1)", value=base.g_dm, step=0.01, format="%.3f", key=coef_key("g_dm"))
+    g_press= st.number_input("γ_press (per 10 hPa drop)", value=base.g_press, step=0.01, format="%.3f", key=coef_key("g_press"))
 
     st.divider()
     st.header("Safety bounds & guards")
-    tau_default = st.number_input("Target hypotension risk τ (%)", value=20.0, min_value=1.0, max_value=80.0, step=1.0)
-    rmin = st.number_input("r_min (mL/kg/h)", value=0.5, step=0.1)
-    rmax = st.number_input("r_max (mL/kg/h)", value=13.0, step=0.5)
-    tmp_thr = st.number_input("TMP_slope_threshold (mmHg/h)", value=2.0, step=0.5)
-    vp_thr  = st.number_input("VP_trend_threshold (mmHg/h)", value=1.5, step=0.5)
-    bp_drop_thr = st.number_input("SBP drop threshold (%)", value=20.0, step=1.0)
-    safety_mult = st.number_input("safety_multiplier_if_exceeded", value=0.85, step=0.01, min_value=0.1, max_value=1.0)
-    round_step = st.number_input("Round minutes step", value=5, step=1, min_value=1, max_value=30)
+    tau_default = st.number_input("Target hypotension risk τ (%)", value=base.tau_default, min_value=1.0, max_value=80.0, step=1.0, key=coef_key("tau_default"))
+    rmin = st.number_input("r_min (mL/kg/h)", value=base.rmin, step=0.1, key=coef_key("rmin"))
+    rmax = st.number_input("r_max (mL/kg/h)", value=base.rmax, step=0.5, key=coef_key("rmax"))
+    tmp_thr = st.number_input("TMP_slope_threshold (mmHg/h)", value=base.tmp_thr, step=0.5, key=coef_key("tmp_thr"))
+    vp_thr  = st.number_input("VP_trend_threshold (mmHg/h)", value=base.vp_thr, step=0.5, key=coef_key("vp_thr"))
+    bp_drop_thr = st.number_input("SBP drop threshold (%)", value=base.bp_drop_thr, step=1.0, key=coef_key("bp_drop_thr"))
+    safety_mult = st.number_input("safety_multiplier_if_exceeded", value=base.safety_mult, step=0.01, min_value=0.1, max_value=1.0, key=coef_key("safety_mult"))
+    round_step = st.number_input("Round minutes step", value=int(base.round_step), step=1, min_value=1, max_value=30, key=coef_key("round_step"))
 
     st.divider()
     st.header("Overhydration model (logistic)")
-    beta0 = st.number_input("β0 (intercept)", value=-2.2, step=0.1, format="%.2f")
-    b_OH  = st.number_input("β_OH per L", value=0.55, step=0.05, format="%.2f")
-    b_dysp= st.number_input("β_dyspnea", value=0.70, step=0.05, format="%.2f")
-    b_edm = st.number_input("β_edema", value=0.35, step=0.05, format="%.2f")
-    b_ef  = st.number_input("β_low EF (<40%)", value=0.40, step=0.05, format="%.2f")
-    b_af  = st.number_input("β_recent AF/arrhythmia", value=0.30, step=0.05, format="%.2f")
-    omega_target = st.number_input("Target overhydration risk ω (%)", value=10.0, min_value=1.0, max_value=50.0, step=1.0)
+    beta0 = st.number_input("β0 (intercept)", value=base.beta0, step=0.1, format="%.2f", key=coef_key("beta0"))
+    b_OH  = st.number_input("β_OH per L", value=base.b_OH, step=0.05, format="%.2f", key=coef_key("b_OH"))
+    b_dysp= st.number_input("β_dyspnea", value=base.b_dysp, step=0.05, format="%.2f", key=coef_key("b_dysp"))
+    b_edm = st.number_input("β_edema", value=base.b_edm, step=0.05, format="%.2f", key=coef_key("b_edm"))
+    b_ef  = st.number_input("β_low EF (<40%)", value=base.b_ef, step=0.05, format="%.2f", key=coef_key("b_ef"))
+    b_af  = st.number_input("β_recent AF/arrhythmia", value=base.b_af, step=0.05, format="%.2f", key=coef_key("b_af"))
+    omega_target = st.number_input("Target overhydration risk ω (%)", value=base.omega_target, min_value=1.0, max_value=50.0, step=1.0, key=coef_key("omega_target"))
 
     st.divider()
     st.subheader("Cardio/renal modifiers (coefficients)")
     # Υπόταση
-    g_as  = st.number_input("γ_AS (severe aortic stenosis)", value=0.40, step=0.05, format="%.2f")
-    g_mr  = st.number_input("γ_MR (severe mitral regurgitation)", value=0.05, step=0.05, format="%.2f")
+    g_as  = st.number_input("γ_AS (severe aortic stenosis)", value=base.g_as, step=0.05, format="%.2f", key=coef_key("g_as"))
+    g_mr  = st.number_input("γ_MR (severe mitral regurgitation)", value=base.g_mr, step=0.05, format="%.2f", key=coef_key("g_mr"))
     # Υπερυδάτωση
-    b_dm_over  = st.number_input("β_DM (overhydration)", value=0.12, step=0.02, format="%.2f")
-    b_mr_over  = st.number_input("β_MR (overhydration)", value=0.25, step=0.02, format="%.2f")
-    b_urine    = st.number_input("β_Urine (per L/day, protective)", value=0.35, step=0.05, format="%.2f")
+    b_dm_over  = st.number_input("β_DM (overhydration)", value=base.b_dm_over, step=0.02, format="%.2f", key=coef_key("b_dm_over"))
+    b_mr_over  = st.number_input("β_MR (overhydration)", value=base.b_mr_over, step=0.02, format="%.2f", key=coef_key("b_mr_over"))
+    b_urine    = st.number_input("β_Urine (per L/day, protective)", value=base.b_urine, step=0.05, format="%.2f", key=coef_key("b_urine"))
+
+timer.lap("sidebar")
 
 # ---------- Tabs ----------
-tab_plan, tab_learn = st.tabs(["🧮 Plan", "📈 Actuals & Learning"])
+tab_plan, tab_learn, tab_ward = st.tabs(["🧮 Plan", "📈 Actuals & Learning", "🏥 Ward"])
 
 with tab_plan:
     st.subheader("Patient & session inputs")
@@ -201,39 +345,40 @@ with cr_cols[3]:
     severe_mr = st.checkbox("Σοβαρή ανεπάρκεια μιτροειδούς (MR)", value=False)
 
 
-    # ---------- Υπολογισμοί Plan ----------
-    def sigmoid(x: float) -> float:
-        return 1.0/(1.0 + math.exp(-x))
+    timer.lap("plan_inputs")
 
-    age_over60_dec = max(0.0, (age - 60.0)/10.0)
-    tau = tau_default
-    logit_tau = math.log((tau/100.0)/(1 - (tau/100.0)))
-
-    # Hypotension model linear terms (με AS/MR)
-    lin_terms = (
-        gamma0
-        + g_meds*meds_recent
-        + g_tmp*tmp_slope
-        + g_vp*vp_trend
-        + g_age*age_over60_dec
-        + g_dm*dm
-        + g_press*dP_atm_10hPa
-        + g_as*(1 if severe_as else 0)
-        + g_mr*(1 if severe_mr else 0)
+    # ---------- Υπολογισμοί Plan (uf_model engine) ----------
+    coef = Coefficients(
+        gamma0=gamma0, gamma1=gamma1, g_meds=g_meds, g_tmp=g_tmp, g_vp=g_vp,
+        g_age=g_age, g_dm=g_dm, g_press=g_press,
+        tau_default=tau_default, rmin=rmin, rmax=rmax, tmp_thr=tmp_thr, vp_thr=vp_thr,
+        bp_drop_thr=bp_drop_thr, safety_mult=safety_mult, round_step=round_step,
+        beta0=beta0, b_OH=b_OH, b_dysp=b_dysp, b_edm=b_edm, b_ef=b_ef, b_af=b_af,
+        omega_target=omega_target,
+        g_as=g_as, g_mr=g_mr, b_dm_over=b_dm_over, b_mr_over=b_mr_over, b_urine=b_urine,
     )
+    plan_inputs = {
+        "age": age, "weight": weight, "duration_min": duration_min,
+        "idwg": idwg, "intake_L": intake_L, "rinseback_L": rinseback_L, "iv_L": iv_L,
+        "meds_recent": meds_recent, "dm": dm, "dP_atm_10hPa": dP_atm_10hPa,
+        "sbp_pre": sbp_pre, "sbp_post": sbp_post,
+        "headache": s_headache, "cramps": s_cramps, "GI": s_gi, "syncope": s_syncope,
+        "ef_percent": ef_percent, "arrhythmia": arrhythmia, "af_recent": af_recent,
+        "tmp_start": tmp_start, "tmp_end": tmp_end, "vp_start": vp_start, "vp_end": vp_end,
+        "OH_L": OH_L, "dyspnea": dyspnea, "edema": edema,
+        "residual_urine_mLd": residual_urine_mLd, "severe_as": severe_as, "severe_mr": severe_mr,
+    }
+    plan_key = tuple(plan_inputs.items())
+    plan = cached_plan(plan_key, coef)
+    tau = tau_default
 
-    r_raw = (logit_tau - lin_terms) / gamma1 if gamma1 != 0 else float("nan")
-    r_bounded = min(max(r_raw, rmin), rmax)
-
-    # Guards
-    guard_hit = (tmp_slope > tmp_thr) or (vp_trend > vp_thr) or (bp_drop_pct >= bp_drop_thr) or (hypo_symptoms_any == 1)
-    guard_mult = safety_mult if guard_hit else 1.0
-    r_max_dyn = r_bounded * guard_mult
-
-    UF_cap_L = r_max_dyn * (duration_min/60.0) * weight / 1000.0
-    UF_needed_L = idwg + intake_L - rinseback_L - iv_L
-    UF_recommended_L = min(UF_cap_L, UF_needed_L)
-    UF_deficit_L = max(0.0, UF_needed_L - UF_recommended_L)
+    r_max_dyn = plan["r_max_dyn"]
+    UF_cap_L = plan["UF_cap_L"]
+    UF_needed_L = plan["UF_needed_L"]
+    UF_recommended_L = plan["UF_recommended_L"]
+    UF_deficit_L = plan["UF_deficit_L"]
+    P_over = plan["P_over"]
+    timer.lap("plan_compute")  # cached_plan → plan_batch: hypotension solve + overhydration risk μαζί
 
 st.markdown("---")
 st.subheader("🧮 Current plan")
@@ -258,47 +403,137 @@ if UF_deficit_L > 0.0:
         st.warning(f"UF_deficit: {UF_deficit_L:.2f} L — εξετάστε παράταση συνεδρίας ή split UF.")
 
     # --- Overhydration risk (logistic) ---
-    x_over = (
-        beta0
-        + b_OH * OH_L
-        + b_dysp * (1 if dyspnea else 0)
-        + b_edm  * (1 if edema else 0)
-        + b_ef   * low_ef
-        + b_af   * arrhythmia_any
-        + b_dm_over * dm
-        + b_mr_over * (1 if severe_mr else 0)
-        - b_urine   * (residual_urine_mLd / 1000.0)  # mL → L
-    )
-    P_over = 1.0 / (1.0 + math.exp(-x_over))
     st.metric("P_overhydration_risk", f"{P_over*100:.1f}%")
     omega = omega_target
 
     # Προτάσεις/Alerts με βάση Overhydration + Deficit
     plan_notes = []
     if P_over*100 > omega and UF_deficit_L > 0 and r_max_dyn > 0:
-        extra_minutes_over = UF_deficit_L * 1000.0 / (r_max_dyn * weight) * 60.0
-        # Στρογγυλοποίηση στο step
-        def round_up_step(x, step):
-            return int(math.ceil(x/step) * step)
-        extra_minutes_over = round_up_step(extra_minutes_over, round_step)
+        extra_minutes_over = int(plan["extra_minutes_over"])  # ήδη στρογγυλοποιημένο στο step
         st.info(f"Πρόταση: +{extra_minutes_over} λεπτά με ίδιο ασφαλές r για κάλυψη overload.")
         plan_notes.append("Υπερυδάτωση ↑ + UF deficit → προτεραιότητα παράτασης αντί αύξησης r.")
     elif UF_deficit_L > 0:
         plan_notes.append("Χωρίς υψηλό overload → παράταση ή split UF, ανά κλινική κρίση.")
 
-    alerts = []
-    if UF_deficit_L > 0.0: alerts.append(f"UF deficit {UF_deficit_L:.2f} L")
-    if tmp_slope > tmp_thr or vp_trend > vp_thr: alerts.append("High TMP/VP")
-    if bp_drop_pct >= bp_drop_thr: alerts.append(f"SBP drop ≥{bp_drop_thr:.0f}%")
-    if hypo_symptoms_any == 1: alerts.append("Συμπτώματα υπότασης")
-    if P_over*100 > omega: alerts.append("P_overhydration πάνω από στόχο")
+    alerts = alert_text(plan["alerts"], UF_deficit_L, coef)
     if alerts:
-        st.error(" | ".join(alerts))
+        st.error(alerts)
     if plan_notes:
         st.caption(" • ".join(plan_notes))
+timer.lap("plan_render")
+
+
+@fragment
+def whatif_section(plan_key: tuple, coef: Coefficients, duration_min: float):
+    """τ × διάρκεια × guards: το πλέγμα υπολογίζεται μία φορά ανά inputs, τα sliders κόβουν slices."""
+    timer = stage_timer()
+    with st.expander("🔀 What-if: τ × διάρκεια × guards"):
+        surface = cached_surface(plan_key, coef)
+        taus = surface["tau"].tolist()
+        w1, w2 = st.columns([3, 1])
+        with w1:
+            tau_sel = st.select_slider(
+                "τ (%)", options=taus, value=coef.tau_default,
+                format_func=lambda t: f"{t:.1f}",
+            )
+        with w2:
+            guards_on = st.toggle("Guards ενεργά", value=True)
+        i = taus.index(tau_sel)
+        g = 0 if guards_on else 1
+        durations = surface["duration_min"]
+        j = int(np.searchsorted(durations, duration_min))
+
+        wc1, wc2, wc3, wc4 = st.columns(4)
+        wc1.metric("r_max (mL/kg/h)", f"{surface['r_max_dyn'][i, j, 0, g]:.2f}")
+        wc2.metric("UF_recommended (L)", f"{surface['UF_recommended_L'][i, j, 0, g]:.2f}")
+        wc3.metric("UF_deficit (L)", f"{surface['UF_deficit_L'][i, j, 0, g]:.2f}")
+        wc4.metric("P_overhydration_risk", f"{surface['P_over'][i, j, 0, g]*100:.1f}%")
+        st.line_chart(
+            {
+                "Διάρκεια (min)": durations,
+                "UF_recommended (L)": surface["UF_recommended_L"][i, :, 0, g],
+                "UF_deficit (L)": surface["UF_deficit_L"][i, :, 0, g],
+            },
+            x="Διάρκεια (min)",
+        )
+    timer.lap("what_if")
+
+
+@fragment
+def uncertainty_section(plan_key: tuple, coef: Coefficients, models: dict):
+    """Percentile bands από Monte Carlo δείγματα συντελεστών (covariance του uf_fit) και inputs."""
+    timer = stage_timer()
+    with st.expander("🎲 Αβεβαιότητα (Monte Carlo)"):
+        if st.toggle("Υπολογισμός bands", value=False):
+            u1, u2, u3, u4, u5 = st.columns(5)
+            with u1:
+                sd_OH = st.number_input("SD OH_L (L)", value=INPUT_SD["OH_L"], min_value=0.0, step=0.1, format="%.2f")
+            with u2:
+                sd_idwg = st.number_input("SD IDWG (kg)", value=INPUT_SD["idwg"], min_value=0.0, step=0.05, format="%.2f")
+            with u3:
+                sd_press = st.number_input("SD ΔP_atm_10hPa", value=INPUT_SD["dP_atm_10hPa"], min_value=0.0, step=0.1, format="%.2f")
+            with u4:
+                n_draws = st.selectbox("Δείγματα", [10_000, 100_000], index=1)
+            with u5:
+                seed = st.number_input("Seed", value=0, min_value=0, step=1)
+
+            input_sd = (("OH_L", sd_OH), ("idwg", sd_idwg), ("dP_atm_10hPa", sd_press))
+            bands = cached_bands(plan_key, coef, models, input_sd, int(n_draws), int(seed))
+            labels = [f"P{q:g}" for q in bands["percentiles"]]
+            st.dataframe([
+                {"": "r_max (mL/kg/h)", **{l: f"{v:.2f}" for l, v in zip(labels, bands["r_max_dyn"])}},
+                {"": "UF_recommended (L)", **{l: f"{v:.2f}" for l, v in zip(labels, bands["UF_recommended_L"])}},
+                {"": "P_overhydration_risk", **{l: f"{v*100:.1f}%" for l, v in zip(labels, bands["P_over"])}},
+            ], use_container_width=True, hide_index=True)
+            if not models:
+                st.caption("Μόνο αβεβαιότητα inputs — φορτώστε έξοδο του uf_fit.py για covariance των συντελεστών.")
+    timer.lap("uncertainty")
+
+
+@fragment
+def trajectory_section(plan_key: tuple, coef: Coefficients):
+    """Ρυθμός + διάρκεια που σέβονται μαζί τ και ω, με προσομοίωση της επόμενης εβδομάδας."""
+    timer = stage_timer()
+    with st.expander("📅 Joint τ/ω plan & εβδομάδα"):
+        t1, t2 = st.columns(2)
+        with t1:
+            gap_days = st.number_input("Κενό πριν από αυτή τη συνεδρία (ημέρες)", value=2.0, min_value=1.0,
+                                       max_value=4.0, step=1.0, help="το IDWG αντιστοιχεί σε αυτό το κενό")
+        with t2:
+            carry_L = st.number_input("UF_deficit προηγούμενης (L)", value=0.0, min_value=0.0, step=0.1,
+                                      format="%.2f")
+        sim = cached_trajectory(plan_key, coef, float(gap_days), float(carry_L))
+        best = sim["best"]
+        j1, j2, j3, j4 = st.columns(4)
+        j1.metric("Πρόγραμμα", best["pattern"])
+        j2.metric("Διάρκεια (min)", f"{best['duration_min']:.0f}")
+        j3.metric("Ρυθμός (mL/kg/h)", f"{best['rate']:.2f}", help=f"r_max για τ: {best['r_max_dyn']:.2f}")
+        j4.metric("Max P_overhydration (εβδ.)", f"{best['max_P_over']*100:.1f}%")
+        if not best["feasible"]:
+            st.warning(f"Κανένα υποψήφιο πρόγραμμα δεν κρατά το P_overhydration ≤ ω ({coef.omega_target:.0f}%) "
+                       "με r ≤ r_max· εμφανίζεται αυτό με το μικρότερο μέγιστο ρίσκο.")
+        p, d = sim["best_index"]
+        n = best["n_sessions"]
+        st.line_chart({
+            "Συνεδρία": np.arange(1, n + 1),
+            "Περίσσεια πριν (L)": sim["E_pre"][p, d, :n],
+            "UF (L)": sim["UF_L"][p, d, :n],
+            "P_overhydration επόμενης (%)": sim["P_next_over"][p, d, :n] * 100,
+        }, x="Συνεδρία")
+    timer.lap("trajectory")
 
-with tab_learn:
-    st.subheader("Actuals & learning (post-session)")
+with tab_plan:
+    whatif_section(plan_key, coef, duration_min)
+    uncertainty_section(plan_key, coef, coef_models)
+    trajectory_section(plan_key, coef)
+timer.restart()  # τα fragments μετράνε μόνα τους
+
+
+@fragment
+def learning_section(session: dict, plan_key: tuple, coef: Coefficients, duration_min: int):
+    """Actuals → learning/next session + export· `session` = τα πεδία του Plan tab στο snapshot."""
+    timer = stage_timer()
+    patient_id = session["patient_id"]
 
     # Είσοδοι μετά τη συνεδρία
     cA, cB, cC, cD = st.columns(4)
@@ -309,76 +544,30 @@ with tab_learn:
     with cC:
         outcome_last = st.selectbox("Outcome_last (0=OK,1=hypotension)", [0,1], index=0)
     with cD:
-        gamma0_offset_current = st.number_input("γ0_offset_current", value=0.0, step=0.1, format="%.2f")
-
-    # Υπολογισμοί learning
-    UF_actual_net = None
-    if UF_actual_total > 0:
-        UF_actual_net = UF_actual_total - rinseback_L - iv_L - intake_L
-
-    r_used_last = None
-    if (UF_actual_net is not None) and duration_actual_min > 0 and weight > 0:
-        r_used_last = UF_actual_net * 1000.0 * 60.0 / (weight * duration_actual_min)
-
-    # Εκτίμηση p_old_last για το r_used_last
-    p_old_last = None
-    if r_used_last is not None:
-        lin_old = (
-            gamma0
-            + gamma1 * r_used_last
-            + g_meds*meds_recent + g_tmp*tmp_slope + g_vp*vp_trend
-            + g_age*max(0.0, (age - 60.0)/10.0) + g_dm*dm + g_press*dP_atm_10hPa
-            + g_as*(1 if severe_as else 0) + g_mr*(1 if severe_mr else 0)
-            + gamma0_offset_current
+        # Αρχική τιμή από το αποθηκευμένο learning state του ασθενή (αν υπάρχει)
+        learning_state = get_session_store().learning_state(patient_id)
+        gamma0_offset_current = st.number_input(
+            "γ0_offset_current",
+            value=float(learning_state["gamma0_offset"]) if learning_state else 0.0,
+            step=0.1, format="%.2f",
+            help=(f"Από {learning_state['n_sessions']} συνεδρίες, τελευταία {learning_state['last_session_dt']}"
+                  if learning_state else None),
         )
-        p_old_last = 1.0 / (1.0 + math.exp(-lin_old))
-
-    # Στόχος πιθανοτήτων για το learning
-    tau = tau_default
-    p_target = (tau/200.0) if outcome_last == 0 else min(0.8, 2*(tau/100.0))
-
-    # Διόρθωση στο logit
-    delta_logit = None
-    if (p_old_last is not None) and (0 < p_old_last < 1):
-        delta_logit = math.log(p_target/(1-p_target)) - math.log(p_old_last/(1-p_old_last))
 
     alpha = st.number_input("α (learning rate)", value=0.2, step=0.05, min_value=0.0, max_value=1.0)
-    gamma0_offset_updated = gamma0_offset_current
-    if delta_logit is not None:
-        gamma0_offset_updated = gamma0_offset_current + alpha * delta_logit
-
-    # Next session planning (+15% cap από βάση)
-    logit_tau = math.log((tau/100.0)/(1 - (tau/100.0)))
-    lin_terms_base = (
-        gamma0 + g_meds*meds_recent + g_tmp*tmp_slope + g_vp*vp_trend
-        + g_age*max(0.0,(age-60.0)/10.0) + g_dm*dm + g_press*dP_atm_10hPa
-        + g_as*(1 if severe_as else 0) + g_mr*(1 if severe_mr else 0)
-    )
-    r_bounded_base = min(max((logit_tau - lin_terms_base) / gamma1 if gamma1!=0 else float('nan'), rmin), rmax)
-
-    lin_terms_next = lin_terms_base + gamma0_offset_updated
-    r_next_raw = (logit_tau - lin_terms_next) / gamma1 if gamma1 != 0 else float("nan")
-    r_next_bounded = min(max(r_next_raw, rmin), rmax)
-    r_next_capped = min(r_next_bounded, 1.15 * r_bounded_base)
-
-    guard_hit_next = (tmp_slope > tmp_thr) or (vp_trend > vp_thr) or (bp_drop_pct >= bp_drop_thr) or (hypo_symptoms_any == 1)
-    r_next_dyn = (safety_mult if guard_hit_next else 1.0) * r_next_capped
-
-    UF_cap_next_L = r_next_dyn * (duration_actual_min/60.0) * weight / 1000.0
-
-    # Extra χρόνος αν υπάρχει έλλειμμα στην επόμενη
-    extra_minutes = 0.0
-    if r_next_dyn > 0:
-        UF_needed_L_next = idwg + intake_L - rinseback_L - iv_L
-        UF_cap_L_base = r_next_dyn * (duration_actual_min/60.0) * weight / 1000.0
-        UF_deficit_L_next = max(0.0, UF_needed_L_next - UF_cap_L_base)
-        if UF_deficit_L_next > 0:
-            extra_minutes = UF_deficit_L_next * 1000.0 / (r_next_dyn * weight) * 60.0
 
-    def round_up_step(x, step):
-        return int(math.ceil(x/step) * step)
-
-    recommended_total_minutes = round_up_step(duration_actual_min + max(0.0, extra_minutes), round_step)
+    # Υπολογισμοί learning + next session planning (uf_model engine)
+    learn = cached_learn(plan_key, (
+        ("UF_actual_total", UF_actual_total), ("duration_actual_min", duration_actual_min),
+        ("outcome_last", outcome_last), ("gamma0_offset_current", gamma0_offset_current), ("alpha", alpha),
+    ), coef)
+    UF_actual_net = learn["UF_actual_net"]
+    r_used_last = learn["r_used_last"]
+    gamma0_offset_updated = learn["gamma0_offset_updated"]
+    r_next_dyn = learn["r_max_next_dyn"]
+    UF_cap_next_L = learn["UF_cap_next_L"]
+    extra_minutes = learn["extra_minutes"]
+    recommended_total_minutes = int(learn["recommended_total_minutes"])
 
     st.markdown("---")
     cN1, cN2, cN3, cN4 = st.columns(4)
@@ -386,29 +575,20 @@ with tab_learn:
     cN2.metric("UF_cap_next (L)", f"{UF_cap_next_L:.2f}")
     cN3.metric("Extra minutes needed", f"{extra_minutes:.0f} min")
     cN4.metric("Recommended total minutes", f"{recommended_total_minutes} min")
+    # Για το πρόγραμμα εβδομάδας (Ward tab): η παράταση της επόμενης συνεδρίας. Ένα rerun μόνο
+    # αυτού του fragment δεν ξανατρέχει το Ward tab → full rerun αν άλλαξε η παράταση
+    learn_extra_minutes = max(0.0, float(recommended_total_minutes - duration_min))
+    st.session_state["learn_extra_minutes"] = learn_extra_minutes
+    scheduled = st.session_state.get("scheduled_extra_minutes")
+    if scheduled is not None and scheduled != learn_extra_minutes:
+        st.rerun()
+    timer.lap("learning")
 
     # Export snapshot (JSON)
     st.markdown("---")
     if st.button("📤 Export snapshot (JSON)"):
         data = {
-            "session_dt": session_dt, "patient_id": patient_id,
-            "age": age, "weight": weight, "duration_min": duration_min,
-            "idwg": idwg, "intake_L": intake_L, "rinseback_L": rinseback_L, "iv_L": iv_L,
-            "meds_recent": meds_recent, "dm": dm, "dP_atm_10hPa": dP_atm_10hPa,
-            "sbp_pre": sbp_pre, "sbp_post": sbp_post, "bp_drop_pct": bp_drop_pct,
-            "symptoms": {
-                "headache": bool(s_headache), "cramps": bool(s_cramps),
-                "GI": bool(s_gi), "syncope": bool(s_syncope)
-            },
-            "ef_percent": ef_percent, "arrhythmia": bool(arrhythmia), "af_recent": bool(af_recent),
-            "tmp_start": tmp_start, "tmp_end": tmp_end, "tmp_slope": tmp_slope,
-            "vp_start": vp_start, "vp_end": vp_end, "vp_trend": vp_trend,
-            "dialysate": {"Na": dial_Na, "HCO3": dial_HCO3, "cond": dial_cond, "K": dial_K, "Ca": dial_Ca},
-            "OH_L": OH_L, "dyspnea": bool(dyspnea), "edema": bool(edema), "chest_symp": bool(chest_symp),
-            "residual_urine_mLd": residual_urine_mLd,
-            "severe_as": bool(severe_as), "severe_mr": bool(severe_mr),
-            "tau": tau, "r_max_dyn": r_max_dyn, "UF_cap_L": UF_cap_L, "UF_needed_L": UF_needed_L,
-            "UF_recommended_L": UF_recommended_L, "P_overhydration_risk": P_over,
+            **session,
             "UF_actual_total": UF_actual_total, "UF_actual_net": UF_actual_net,
             "duration_actual_min": duration_actual_min, "r_used_last": r_used_last,
             "outcome_last": outcome_last, "alpha": alpha,
@@ -422,6 +602,184 @@ with tab_learn:
             file_name="session.json",
             mime="application/json"
         )
+        get_session_writer().submit(data)
+        st.caption(f"Αποθηκεύτηκε στο ιστορικό ({patient_id}, {session['session_dt']}).")
+    timer.lap("export")
+
+
+@fragment
+def history_section(patient_id: str):
+    # Ιστορικό ασθενή από το τοπικό store
+    timer = stage_timer()
+    with st.expander(f"🗂️ Ιστορικό συνεδριών — {patient_id}"):
+        n_history = st.number_input("Τελευταίες N συνεδρίες", value=10, min_value=1, max_value=500, step=5)
+        history = get_session_store().last_sessions(patient_id, int(n_history))
+        if history:
+            st.dataframe([{k: h.get(k) for k in HISTORY_COLUMNS} for h in history], use_container_width=True)
+        else:
+            st.caption("Δεν υπάρχουν αποθηκευμένες συνεδρίες για αυτόν τον ασθενή.")
+    timer.lap("history")
+
+
+# Το download_button κρατά όλο το αρχείο στη μνήμη → μεγαλύτερες εξαγωγές μόνο από το CLI
+EXPORT_UI_MAX_ROWS = int(os.environ.get("UF_EXPORT_UI_MAX_ROWS", "20000"))
+EXPORT_MIME = {"ndjson": "application/x-ndjson", "ndjson.gz": "application/gzip", "parquet": "application/vnd.apache.parquet"}
+
+
+@fragment
+def bulk_export_section(patient_id: str):
+    # Μαζική εξαγωγή από το store (ασθενής / εύρος ημερομηνιών / όλη η μονάδα)
+    timer = stage_timer()
+    with st.expander("📦 Μαζική εξαγωγή συνεδριών"):
+        scope = st.radio("Εύρος", [f"Ασθενής {patient_id}", "Όλη η μονάδα"], horizontal=True)
+        c1, c2, c3 = st.columns(3)
+        since = c1.date_input("Από", value=None)
+        until = c2.date_input("Έως", value=None)
+        fmt = c3.selectbox("Μορφή", FORMATS)
+        st.caption(f"Έως {EXPORT_UI_MAX_ROWS} συνεδρίες από εδώ· για μεγαλύτερες εξαγωγές "
+                   "`python uf_export.py -o unit.parquet` (streaming, σταθερή μνήμη).")
+        if st.button("Δημιουργία αρχείου"):
+            filters = {
+                "patient_id": None if scope == "Όλη η μονάδα" else patient_id,
+                "since": since.isoformat() if since else None,
+                "until": f"{until.isoformat()} 23:59:59" if until else None,
+            }
+            store = get_session_store()
+            n = store.count(**filters)
+            if n > EXPORT_UI_MAX_ROWS:
+                flags = {"patient_id": "--patient", "since": "--since", "until": "--until"}
+                args = "".join(f" {flags[k]} '{v}'" for k, v in filters.items() if v is not None)
+                st.warning(f"{n} συνεδρίες — πάνω από το όριο των {EXPORT_UI_MAX_ROWS} για εξαγωγή από το UI. "
+                           f"Από το CLI: `python uf_export.py -o sessions.{fmt}{args}`")
+            else:
+                buf = io.BytesIO()
+                n = export_sessions(store, buf, fmt, **filters)
+                st.download_button(
+                    f"Download sessions.{fmt} ({n} συνεδρίες)",
+                    data=buf.getvalue(),
+                    file_name=f"sessions.{fmt}",
+                    mime=EXPORT_MIME[fmt],
+                )
+    timer.lap("bulk_export")
+
+
+with tab_learn:
+    st.subheader("Actuals & learning (post-session)")
+    session = {
+        "session_dt": session_dt, "patient_id": patient_id,
+        "age": age, "weight": weight, "duration_min": duration_min,
+        "idwg": idwg, "intake_L": intake_L, "rinseback_L": rinseback_L, "iv_L": iv_L,
+        "meds_recent": meds_recent, "dm": dm, "dP_atm_10hPa": dP_atm_10hPa,
+        "sbp_pre": sbp_pre, "sbp_post": sbp_post, "bp_drop_pct": bp_drop_pct,
+        "symptoms": {
+            "headache": bool(s_headache), "cramps": bool(s_cramps),
+            "GI": bool(s_gi), "syncope": bool(s_syncope)
+        },
+        "ef_percent": ef_percent, "arrhythmia": bool(arrhythmia), "af_recent": bool(af_recent),
+        "tmp_start": tmp_start, "tmp_end": tmp_end, "tmp_slope": tmp_slope,
+        "vp_start": vp_start, "vp_end": vp_end, "vp_trend": vp_trend,
+        "dialysate": {"Na": dial_Na, "HCO3": dial_HCO3, "cond": dial_cond, "K": dial_K, "Ca": dial_Ca},
+        "OH_L": OH_L, "dyspnea": bool(dyspnea), "edema": bool(edema), "chest_symp": bool(chest_symp),
+        "residual_urine_mLd": residual_urine_mLd,
+        "severe_as": bool(severe_as), "severe_mr": bool(severe_mr),
+        "tau": tau, "r_max_dyn": r_max_dyn, "UF_cap_L": UF_cap_L, "UF_needed_L": UF_needed_L,
+        "UF_recommended_L": UF_recommended_L, "P_overhydration_risk": P_over,
+    }
+    # Full rerun: το Ward tab (παρακάτω) θα πάρει τη νέα παράταση χωρίς επιπλέον rerun
+    st.session_state.pop("scheduled_extra_minutes", None)
+    learning_section(session, plan_key, coef, duration_min)
+    history_section(patient_id)
+    bulk_export_section(patient_id)
+
+
+@fragment
+def ward_section(coef: Coefficients):
+    # Όλη η βάρδια σε ένα πίνακα· ένα edit ξανατρέχει μόνο αυτό το fragment και
+    # το WardBoard ξαναϋπολογίζει μόνο τις chairs που άλλαξαν (όλες μαζί σε νέους συντελεστές)
+    timer = stage_timer()
+    roster_file = st.file_uploader("Roster βάρδιας (CSV με στήλη chair)", type="csv")
+    n_chairs = st.number_input("Chairs (χωρίς roster)", value=20, min_value=1, max_value=500, step=5,
+                               disabled=roster_file is not None)
+    source = roster_file.file_id if roster_file is not None else int(n_chairs)
+    if st.session_state.get("ward_source") != source:
+        try:
+            if roster_file is not None:
+                roster = load_roster(io.StringIO(roster_file.getvalue().decode("utf-8"), newline=""))
+            else:
+                roster = {f"C{i + 1:02d}": {} for i in range(int(n_chairs))}
+        except (ValueError, KeyError, UnicodeDecodeError) as e:
+            st.error(f"Μη έγκυρο roster: {e}")
+            roster = {}
+        board = WardBoard(roster, coef)
+        st.session_state["ward_board"] = board
+        st.session_state["ward_source"] = source
+        # Σταθερά αρχικά δεδομένα του editor: οι αλλαγές του χρήστη εφαρμόζονται από πάνω
+        st.session_state["ward_editor_base"] = {
+            "chair": board.chairs, "patient_id": board.patient_ids,
+            **{k: board.inputs[k].tolist() for k in EDIT_INPUTS},
+        }
+    board = st.session_state["ward_board"]
+    board.set_coefficients(coef)
+
+    st.caption("Inputs ανά chair (τα υπόλοιπα πεδία: roster ή defaults)")
+    edited = st.data_editor(st.session_state["ward_editor_base"], disabled=["chair"],
+                            use_container_width=True, hide_index=True)
+    board.patient_ids = [str(p) if p is not None else "" for p in edited["patient_id"]]
+    board.update_columns({k: edited[k] for k in EDIT_INPUTS})
+
+    table = board.table()
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Chairs", len(board))
+    c2.metric("Με alert", sum(1 for a in table["alerts"] if a))
+    c3.metric("Σύνολο UF deficit (L)", f"{float(np.sum(table['UF_deficit_L'])):.2f}")
+    st.dataframe(table, use_container_width=True, hide_index=True)
+    st.caption(f"Επανυπολογίστηκαν {board.last_recomputed} από {len(board)} chairs σε αυτό το rerun.")
+    timer.lap("ward")
+
+
+@fragment
+def schedule_section(patient_id: str, duration_min: int, extra_minutes: float):
+    # Χωράνε οι παρατάσεις στην εβδομάδα; Ο τρέχων ασθενής παίρνει τα λεπτά του Learning tab.
+    timer = stage_timer()
+    with st.expander("🗓️ Πρόγραμμα εβδομάδας — παρατάσεις ανά chair/βάρδια"):
+        week_file = st.file_uploader("Weekly roster (CSV: patient_id, days, shift, duration_min, extra_minutes)",
+                                     type="csv")
+        c1, c2 = st.columns(2)
+        chairs = c1.number_input("Chairs ανά βάρδια", value=20, min_value=1, max_value=200, step=1)
+        turnover = c2.number_input("Turnover (min)", value=float(TURNOVER_MIN), min_value=0.0, step=5.0)
+        if week_file is None:
+            st.caption("Βάρδιες: " + ", ".join(f"{a // 60:02d}:{a % 60:02d}–{b // 60:02d}:{b % 60:02d}"
+                                              for a, b in SHIFTS))
+        else:
+            try:
+                result = cached_schedule(week_file.getvalue(), int(chairs), float(turnover),
+                                         (patient_id, float(duration_min), float(extra_minutes)))
+            except (ValueError, KeyError, UnicodeDecodeError) as e:
+                st.error(f"Μη έγκυρο πρόγραμμα: {e}")
+            else:
+                m1, m2, m3 = st.columns(3)
+                m1.metric("Συνεδρίες", len(result["rows"]))
+                m2.metric("Unmet extra (min)", f"{result['unmet_min']:.0f}")
+                m3.metric("Overtime (min)", f"{result['overtime_min']:.0f}")
+                st.dataframe(result["rows"], use_container_width=True, hide_index=True)
+    timer.lap("schedule")
+
+
+with tab_ward:
+    st.subheader("Ward — όλες οι chairs της βάρδιας")
+    ward_section(coef)
+    learn_extra_minutes = st.session_state.get("learn_extra_minutes", 0.0)
+    schedule_section(patient_id, duration_min, learn_extra_minutes)
+    st.session_state["scheduled_extra_minutes"] = learn_extra_minutes
+
+# Κρυφό diagnostics panel: ?diag=1 στο URL, μόνο με UF_METRICS=1
+if METRICS_ENABLED and st.query_params.get("diag") == "1":
+    with st.expander("⏱️ Diagnostics — stage timings"):
+        st.caption("Αυτό το session")
+        st.dataframe(get_metrics().session_summary(st.session_state.get("uf_metrics_session", "")),
+                     use_container_width=True, hide_index=True)
+        st.caption("Όλα τα sessions του server")
+        st.dataframe(get_metrics().total_summary(), use_container_width=True, hide_index=True)
 
 st.caption("⚠️ Prototype — validate clinically πριν από συστηματική χρήση • Προσαρμόστε thresholds/συντελεστές ανά μονάδα")
 
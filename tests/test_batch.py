@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+
+import pytest
+
+from uf_batch import plan_chunk, run
+from uf_model import DEFAULT_COEFFICIENTS
+from uf_snapshot import COLUMNS
+
+HEADER = ["patient_id", "weight", "age", "idwg"]
+
+
+def _strict_json(line: str) -> dict:
+    def reject(token):
+        raise ValueError(f"non-standard JSON token {token}")
+    return json.loads(line, parse_constant=reject)
+
+
+def test_zero_weight_row_writes_null_not_inf():
+    rows = [(2, ["P1", "70", "60", "2"]), (3, ["P2", "0", "60", "2"])]
+    text, n, errors = plan_chunk(rows, DEFAULT_COEFFICIENTS, "ndjson", HEADER)
+    assert (n, errors) == (2, [])
+    p1, p2 = (_strict_json(line) for line in text.splitlines())
+    assert p1["recommended_total_minutes"] == 240
+    assert p2["patient_id"] == "P2" and p2["recommended_total_minutes"] is None
+
+    text, n, _ = plan_chunk(rows, DEFAULT_COEFFICIENTS, "csv", HEADER)
+    out = list(csv.reader(io.StringIO(text)))
+    assert n == 2 and all(len(r) == len(COLUMNS) for r in out)
+    assert "inf" not in text.lower()
+
+
+def test_garbage_cell_row_is_skipped_with_its_line():
+    rows = [(2, ["P1", "70", "60", "2"]), (3, ["P2", "abc", "60", "2"]), (4, ["P3", "80", "70", "3"])]
+    text, n, errors = plan_chunk(rows, DEFAULT_COEFFICIENTS, "ndjson", HEADER)
+    assert n == 2
+    assert [json.loads(line)["patient_id"] for line in text.splitlines()] == ["P1", "P3"]
+    assert len(errors) == 1 and errors[0][0] == 3 and "abc" in errors[0][1]
+
+
+def test_chunk_of_only_bad_rows():
+    assert plan_chunk([(2, ["P1", "x", "60", "2"])], DEFAULT_COEFFICIENTS, "ndjson", HEADER)[:2] == ("", 0)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_reports_file_line_numbers(workers):
+    src = io.StringIO("patient_id,weight,age,idwg\nP1,70,60,2\n\nP2,abc,60,2\nP3,0,60,2\nP4,72,70,3,9\n")
+    dst = io.StringIO()
+    skipped = []
+    n = run(src, dst, "csv", "ndjson", chunk_size=2, workers=workers,
+            on_error=lambda line, msg: skipped.append(line))
+    assert n == 2 and skipped == [4, 6]
+    assert [_strict_json(line)["patient_id"] for line in dst.getvalue().splitlines()] == ["P1", "P3"]
+
+
+def test_run_ndjson_skips_malformed_lines():
+    src = io.StringIO('{"patient_id": "A", "weight": 70}\n[1]\n{bad\n{"patient_id": "B"}\n')
+    dst = io.StringIO()
+    skipped = []
+    n = run(src, dst, "ndjson", "ndjson", on_error=lambda line, msg: skipped.append(line))
+    assert n == 2 and skipped == [2, 3]
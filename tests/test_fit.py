@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from uf_fit import auc, cross_validate, fit_logistic, log_loss
+
+
+def synthetic(n: int = 4000, b=(-0.5, 1.2, -0.8), seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([np.ones(n), rng.normal(size=(n, len(b) - 1))])
+    y = (rng.random(n) < 1.0 / (1.0 + np.exp(-(X @ np.asarray(b))))).astype(float)
+    return X, y
+
+
+def test_fit_logistic_recovers_coefficients():
+    X, y = synthetic()
+    b, cov, n_iter = fit_logistic(X, y, l2=1e-6)
+    se = np.sqrt(np.diag(cov))
+    assert np.all(np.abs(b - [-0.5, 1.2, -0.8]) < 4 * se)
+    assert n_iter < 50
+
+
+def test_fit_logistic_shrinks_towards_prior_but_not_intercept():
+    X, y = synthetic(200, seed=1)
+    prior = np.array([0.0, 0.3, 0.3])
+    b, _, _ = fit_logistic(X, y, l2=1e6, prior=prior)
+    assert b[1:] == pytest.approx(prior[1:], abs=1e-3)
+    assert abs(b[0]) > 1e-3  # το intercept δεν τιμωρείται
+
+
+def test_auc_and_log_loss():
+    assert auc([0, 0, 1, 1], [0.1, 0.4, 0.35, 0.8]) == 0.75
+    assert auc([0, 1], [0.5, 0.5]) == 0.5
+    assert np.isnan(auc([1, 1], [0.2, 0.3]))
+    assert log_loss(np.array([1.0, 0.0]), np.array([0.5, 0.5])) == pytest.approx(np.log(2))
+
+
+def test_cross_validate_workers_agree():
+    X, y = synthetic(300, seed=2)
+    one = cross_validate(X, y, [0.1, 10.0], folds=3, workers=1)
+    two = cross_validate(X, y, [0.1, 10.0], folds=3, workers=2)
+    assert one.keys() == two.keys()
+    for l2 in one:
+        assert one[l2] == pytest.approx(two[l2])
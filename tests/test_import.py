@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from uf_import import dedup, import_sessions, load_into_store, parse_chunk, sessions_table
+from uf_snapshot import COLUMNS, validate
+from uf_store import SessionStore
+
+pa = pytest.importorskip("pyarrow")
+
+
+def write(path, snapshot, mtime=None):
+    path.write_text(snapshot if isinstance(snapshot, str) else json.dumps(snapshot), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def snap(patient_id="P1", session_dt="2026-01-01 08:00", **extra):
+    return {"patient_id": patient_id, "session_dt": session_dt, "age": 70, "weight": 80.5,
+            "symptoms": {"headache": True}, **extra}
+
+
+def test_validate_flattens_and_fills_missing_fields():
+    row = validate(snap())
+    assert list(row) == list(COLUMNS)
+    assert (row["age"], row["weight"], row["headache"], row["cramps"]) == (70, 80.5, True, None)
+
+
+@pytest.mark.parametrize("snapshot, field", [
+    (snap(weight=float("inf")), "weight"),
+    (snap(age=1e30), "age"),
+    (snap(age=70.5), "age"),
+    (snap(weight="80"), "weight"),
+    (snap(symptoms={"headache": 2}), "headache"),
+    (snap(symptoms=[]), "symptoms"),
+    (snap(patient_id=""), "patient_id"),
+])
+def test_validate_rejects_bad_fields(snapshot, field):
+    with pytest.raises(ValueError, match=field):
+        validate(snapshot)
+
+
+def test_validate_nan_is_missing():
+    assert validate(snap(weight=float("nan")))["weight"] is None
+
+
+def test_parse_chunk_isolates_bad_files(tmp_path):
+    paths = [
+        write(tmp_path / "a.json", snap("A")),
+        write(tmp_path / "b.json", "{not json"),
+        write(tmp_path / "c.json", '{"patient_id": "C", "session_dt": "x", "weight": Infinity}'),
+        write(tmp_path / "d.json", snap("D")),
+    ]
+    batch, errors = parse_chunk(paths)
+    assert batch.column("patient_id").to_pylist() == ["A", "D"]
+    assert batch.column("_path").to_pylist() == [paths[0], paths[3]]
+    assert [p for p, _ in errors] == [paths[1], paths[2]]
+    assert errors[0][1].startswith("JSONDecodeError") and "weight" in errors[1][1]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_import_sessions_dedups_on_newest_mtime(tmp_path, workers):
+    (tmp_path / "old").mkdir()
+    (tmp_path / "new").mkdir()
+    write(tmp_path / "old" / "s.json", snap("A", weight=70.0), mtime=1_000)
+    write(tmp_path / "new" / "s.json", snap("A", weight=71.0), mtime=2_000)
+    write(tmp_path / "new" / "t.JSON", snap("B"))
+    write(tmp_path / "new" / "bad.json", "[]")
+    (tmp_path / "new" / "notes.txt").write_text("skip me")
+    seen = []
+    result = import_sessions(str(tmp_path), workers=workers, chunk_size=1,
+                             on_error=lambda path, msg: seen.append(os.path.basename(path)))
+    assert (result["files"], result["errors"], result["duplicates"]) == (4, 1, 1)
+    assert seen == ["bad.json"]
+    table = sessions_table(result["table"])
+    assert table.column_names == list(COLUMNS)
+    assert table.column("patient_id").to_pylist() == ["A", "B"]
+    assert table.column("weight").to_pylist() == [71.0, 80.5]
+
+
+def test_dedup_breaks_mtime_ties_on_path(tmp_path):
+    paths = [write(tmp_path / f"{c}.json", snap(), mtime=1_000) for c in "ab"]
+    batch, _ = parse_chunk(paths)
+    assert dedup(pa.Table.from_batches([batch])).column("_path").to_pylist() == [paths[1]]
+
+
+def test_load_into_store_nests_rows(tmp_path):
+    batch, _ = parse_chunk([write(tmp_path / "a.json", snap("A"))])
+    store = SessionStore(str(tmp_path / "s.sqlite3"))
+    assert load_into_store(sessions_table(pa.Table.from_batches([batch])), store) == 1
+    stored = next(store.iter_sessions("A"))
+    assert stored["symptoms"]["headache"] is True and stored["weight"] == 80.5
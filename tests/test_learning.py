@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from uf_learning import rebuild_learning_state, replay_offsets
+from uf_model import learn_one
+from uf_snapshot import rows_to_inputs
+from uf_store import SessionStore
+
+
+def history(seed: int = 0) -> list:
+    rng = random.Random(seed)
+    rows = [{
+        "patient_id": f"P{p}", "session_dt": f"2026-01-{d:02d} 08:00", "weight": 60.0 + 5 * p,
+        "UF_actual_total": rng.uniform(1.5, 4.0), "duration_actual_min": rng.choice([210, 240]),
+        "outcome_last": int(rng.random() < 0.3), "alpha": 0.2,
+    } for p in range(4) for d in range(1, 2 + 3 * p)]
+    rng.shuffle(rows)
+    return rows
+
+
+def sequential(rows: list, initial: float = 0.0) -> dict:
+    """Το ίδιο learning βήμα-βήμα, όπως το κάνει το Learning tab ανά συνεδρία."""
+    final = {}
+    for row in sorted(rows, key=lambda r: (r["patient_id"], r["session_dt"])):
+        cur = final.get(row["patient_id"], initial)
+        final[row["patient_id"]] = learn_one({**row, "gamma0_offset_current": cur})["gamma0_offset_updated"]
+    return final
+
+
+def test_replay_matches_session_by_session_learning():
+    rows = history()
+    result = replay_offsets(rows_to_inputs(rows))
+    expected = sequential(rows)
+    assert result["patients"].tolist() == sorted(expected)
+    assert result["final_offset"].tolist() == pytest.approx([expected[p] for p in sorted(expected)], rel=1e-12)
+    assert result["n_sessions"].tolist() == [1, 4, 7, 10]
+    assert result["last_session_dt"].tolist() == ["2026-01-01 08:00", "2026-01-04 08:00",
+                                                  "2026-01-07 08:00", "2026-01-10 08:00"]
+
+
+def test_replay_per_session_offsets_chain():
+    rows = history(1)
+    result = replay_offsets(rows_to_inputs(rows), alpha=0.5, initial_offset=0.1)
+    by_patient = {}
+    for i in sorted(range(len(rows)), key=lambda i: rows[i]["session_dt"]):
+        by_patient.setdefault(rows[i]["patient_id"], []).append(i)
+    for idx in by_patient.values():
+        assert result["gamma0_offset_current"][idx[0]] == 0.1
+        for prev, cur in zip(idx, idx[1:]):
+            assert result["gamma0_offset_current"][cur] == result["gamma0_offset_updated"][prev]
+
+
+def test_replay_empty_history():
+    result = replay_offsets({"patient_id": [], "session_dt": []})
+    assert result["patients"].size == 0 and result["last_session_dt"].size == 0
+
+
+def test_rebuild_learning_state(tmp_path):
+    store = SessionStore(str(tmp_path / "s.sqlite3"))
+    assert rebuild_learning_state(store)["patients"].size == 0
+    rows = history(2)
+    store.append_many(rows)
+    rebuild_learning_state(store)
+    expected = sequential(rows)
+    state = store.learning_state("P3")
+    assert state["gamma0_offset"] == pytest.approx(expected["P3"], rel=1e-12)
+    assert (state["n_sessions"], state["last_session_dt"]) == (10, "2026-01-10 08:00")
@@ -0,0 +1,79 @@
+import io
+import math
+
+import numpy as np
+import pytest
+
+from uf_live import ChairTrend, Ward, load_roster, parse_sample
+
+
+def feed(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    t = 1.7e9 + np.cumsum(rng.uniform(5, 15, n))
+    return t, 80 + 12 * (t - t[0]) / 3600 + rng.normal(0, 2, n), 120 - 5 * (t - t[0]) / 3600 + rng.normal(0, 2, n)
+
+
+def polyfit_slopes(t, tmp, vp):
+    th = (t - t[0]) / 3600.0
+    return np.polyfit(th, tmp, 1)[0], np.polyfit(th, vp, 1)[0]
+
+
+def test_slopes_need_two_distinct_times():
+    tr = ChairTrend(10)
+    assert all(math.isnan(s) for s in tr.slopes())
+    tr.add(100.0, 80.0, 120.0)
+    tr.add(100.0, 90.0, 121.0)
+    assert all(math.isnan(s) for s in tr.slopes())
+
+
+def test_slopes_match_polyfit_before_wrap():
+    t, tmp, vp = feed(50)
+    tr = ChairTrend(100)
+    for row in zip(t, tmp, vp):
+        tr.add(*row)
+    assert tr.slopes() == pytest.approx(polyfit_slopes(t, tmp, vp), rel=1e-9)
+    assert tr.last_t == t[-1]
+
+
+@pytest.mark.parametrize("n", [75, 250, 1001])  # τυλίγει μία, πολλές φορές και περνά από _resum
+def test_slopes_cover_only_the_last_capacity_samples(n):
+    cap = 40
+    t, tmp, vp = feed(n, seed=n)
+    tr = ChairTrend(cap)
+    for row in zip(t, tmp, vp):
+        tr.add(*row)
+    assert tr.n == cap
+    # Το slope δεν εξαρτάται από την αρχή του χρόνου, οπότε αρκεί το παράθυρο
+    assert tr.slopes() == pytest.approx(polyfit_slopes(t[-cap:], tmp[-cap:], vp[-cap:]), rel=1e-8)
+
+
+def test_ward_drops_non_finite_samples_and_evaluates_every_chair():
+    roster = load_roster(io.StringIO("chair,patient_id,weight\nA1,P1,80\nA2,P2,\n"))
+    ward = Ward(roster)
+    assert ward.ingest("A1", 0.0, 80.0, 120.0)
+    assert not ward.ingest("A1", 10.0, math.nan, 120.0)
+    assert not ward.ingest("A2", math.inf, 80.0, 120.0)
+    assert ward.ingest("A1", 3600.0, 100.0, 110.0)
+    assert ward.ingest("A2", 0.0, 80.0, 120.0)
+    assert ward.dropped == 2 and ward.chairs == ["A1", "A2"]
+    assert ward.patient_ids == ["P1", "P2"] and ward.inputs["weight"] == [80.0, 72.0]
+    out = ward.evaluate()
+    assert out["tmp_slope"][0] == pytest.approx(20.0) and math.isfinite(out["tmp_slope"][1])  # A2: roster estimate
+    assert out["r_max_dyn"].shape == (2,) and len(out["alert_text"]) == 2
+
+
+@pytest.mark.parametrize("line, sample", [
+    ('{"chair": "A1", "t": 10, "tmp": 82, "vp": 121}', ("A1", 10.0, 82.0, 121.0)),
+    ("B2,20,83.5,119", ("B2", 20.0, 83.5, 119.0)),
+    ("", None),
+    ('{"chair": "A1"}', None),
+    ("{bad", None),
+    ("A1,1", None),
+])
+def test_parse_sample(line, sample):
+    assert parse_sample(line) == sample
+
+
+def test_parse_sample_empty_csv_cell_is_nan():
+    chair, t, tmp, vp = parse_sample("A1,30,,120")
+    assert (chair, t, vp) == ("A1", 30.0, 120.0) and math.isnan(tmp)
@@ -0,0 +1,116 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from uf_model import (
+    ALERT_OVERHYDRATION, ALERT_UF_DEFICIT, DEFAULT_COEFFICIENTS, Coefficients, learn_batch, learn_one, logit,
+    plan_batch, plan_one, update_offset,
+)
+
+COEFS = [DEFAULT_COEFFICIENTS, Coefficients(tau_default=35.0, gamma1=0.2, omega_target=3.0)]
+
+
+def reference_plan(p: dict, c: Coefficients) -> dict:
+    """Scalar Plan tab math, one session at a time (όπως ήταν στο app.py)."""
+    hours = max(0.1, p["duration_min"] / 60.0)
+    tmp_slope = (p["tmp_end"] - p["tmp_start"]) / hours
+    vp_trend = (p["vp_end"] - p["vp_start"]) / hours
+    sbp_pre = p["sbp_pre"]
+    bp_drop_pct = 0.0 if sbp_pre <= 0 else max(0.0, (sbp_pre - p["sbp_post"]) * 100.0 / sbp_pre)
+    hypo = any([p["headache"], p["cramps"], p["GI"], p["syncope"]])
+    lin_terms = (
+        c.gamma0 + c.g_meds * p["meds_recent"] + c.g_tmp * tmp_slope + c.g_vp * vp_trend
+        + c.g_age * max(0.0, (p["age"] - 60.0) / 10.0) + c.g_dm * p["dm"] + c.g_press * p["dP_atm_10hPa"]
+        + c.g_as * p["severe_as"] + c.g_mr * p["severe_mr"]
+    )
+    tau = c.tau_default / 100.0
+    r_bounded = min(max((math.log(tau / (1 - tau)) - lin_terms) / c.gamma1, c.rmin), c.rmax)
+    guard = tmp_slope > c.tmp_thr or vp_trend > c.vp_thr or bp_drop_pct >= c.bp_drop_thr or hypo
+    r_max_dyn = r_bounded * (c.safety_mult if guard else 1.0)
+    UF_cap_L = r_max_dyn * (p["duration_min"] / 60.0) * p["weight"] / 1000.0
+    UF_needed_L = p["idwg"] + p["intake_L"] - p["rinseback_L"] - p["iv_L"]
+    UF_recommended_L = min(UF_cap_L, UF_needed_L)
+    x_over = (
+        c.beta0 + c.b_OH * p["OH_L"] + c.b_dysp * p["dyspnea"] + c.b_edm * p["edema"]
+        + c.b_ef * (p["ef_percent"] < 40) + c.b_af * (p["arrhythmia"] or p["af_recent"])
+        + c.b_dm_over * p["dm"] + c.b_mr_over * p["severe_mr"] - c.b_urine * (p["residual_urine_mLd"] / 1000.0)
+    )
+    return {
+        "bp_drop_pct": bp_drop_pct, "lin_terms": lin_terms, "r_max_dyn": r_max_dyn, "UF_cap_L": UF_cap_L,
+        "UF_needed_L": UF_needed_L, "UF_recommended_L": UF_recommended_L,
+        "UF_deficit_L": max(0.0, UF_needed_L - UF_recommended_L), "P_over": 1.0 / (1.0 + math.exp(-x_over)),
+    }
+
+
+def random_sessions(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    flag = lambda p: rng.random() < p  # noqa: E731
+    return [{
+        "age": rng.randint(20, 95), "weight": rng.uniform(40, 130), "duration_min": rng.choice([180, 240, 300]),
+        "idwg": rng.uniform(0, 5), "intake_L": rng.uniform(0, 1), "rinseback_L": rng.uniform(0.2, 0.5),
+        "iv_L": rng.uniform(0, 0.5), "meds_recent": rng.randint(0, 1), "dm": rng.randint(0, 1),
+        "dP_atm_10hPa": rng.uniform(-2, 2), "sbp_pre": rng.randint(0, 200), "sbp_post": rng.randint(70, 190),
+        "headache": flag(.1), "cramps": flag(.1), "GI": flag(.1), "syncope": flag(.05),
+        "ef_percent": rng.randint(10, 80), "arrhythmia": flag(.1), "af_recent": flag(.1),
+        "tmp_start": rng.uniform(0, 150), "tmp_end": rng.uniform(50, 200),
+        "vp_start": rng.uniform(50, 200), "vp_end": rng.uniform(50, 200),
+        "OH_L": rng.uniform(-1, 5), "dyspnea": flag(.2), "edema": flag(.2),
+        "residual_urine_mLd": rng.choice([0, 200, 500, 1500]), "severe_as": flag(.1), "severe_mr": flag(.1),
+    } for _ in range(n)]
+
+
+@pytest.mark.parametrize("coef", COEFS)
+def test_plan_batch_matches_scalar_reference(coef):
+    rows = random_sessions(500)
+    out = plan_batch({k: [r[k] for r in rows] for k in rows[0]}, coef)
+    for i, row in enumerate(rows):
+        for k, v in reference_plan(row, coef).items():
+            assert out[k][i] == pytest.approx(v, rel=1e-12, abs=1e-12), (i, k)
+
+
+def test_plan_one_is_a_batch_row():
+    rows = random_sessions(20, seed=2)
+    out = plan_batch({k: np.array([r[k] for r in rows], dtype=float) for k in rows[0]})
+    for i, row in enumerate(rows):
+        one = plan_one(row)
+        assert one["r_max_dyn"] == out["r_max_dyn"][i] and one["alerts"] == out["alerts"][i]
+
+
+def test_plan_batch_broadcasts_coefficient_arrays():
+    taus = np.array([10.0, 20.0, 30.0])
+    out = plan_batch({"weight": 70.0}, Coefficients(tau_default=taus))
+    assert out["r_max_dyn"].shape == (3,)
+    assert np.all(np.diff(out["r_raw"]) > 0)  # μεγαλύτερο τ → μεγαλύτερος επιτρεπτός ρυθμός
+
+
+def test_extension_rounded_up_to_step_when_overloaded_with_deficit():
+    coef = Coefficients(omega_target=1.0, round_step=15)
+    out = plan_one({"idwg": 6.0, "OH_L": 4.0, "duration_min": 180}, coef)
+    assert out["alerts"] & ALERT_UF_DEFICIT and out["alerts"] & ALERT_OVERHYDRATION
+    minutes = out["UF_deficit_L"] * 1000.0 / (out["r_max_dyn"] * 72.0) * 60.0
+    assert out["extra_minutes_over"] == math.ceil(minutes / 15) * 15
+
+
+def test_update_offset_moves_towards_target_and_skips_undefined():
+    p_old, delta, updated = update_offset(np.array([0.0, np.nan]), 0.1, np.array([0.5, 0.5]), 0.2)
+    assert delta[0] == pytest.approx(logit(0.1) - logit(1.0 / (1.0 + math.exp(-0.5))))
+    assert updated[0] == pytest.approx(0.5 + 0.2 * delta[0])
+    assert updated[1] == 0.5 and math.isnan(delta[1])
+
+
+def test_learn_one_without_actuals_keeps_offset():
+    out = learn_one({"gamma0_offset_current": 0.3})
+    assert out["r_used_last"] is None and out["gamma0_offset_updated"] == 0.3
+
+
+def test_learn_one_is_a_batch_row():
+    rows = random_sessions(10, seed=3)
+    for i, r in enumerate(rows):
+        r.update(UF_actual_total=2.0 + i / 10, duration_actual_min=240, outcome_last=i % 2, gamma0_offset_current=0.1)
+    batch = learn_batch({k: [r[k] for r in rows] for k in rows[0]})
+    for i, row in enumerate(rows):
+        one = learn_one(row)
+        assert one["gamma0_offset_updated"] == batch["gamma0_offset_updated"][i]
+        assert one["recommended_total_minutes"] == batch["recommended_total_minutes"][i]
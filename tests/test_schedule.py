@@ -0,0 +1,108 @@
+import io
+import random
+from collections import defaultdict
+
+import pytest
+
+from uf_schedule import SHIFTS, TURNOVER_MIN, normalize_sessions, read_roster, schedule
+
+
+def minutes(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+def random_week(chairs: int, seed: int = 0, days=("Mon", "Tue", "Wed")) -> list:
+    rng = random.Random(seed)
+    return [{"patient_id": f"P{d}{k}{c}", "day": day, "shift": k + 1, "duration_min": rng.choice([180, 210, 240]),
+             "extra_minutes": rng.choice([0, 0, 15, 30, 45, 60, 90])}
+            for d, day in enumerate(days) for k in range(len(SHIFTS)) for c in range(rng.randint(0, chairs))]
+
+
+def check_invariants(sessions: list, result: dict, chairs: int, w: float, shifts: tuple = SHIFTS) -> None:
+    rows = result["rows"]
+    assert sorted((r["patient_id"], r["day"]) for r in rows) == sorted((s["patient_id"], s["day"]) for s in sessions)
+    by_chair = defaultdict(list)
+    for r in rows:
+        start, end = minutes(r["start"]), minutes(r["end"])
+        window = shifts[r["shift"] - 1]
+        assert 1 <= r["chair"] <= chairs
+        assert start >= window[0]
+        assert 0 <= r["granted_min"] <= r["extra_minutes"]
+        assert r["unmet_min"] == r["extra_minutes"] - r["granted_min"] >= 0
+        assert end - start == r["duration_min"] + r["granted_min"]
+        assert r["overtime_min"] == max(0, end - window[1])
+        by_chair[r["day"], r["chair"]].append((start, end))
+    for slots in by_chair.values():
+        slots.sort()
+        for (_, end), (start, _) in zip(slots, slots[1:]):
+            assert start >= end + TURNOVER_MIN  # καμία επικάλυψη, με turnover
+    assert result["unmet_min"] == pytest.approx(sum(r["unmet_min"] for r in rows))
+    assert result["overtime_min"] == pytest.approx(sum(r["overtime_min"] for r in rows))
+    assert result["cost"] == pytest.approx(result["unmet_min"] + w * result["overtime_min"])
+
+
+@pytest.mark.parametrize("w", [1.5, 0.5])
+@pytest.mark.parametrize("seed", range(5))
+def test_heuristic_schedule_invariants(seed, w):
+    sessions = random_week(6, seed)
+    result = schedule(sessions, 6, overtime_weight=w)
+    check_invariants(sessions, result, 6, w)
+    if w >= 1.0:
+        assert result["overtime_min"] == 0  # οι prescribed διάρκειες χωράνε πάντα στη βάρδια
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_exact_never_worse_than_heuristic(seed):
+    sessions = random_week(3, seed, days=("Mon",))
+    heuristic = schedule(sessions, 3, step=15)
+    exact = schedule(sessions, 3, step=15, exact=True)
+    check_invariants(sessions, exact, 3, 1.5)
+    assert exact["cost"] <= heuristic["cost"] + 1e-9
+
+
+def test_exact_grants_extension_that_the_heuristic_caps():
+    # Κενό 10' μεταξύ βαρδιών: το heuristic κόβει την παράταση στο άνοιγμα της 2ης − turnover
+    # σε κάθε chair, ενώ η C μπορεί να πάει στην άλλη chair και η A να πάρει όλα τα 90'
+    shifts = ((420, 690), (700, 970))
+    sessions = [
+        {"patient_id": "A", "day": "Mon", "shift": 1, "duration_min": 180, "extra_minutes": 90},
+        {"patient_id": "C", "day": "Mon", "shift": 2, "duration_min": 240, "extra_minutes": 0},
+    ]
+    heuristic = schedule(sessions, 2, shifts=shifts)
+    exact = schedule(sessions, 2, shifts=shifts, exact=True)
+    check_invariants(sessions, heuristic, 2, 1.5, shifts)
+    check_invariants(sessions, exact, 2, 1.5, shifts)
+    assert (heuristic["unmet_min"], exact["unmet_min"], exact["overtime_min"]) == (20.0, 0.0, 0.0)
+
+
+def test_too_many_sessions_for_the_chairs():
+    sessions = [{"patient_id": f"P{i}", "day": "Mon", "shift": 1, "duration_min": 240, "extra_minutes": 0}
+                for i in range(3)]
+    with pytest.raises(ValueError, match="3 συνεδρίες > 2 chairs"):
+        schedule(sessions, 2)
+    with pytest.raises(ValueError, match="shift 4"):
+        schedule([{**sessions[0], "shift": 4}], 2)
+
+
+def test_exact_gives_up_on_large_instances():
+    with pytest.raises(ValueError, match="nodes"):
+        schedule(random_week(8, 1, days=("Mon",)), 8, exact=True, max_nodes=100)
+
+
+def test_read_roster_expands_days_and_uses_recommended_total():
+    f = io.StringIO("patient_id,days,shift,duration_min,extra_minutes,recommended_total_minutes\n"
+                    "P1,Mon/Wed/Fri,1,240,30,\n"
+                    "P2,Tue Thu,2,210,,255\n"
+                    "P3,Sat,3,240,,\n")
+    sessions = read_roster(f)
+    assert [(s["patient_id"], s["day"]) for s in sessions] == [
+        ("P1", "Mon"), ("P1", "Wed"), ("P1", "Fri"), ("P2", "Tue"), ("P2", "Thu"), ("P3", "Sat")]
+    assert [s["extra_minutes"] for s in sessions] == [30.0, 30.0, 30.0, 45.0, 45.0, 0.0]
+
+
+def test_normalize_sessions_requires_duration_and_day():
+    with pytest.raises(ValueError, match="duration_min"):
+        normalize_sessions([{"patient_id": "P", "day": "Mon", "shift": 1}])
+    with pytest.raises(ValueError, match="day"):
+        normalize_sessions([{"patient_id": "P", "shift": 1, "duration_min": 240}])
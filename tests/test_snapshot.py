@@ -0,0 +1,54 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from uf_model import DEFAULT_COEFFICIENTS
+from uf_snapshot import (
+    COLUMNS, flat_rows, flatten, ndjson_lines, nest, parse_float, records, rows_to_inputs, snapshot_columns,
+    table_to_inputs,
+)
+
+
+def _columns(rows: list) -> dict:
+    return snapshot_columns(rows_to_inputs(rows), DEFAULT_COEFFICIENTS)
+
+
+def test_ndjson_lines_equal_json_dumps_of_records():
+    rows = [{"patient_id": f"P{i}", "session_dt": "2026-01-01", "weight": 60.0 + i, "age": 50 + i % 3,
+             "dyspnea": i % 2, "UF_actual_total": 2.0 if i % 2 else None} for i in range(40)]
+    cols = _columns(rows)
+    lines = list(ndjson_lines(cols))
+    assert lines == [json.dumps(r, ensure_ascii=False) + "\n" for r in records(cols)]
+    assert json.loads(lines[0])["symptoms"] == {"headache": False, "cramps": False, "GI": False, "syncope": False}
+
+
+def test_non_finite_outputs_become_null():
+    cols = _columns([{"patient_id": "P", "weight": 0.0}, {"patient_id": "Q", "weight": 70.0}])
+    assert np.isinf(cols["recommended_total_minutes"][0])
+    first = json.loads(next(ndjson_lines(cols)), parse_constant=pytest.fail)
+    assert first["recommended_total_minutes"] is None and first["extra_minutes"] is None
+    assert next(records(cols))["recommended_total_minutes"] is None
+    assert next(iter(flat_rows(cols)))[COLUMNS.index("recommended_total_minutes")] is None
+
+
+def test_flatten_nest_round_trip():
+    snap = next(records(_columns([{"patient_id": "P", "session_dt": "2026-01-01", "dial_Na": 140}])))
+    flat = flatten(snap)
+    assert list(flat) == list(COLUMNS) and flat["dial_Na"] == 140
+    assert nest(flat) == snap
+
+
+@pytest.mark.parametrize("cell, value", [
+    (None, math.nan), ("", math.nan), ("null", math.nan), ("yes", 1.0), ("False", 0.0), ("2,5", 2.5), (" 7 ", 7.0),
+])
+def test_parse_float(cell, value):
+    assert parse_float(cell) == value or (math.isnan(value) and math.isnan(parse_float(cell)))
+
+
+def test_table_to_inputs_fills_defaults_for_empty_cells():
+    inputs = table_to_inputs(["patient_id", "weight", "age"], [["P1", "80", None], ["P2", None, "65"]])
+    assert inputs["weight"].tolist() == [80.0, 72.0]
+    assert inputs["age"].tolist() == [72.0, 65.0]
+    assert inputs["patient_id"] == ["P1", "P2"]
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from uf_store import BackgroundWriter, SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.sqlite3"))
+
+
+def snap(patient_id, session_dt, **extra):
+    return {"session_dt": session_dt, "patient_id": patient_id, "weight": 70.0,
+            "symptoms": {"headache": False}, **extra}
+
+
+def test_round_trip_keeps_payload_and_order(store):
+    rows = [snap("B", "2026-01-02"), snap("A", "2026-01-03"), snap("A", "2026-01-01", note="α")]
+    assert store.append_many(rows) == 3
+    assert [(s["patient_id"], s["session_dt"]) for s in store.iter_sessions()] == [
+        ("A", "2026-01-01"), ("A", "2026-01-03"), ("B", "2026-01-02")]
+    assert next(store.iter_sessions("A")) == rows[2]
+    assert json.loads(next(store.iter_raw("B"))) == rows[0]
+    assert store.patients() == ["A", "B"]
+
+
+def test_upsert_on_patient_and_session_dt(store):
+    store.append(snap("A", "2026-01-01", weight=70.0))
+    store.append(snap("A", "2026-01-01", weight=71.5))
+    assert store.count() == 1
+    assert store.last_sessions("A")[0]["weight"] == 71.5
+
+
+def test_filters_and_last_sessions(store):
+    store.append_many(snap("A", f"2026-01-{d:02d} 08:00") for d in range(1, 11))
+    store.append(snap("B", "2026-01-05 08:00"))
+    assert store.count() == 11 and store.count("A") == 10
+    assert store.count(since="2026-01-05", until="2026-01-06 23:59") == 3
+    assert [s["session_dt"][:10] for s in store.iter_sessions("A", since="2026-01-09")] == ["2026-01-09", "2026-01-10"]
+    assert [s["session_dt"][:10] for s in store.last_sessions("A", 3)] == ["2026-01-10", "2026-01-09", "2026-01-08"]
+
+
+def test_learning_state_follows_latest_session(store):
+    store.append(snap("A", "2026-01-02", gamma0_offset_updated=0.2))
+    store.append(snap("A", "2026-01-03", gamma0_offset_updated=0.3))
+    store.append(snap("A", "2026-01-01", gamma0_offset_updated=-1.0))  # παλαιότερη: αγνοείται
+    assert store.learning_state("A") == {"gamma0_offset": 0.3, "n_sessions": 2, "last_session_dt": "2026-01-03"}
+    assert store.learning_state("B") is None
+
+
+def test_background_writer_survives_a_bad_batch(store, caplog):
+    writer = BackgroundWriter(store)
+    writer.submit({"patient_id": "A", "session_dt": "x", "bad": object()})
+    writer.flush()
+    writer.submit(snap("A", "2026-01-01"))
+    writer.close()
+    assert store.count() == 1
+    assert "failed to write" in caplog.text
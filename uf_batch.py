@@ -0,0 +1,200 @@
+"""Headless ward-roster planner — ίδιο μοντέλο με το app, χωρίς Streamlit.
+
+Διαβάζει roster (CSV ή NDJSON, μία γραμμή ανά συνεδρία, στήλες με τα ονόματα
+του snapshot) και γράφει για κάθε γραμμή τα πεδία του "Export snapshot (JSON)".
+Η είσοδος επεξεργάζεται σε chunks, άρα η μνήμη μένει σταθερή ανεξάρτητα από το
+μέγεθος του αρχείου. Γραμμές που δεν διαβάζονται αναφέρονται με τον αριθμό
+τους και παραλείπονται, χωρίς να σταματά το run.
+
+    python uf_batch.py roster.csv -o plans.ndjson
+    python uf_batch.py history.ndjson -o plans.csv --workers 0 --chunk-size 50000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, Optional
+
+from uf_model import DEFAULT_COEFFICIENTS, Coefficients, load_coefficients
+from uf_snapshot import (
+    COLUMNS, flat_rows, flatten, ndjson_lines, rows_to_inputs, snapshot_columns, table_to_inputs,
+)
+
+FORMATS = ("csv", "ndjson")
+# Ό,τι μπορεί να πετάξει η ανάγνωση μιας χαλασμένης γραμμής (κελί "abc", JSON που δεν είναι object...)
+ROW_ERRORS = (ValueError, TypeError, KeyError, AttributeError)
+
+
+def guess_format(path: str, default: str = "ndjson") -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    return default
+
+
+def read_rows(f, fmt: str) -> Iterator:
+    """Yield rows from an open roster file: lists for CSV, flat dicts for NDJSON."""
+    if fmt == "csv":
+        for row in csv.reader(f):
+            if row:
+                yield [None if v == "" else v for v in row]
+    else:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield flatten(json.loads(line))
+
+
+def numbered_rows(f, fmt: str) -> Iterator[tuple]:
+    """Yield (line number, row): CSV cell lists, or raw NDJSON lines (parsed in plan_chunk)."""
+    if fmt == "csv":
+        reader = csv.reader(f)
+        for row in reader:
+            if row:
+                yield reader.line_num, [None if v == "" else v for v in row]
+    else:
+        for i, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                yield i, line
+
+
+def chunked(it, size: int) -> Iterator[list]:
+    it = iter(it)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _chunk_inputs(rows: list, header: Optional[list]) -> dict:
+    if header is None:
+        return rows_to_inputs([flatten(json.loads(line)) for line in rows])
+    width = len(header)
+    for row in rows:
+        if len(row) > width:
+            raise ValueError(f"{len(row)} cells, header has {width}")
+    # Κοντές γραμμές: τα κελιά που λείπουν = κενά (→ defaults)
+    return table_to_inputs(header, [row + [None] * (width - len(row)) for row in rows])
+
+
+def plan_chunk(rows: list, coef: Coefficients, fmt: str, header: list = None) -> tuple:
+    """Plan one chunk of (line number, row) pairs and serialize it (no header).
+
+    With `header`, rows are CSV cell lists; otherwise raw NDJSON lines. Returns
+    (text, rows planned, [(line, error)]): a row that does not parse is reported
+    and skipped, the rest of the chunk is still planned.
+    """
+    cells = [row for _, row in rows]
+    errors = []
+    try:
+        inputs = _chunk_inputs(cells, header)
+    except ROW_ERRORS:
+        # Σπάνιο: απομόνωση των χαλασμένων γραμμών, μία-μία
+        cells = []
+        for line, row in rows:
+            try:
+                _chunk_inputs([row], header)
+            except ROW_ERRORS as e:
+                errors.append((line, f"{type(e).__name__}: {e}"))
+            else:
+                cells.append(row)
+        if not cells:
+            return "", 0, errors
+        inputs = _chunk_inputs(cells, header)
+    cols = snapshot_columns(inputs, coef)
+    if fmt == "ndjson":
+        return "".join(ndjson_lines(cols)), len(cells), errors
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(flat_rows(cols))
+    return buf.getvalue(), len(cells), errors
+
+
+def run(src, dst, in_fmt: str, out_fmt: str, coef: Coefficients = DEFAULT_COEFFICIENTS,
+        chunk_size: int = 20000, workers: int = 1, on_error=None) -> int:
+    """Stream `src` → `dst`; returns the number of rows written.
+
+    `on_error(line, message)` καλείται για κάθε γραμμή που παραλείφθηκε.
+    """
+    if out_fmt == "csv":
+        csv.writer(dst, lineterminator="\n").writerow(COLUMNS)
+    n = 0
+    rows = numbered_rows(src, in_fmt)
+    header = next(rows, (0, []))[1] if in_fmt == "csv" else None
+
+    def collect(text, k, errors):
+        nonlocal n
+        dst.write(text)
+        n += k
+        if on_error is not None:
+            for line, msg in errors:
+                on_error(line, msg)
+
+    chunks = chunked(rows, chunk_size)
+    if workers == 1:
+        for rows in chunks:
+            collect(*plan_chunk(rows, coef, out_fmt, header))
+        return n
+
+    # Process pool με φραγμένο αριθμό chunks σε πτήση → σταθερή μνήμη, ίδια σειρά εξόδου
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for rows in chunks:
+            pending.append(pool.submit(plan_chunk, rows, coef, out_fmt, header))
+            if len(pending) >= 2 * workers:
+                collect(*pending.popleft().result())
+        while pending:
+            collect(*pending.popleft().result())
+    return n
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Batch UF plans for a ward roster (CSV/NDJSON).")
+    ap.add_argument("input", help="roster file (.csv / .ndjson), '-' για stdin")
+    ap.add_argument("-o", "--output", default="-", help="output file (.csv / .ndjson), default stdout")
+    ap.add_argument("--input-format", choices=FORMATS)
+    ap.add_argument("--output-format", choices=FORMATS)
+    ap.add_argument("--coefficients", help="JSON με συντελεστές/thresholds (πεδία του sidebar)")
+    ap.add_argument("--chunk-size", type=int, default=20000)
+    ap.add_argument("--workers", type=int, default=1, help="process pool size, 0 = όλοι οι πυρήνες")
+    ap.add_argument("--errors", help="γράψε 'line<TAB>error' για κάθε γραμμή που παραλείφθηκε (default stderr)")
+    args = ap.parse_args(argv)
+
+    in_fmt = args.input_format or guess_format(args.input, "csv")
+    out_fmt = args.output_format or guess_format(args.output, "ndjson")
+    coef = load_coefficients(args.coefficients) if args.coefficients else DEFAULT_COEFFICIENTS
+    workers = args.workers or os.cpu_count() or 1
+
+    src = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    err = open(args.errors, "w", encoding="utf-8") if args.errors else sys.stderr
+    skipped = 0
+
+    def on_error(line, msg):
+        nonlocal skipped
+        skipped += 1
+        print(f"{line}\t{msg}", file=err)
+
+    try:
+        n = run(src, dst, in_fmt, out_fmt, coef, max(1, args.chunk_size), workers, on_error)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+        if err is not sys.stderr:
+            err.close()
+    print(f"{n} sessions planned, {skipped} rows skipped", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""Benchmarks + regression timing για το UF model και το rerun του app.
+
+Κάθε benchmark μετράει χρόνο ανά κλήση (repeat δείγματα) και κρατάει p50/p95.
+Το αποτέλεσμα γράφεται ως JSON baseline και ένα επόμενο run αποτυγχάνει (exit 1)
+αν κάποιο p50 ή p95 ξεπεράσει το baseline × threshold. Οι χρόνοι κανονικοποιούνται
+με ένα σταθερό calibration workload, ώστε ένα baseline από άλλο μηχάνημα να
+συγκρίνεται λογικά.
+
+    python uf_bench.py --save bench_baseline.json
+    python uf_bench.py --compare bench_baseline.json --threshold 1.5
+    python uf_bench.py --only plan_one app_rerun
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+# Το store του app σε προσωρινό αρχείο (πριν από οποιοδήποτε import του uf_store)
+os.environ.setdefault("UF_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="uf_bench_"), "sessions.sqlite3"))
+
+import numpy as np  # noqa: E402
+
+from uf_model import (  # noqa: E402
+    DEFAULT_COEFFICIENTS, LEARN_INPUTS, PLAN_INPUTS, as_columns, learn_one, overhydration_logit, plan_batch,
+    plan_one, update_offset,
+)
+from uf_snapshot import ndjson_lines, records, rows_to_inputs, snapshot_columns  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, number: int = 1):
+    """Register a factory that returns the callable to time; `number` calls per sample."""
+    def register(factory: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = (factory, number)
+        return factory
+    return register
+
+
+def _roster(n: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {
+        "age": rng.integers(30, 90, n), "weight": rng.uniform(45, 110, n), "idwg": rng.uniform(0.5, 4.5, n),
+        "tmp_end": rng.uniform(70, 110, n), "vp_end": rng.uniform(100, 140, n), "OH_L": rng.uniform(-1, 4, n),
+        "UF_actual_total": rng.uniform(1, 5, n), "outcome_last": rng.integers(0, 2, n),
+    }
+
+
+# ---------- Model ----------
+@benchmark("plan_one", number=100)
+def _plan_one():
+    x = dict(PLAN_INPUTS, idwg=3.4, OH_L=2.0)
+    return lambda: plan_one(x, DEFAULT_COEFFICIENTS)
+
+
+@benchmark("plan_batch_10k")
+def _plan_batch():
+    x = _roster(10_000)
+    return lambda: plan_batch(x, DEFAULT_COEFFICIENTS)
+
+
+@benchmark("overhydration_logit_10k", number=10)
+def _overhydration():
+    x = as_columns(_roster(10_000))
+    return lambda: overhydration_logit(x, DEFAULT_COEFFICIENTS)
+
+
+@benchmark("learn_one", number=100)
+def _learn_one():
+    x = {**PLAN_INPUTS, **LEARN_INPUTS, "UF_actual_total": 2.8, "outcome_last": 1}
+    plan = plan_one(x, DEFAULT_COEFFICIENTS)
+    return lambda: learn_one(x, DEFAULT_COEFFICIENTS, plan)
+
+
+@benchmark("update_offset_10k", number=10)
+def _update_offset():
+    rng = np.random.default_rng(1)
+    lin, target, cur = rng.normal(-2, 1, 10_000), rng.uniform(0.05, 0.4, 10_000), rng.normal(0, 0.3, 10_000)
+    return lambda: update_offset(lin, target, cur, 0.2)
+
+
+@benchmark("optimize_week_one", number=20)
+def _optimize_week():
+    from uf_trajectory import optimize_plan
+    x = dict(PLAN_INPUTS, idwg=3.4, OH_L=2.0)
+    return lambda: optimize_plan(x, DEFAULT_COEFFICIENTS, carry_L=0.3)
+
+
+# ---------- Snapshot serialization ----------
+@benchmark("snapshot_json_dumps", number=500)
+def _snapshot_dumps():
+    inputs = {k: np.asarray([v]) for k, v in PLAN_INPUTS.items()}
+    snapshot = next(records(snapshot_columns(inputs, DEFAULT_COEFFICIENTS)))
+    return lambda: json.dumps(snapshot, indent=2)
+
+
+@benchmark("snapshot_ndjson_1k")
+def _snapshot_ndjson():
+    x = _roster(1_000)
+    rows = [{k: v[i].item() for k, v in x.items()} for i in range(1_000)]
+    cols = snapshot_columns(rows_to_inputs(rows), DEFAULT_COEFFICIENTS)
+    return lambda: "".join(ndjson_lines(cols))
+
+
+# ---------- Streamlit rerun (AppTest) ----------
+@benchmark("app_rerun")
+def _app_rerun():
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=60).run()
+    if at.exception:
+        raise RuntimeError(f"app.py failed: {at.exception}")
+    idwg = next(w for w in at.number_input if w.label.startswith("IDWG"))
+    values = iter(np.tile([2.9, 3.1], 10_000).tolist())
+
+    def rerun():
+        idwg.set_value(next(values))
+        at.run()
+    return rerun
+
+
+# ---------- Runner ----------
+def calibrate(repeat: int = 20) -> float:
+    """Χρόνος ενός σταθερού NumPy + pure-Python workload (min από `repeat`)."""
+    a = np.random.default_rng(0).random(200_000)
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        np.sort(np.exp(a) * 1.5 + a)
+        sum(i * 0.5 for i in range(200_000))
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def measure(fn: Callable[[], object], number: int, repeat: int, warmup: int = 2) -> np.ndarray:
+    """Seconds per call, one sample per `number` calls (GC off, όπως στο timeit)."""
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(repeat)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(repeat):
+            t = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples[i] = (time.perf_counter() - t) / number
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+
+def run(names=None, repeat: int = 30) -> dict:
+    results = {"calibration_s": calibrate(), "benchmarks": {}}
+    for name, (factory, number) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        samples = measure(factory(), number, repeat if name != "app_rerun" else max(5, repeat // 3))
+        results["benchmarks"][name] = {
+            "p50_s": float(np.percentile(samples, 50)), "p95_s": float(np.percentile(samples, 95)),
+            "repeat": int(samples.size), "number": number,
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """[(name, stat, current, allowed)] for every stat above baseline × threshold (machine-scaled)."""
+    scale = results["calibration_s"] / baseline.get("calibration_s", results["calibration_s"])
+    regressions = []
+    for name, cur in results["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            continue
+        for stat in ("p50_s", "p95_s"):
+            allowed = base[stat] * scale * threshold
+            if cur[stat] > allowed:
+                regressions.append((name, stat, cur[stat], allowed))
+    return regressions
+
+
+def _fmt(s: float) -> str:
+    return f"{s * 1e6:10.1f} µs" if s < 1e-3 else f"{s * 1e3:10.2f} ms"
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Timing benchmarks with baseline regression check.")
+    ap.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="μόνο αυτά τα benchmarks")
+    ap.add_argument("--repeat", type=int, default=30, help="δείγματα ανά benchmark")
+    ap.add_argument("--save", help="γράψε τα αποτελέσματα ως baseline JSON")
+    ap.add_argument("--compare", help="baseline JSON για έλεγχο regression")
+    ap.add_argument("--threshold", type=float, default=1.5, help="επιτρεπτός λόγος προς το baseline")
+    args = ap.parse_args(argv)
+
+    results = run(args.only, max(3, args.repeat))
+    print(f"{'benchmark':26} {'p50':>13} {'p95':>13}")
+    for name, r in results["benchmarks"].items():
+        print(f"{name:26} {_fmt(r['p50_s'])} {_fmt(r['p95_s'])}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, stat, cur, allowed in regressions:
+            print(f"REGRESSION {name} {stat}: {_fmt(cur).strip()} > {_fmt(allowed).strip()}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
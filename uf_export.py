@@ -0,0 +1,190 @@
+"""Bulk export του session store: NDJSON, NDJSON.gz ή Parquet, σε streaming.
+
+Τα snapshots διαβάζονται από το SQLite σε batches και γράφονται αμέσως, άρα η
+μνήμη μένει σταθερή όσο μεγάλη κι αν είναι η εξαγωγή. Για NDJSON το αποθηκευμένο
+compact JSON γράφεται όπως είναι (χωρίς parse). Για Parquet κάθε batch γίνεται
+ένα row group με flat στήλες (uf_snapshot.COLUMNS) μέσω του JSON reader του pyarrow.
+
+    python uf_export.py -o march.ndjson.gz --since 2025-03-01 --until "2025-03-31 23:59"
+    python uf_export.py -o unit.parquet
+    python uf_export.py -o - --patient Case01 | jq .r_max_dyn
+"""
+import argparse
+import gzip
+import io
+import math
+import sys
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from uf_snapshot import COLUMNS, FIELDS, KINDS, flatten
+from uf_store import DEFAULT_PATH, SessionStore
+
+FORMATS = ("ndjson", "ndjson.gz", "parquet")
+
+
+def guess_format(path: str, default: str = "ndjson") -> str:
+    p = path.lower()
+    if p.endswith((".ndjson.gz", ".jsonl.gz", ".gz")):
+        return "ndjson.gz"
+    if p.endswith((".parquet", ".pq")):
+        return "parquet"
+    return default
+
+
+def _batches(it: Iterable[str], size: int) -> Iterator[list]:
+    it = iter(it)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ---------- NDJSON ----------
+
+
+def iter_ndjson(raw: Iterable[str], batch_size: int = 10_000) -> Iterator[bytes]:
+    """Compact JSON snapshots → NDJSON chunks (bytes), ένα ανά batch."""
+    for batch in _batches(raw, batch_size):
+        batch.append("")
+        yield "\n".join(batch).encode("utf-8")
+
+
+def iter_ndjson_gz(raw: Iterable[str], batch_size: int = 10_000, level: int = 3) -> Iterator[bytes]:
+    """Όπως iter_ndjson, αλλά ως ένα gzip stream σε κομμάτια."""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=level, mtime=0) as gz:
+        for chunk in iter_ndjson(raw, batch_size):
+            gz.write(chunk)
+            if buf.tell():
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+    yield buf.getvalue()
+
+
+# ---------- Parquet ----------
+
+
+def arrow_schema(nested: bool = False):
+    """pyarrow schema των snapshot στηλών· nested=True με structs symptoms/dialysate (όπως το JSON)."""
+    import pyarrow as pa
+
+    types = {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_()}
+    if not nested:
+        return pa.schema([(name, types[kind]) for _, name, kind in FIELDS])
+    fields, groups = [], {}
+    for path, _, kind in FIELDS:
+        if len(path) == 1:
+            fields.append((path[0], types[kind]))
+            continue
+        if path[0] not in groups:
+            groups[path[0]] = []
+            fields.append((path[0], groups[path[0]]))
+        groups[path[0]].append((path[1], types[kind]))
+    return pa.schema([(n, pa.struct(t) if isinstance(t, list) else t) for n, t in fields])
+
+
+# "symptoms.headache" → "headache", "dialysate.Na" → "dial_Na"
+_FLAT_NAMES = {".".join(path): name for path, name, _ in FIELDS}
+
+
+def _coerce(value, kind):
+    if value is None:
+        return None
+    if kind is str:
+        return str(value)
+    if kind is bool:
+        return bool(value)
+    if kind is int:
+        value = float(value)
+        return None if math.isnan(value) else int(value)
+    return float(value)
+
+
+def _batch_table(batch: list, nested_schema, flat_schema):
+    """Ένα batch compact JSON → flat pyarrow Table (fallback σε Python parse για άτυπα snapshots)."""
+    import pyarrow as pa
+    from pyarrow import json as pa_json
+
+    try:
+        table = pa_json.read_json(
+            io.BytesIO(("\n".join(batch) + "\n").encode("utf-8")),
+            parse_options=pa_json.ParseOptions(explicit_schema=nested_schema, unexpected_field_behavior="ignore"),
+        ).flatten()
+        table = table.rename_columns([_FLAT_NAMES.get(c, c) for c in table.column_names])
+        return table.select(list(COLUMNS)).cast(flat_schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        import json
+        rows = [flatten(json.loads(s)) for s in batch]
+        return pa.table(
+            {name: pa.array([_coerce(r.get(name), KINDS[name]) for r in rows], type=flat_schema.field(name).type)
+             for name in COLUMNS},
+            schema=flat_schema,
+        )
+
+
+def write_parquet(raw: Iterable[str], dst, batch_size: int = 20_000, compression: str = "zstd") -> int:
+    """Compact JSON snapshots → Parquet (ένα row group ανά batch); επιστρέφει το πλήθος."""
+    import pyarrow.parquet as pq
+
+    nested, flat = arrow_schema(nested=True), arrow_schema()
+    n = 0
+    with pq.ParquetWriter(dst, flat, compression=compression) as writer:
+        for batch in _batches(raw, batch_size):
+            writer.write_table(_batch_table(batch, nested, flat))
+            n += len(batch)
+    return n
+
+
+# ---------- Entry points ----------
+
+
+def export_sessions(store: SessionStore, dst, fmt: str = "ndjson", patient_id: Optional[str] = None,
+                    since: Optional[str] = None, until: Optional[str] = None, level: int = 3) -> int:
+    """Stream the matching sessions of `store` to `dst` (path ή binary file); returns the count."""
+    n = 0
+
+    def counted(it):
+        nonlocal n
+        for s in it:
+            n += 1
+            yield s
+
+    raw = counted(store.iter_raw(patient_id, since, until))
+    if fmt == "parquet":
+        return write_parquet(raw, dst)
+    chunks = iter_ndjson_gz(raw, level=level) if fmt == "ndjson.gz" else iter_ndjson(raw)
+    f = open(dst, "wb") if isinstance(dst, str) else dst
+    try:
+        for chunk in chunks:
+            f.write(chunk)
+    finally:
+        if f is not dst:
+            f.close()
+    return n
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Bulk export of stored sessions (NDJSON / NDJSON.gz / Parquet).")
+    ap.add_argument("-o", "--output", required=True, help="output file, '-' για stdout (NDJSON)")
+    ap.add_argument("--format", choices=FORMATS, help="default: από την κατάληξη του output")
+    ap.add_argument("--store", default=DEFAULT_PATH)
+    ap.add_argument("--patient", help="μόνο αυτός ο ασθενής")
+    ap.add_argument("--since", help="session_dt >= (π.χ. 2025-03-01)")
+    ap.add_argument("--until", help="session_dt <= (π.χ. '2025-03-31 23:59')")
+    ap.add_argument("--level", type=int, default=3, help="gzip compression level (3: ~2.5× ταχύτερο από 6, σχεδόν ίδιο μέγεθος)")
+    args = ap.parse_args(argv)
+
+    fmt = args.format or guess_format(args.output)
+    if args.output == "-" and fmt == "parquet":
+        ap.error("Parquet χρειάζεται αρχείο εξόδου")
+    dst = sys.stdout.buffer if args.output == "-" else args.output
+    n = export_sessions(SessionStore(args.store), dst, fmt, args.patient, args.since, args.until, args.level)
+    print(f"{n} sessions exported", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
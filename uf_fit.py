@@ -0,0 +1,241 @@
+"""Cohort refit των συντελεστών γ (υπόταση) και β (υπερυδάτωση) από ιστορικό συνεδριών.
+
+Features όπως στο app (uf_model.hypotension_features / overhydration_features):
+το μοντέλο υπότασης εκπαιδεύεται στο r_used_last με label το outcome_last.
+Για το μοντέλο υπερυδάτωσης χρειάζεται στήλη-label (--over-label), αφού το
+snapshot δεν έχει outcome υπερυδάτωσης.
+
+Solver: IRLS (Newton) με L2 ridge προς τους τρέχοντες συντελεστές (όχι στο
+intercept), k-fold CV σε process pool για την επιλογή του λ. Η έξοδος είναι
+JSON που διαβάζουν το app (sidebar) και τα CLI (--coefficients):
+
+    python uf_fit.py history.ndjson -o unit_fit.json --l2 0.1 1 10 --workers 0
+    python uf_fit.py --store uf_sessions.sqlite3 -o unit_fit.json --over-label overhydration_event
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from uf_batch import guess_format, read_rows
+from uf_model import (
+    DEFAULT_COEFFICIENTS, HYPOTENSION_TERMS, OVERHYDRATION_TERMS, Coefficients, as_columns,
+    hypotension_features, learn_batch, load_coefficients, overhydration_features, plan_batch,
+)
+from uf_snapshot import flatten, parse_float, rows_to_inputs
+from uf_store import SessionStore
+
+# ---------- Solver ----------
+
+
+def _loss(X, y, b, l2, prior, mask):
+    z = X @ b
+    # log(1 + e^z) - y·z, αριθμητικά σταθερό
+    nll = np.sum(np.logaddexp(0.0, z) - y * z)
+    return nll + 0.5 * l2 * np.sum(mask * (b - prior) ** 2)
+
+
+def fit_logistic(X, y, l2: float = 1.0, prior=None, max_iter: int = 50, tol: float = 1e-8):
+    """Ridge-penalized logistic regression by IRLS.
+
+    The penalty 0.5·l2·||b − prior||² skips column 0 (intercept). Returns
+    (b, covariance, n_iter); covariance is the inverse Hessian at b.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    k = X.shape[1]
+    prior = np.zeros(k) if prior is None else np.asarray(prior, dtype=np.float64)
+    mask = np.ones(k)
+    mask[0] = 0.0
+    b = prior.copy()
+    loss = _loss(X, y, b, l2, prior, mask)
+    for it in range(1, max_iter + 1):
+        p = 1.0 / (1.0 + np.exp(-(X @ b)))
+        grad = X.T @ (p - y) + l2 * mask * (b - prior)
+        H = (X * (p * (1.0 - p))[:, None]).T @ X + np.diag(l2 * mask + 1e-10)
+        step = np.linalg.solve(H, grad)
+        # Step halving: το Newton step δεν πρέπει να αυξάνει το loss
+        t = 1.0
+        while True:
+            b_new = b - t * step
+            loss_new = _loss(X, y, b_new, l2, prior, mask)
+            if loss_new <= loss or t < 1e-4:
+                break
+            t *= 0.5
+        b, loss_old, loss = b_new, loss, loss_new
+        if abs(loss_old - loss) <= tol * max(1.0, abs(loss)):
+            break
+    p = 1.0 / (1.0 + np.exp(-(X @ b)))
+    H = (X * (p * (1.0 - p))[:, None]).T @ X + np.diag(l2 * mask + 1e-10)
+    return b, np.linalg.inv(H), it
+
+
+def log_loss(y, p) -> float:
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def auc(y, score) -> float:
+    """ROC AUC (Mann–Whitney, μέσοι βαθμοί για ισοβαθμίες); NaN αν υπάρχει μία μόνο κλάση."""
+    y = np.asarray(y) > 0.5
+    n_pos, n_neg = int(y.sum()), int((~y).sum())
+    if n_pos == 0 or n_neg == 0:
+        return math.nan
+    uniq, inv, counts = np.unique(score, return_inverse=True, return_counts=True)
+    avg_rank = np.cumsum(counts) - (counts - 1) / 2.0
+    ranks = avg_rank[inv.ravel()]
+    return float((ranks[y].sum() - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg))
+
+
+# ---------- Cross-validation (process pool) ----------
+_CV_DATA = {}
+
+
+def _cv_init(X, y, prior):
+    _CV_DATA.update(X=X, y=y, prior=prior)
+
+
+def _cv_task(task):
+    l2, train, test = task
+    X, y, prior = _CV_DATA["X"], _CV_DATA["y"], _CV_DATA["prior"]
+    b, _, _ = fit_logistic(X[train], y[train], l2, prior)
+    p = 1.0 / (1.0 + np.exp(-(X[test] @ b)))
+    return l2, log_loss(y[test], p), auc(y[test], p)
+
+
+def cross_validate(X, y, l2_grid: Sequence[float], prior=None, folds: int = 5,
+                   workers: int = 1, seed: int = 0) -> dict:
+    """k-fold CV για κάθε λ του grid → {λ: {"log_loss": mean, "auc": mean}}."""
+    n = len(y)
+    folds = max(2, min(folds, n))
+    perm = np.random.default_rng(seed).permutation(n)
+    parts = np.array_split(perm, folds)
+    tasks = [
+        (l2, np.concatenate(parts[:i] + parts[i + 1:]), parts[i])
+        for l2 in l2_grid for i in range(folds)
+    ]
+    if workers == 1:
+        _cv_init(X, y, prior)
+        results = [_cv_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_cv_init, initargs=(X, y, prior)) as pool:
+            results = list(pool.map(_cv_task, tasks))
+    out = {}
+    for l2 in l2_grid:
+        rows = [r for r in results if r[0] == l2]
+        out[l2] = {
+            "log_loss": float(np.mean([r[1] for r in rows])),
+            "auc": float(np.nanmean([r[2] for r in rows])) if any(not math.isnan(r[2]) for r in rows) else None,
+        }
+    return out
+
+
+def fit_model(X, y, terms: Sequence[str], base: Coefficients, l2_grid: Sequence[float],
+              folds: int = 5, workers: int = 1, seed: int = 0) -> dict:
+    """CV over l2_grid, then refit on all rows with the best λ."""
+    prior = np.array([getattr(base, t) for t in terms], dtype=np.float64)
+    cv = cross_validate(X, y, l2_grid, prior, folds, workers, seed) if len(l2_grid) > 1 else {}
+    best = min(cv, key=lambda l2: cv[l2]["log_loss"]) if cv else l2_grid[0]
+    b, cov, n_iter = fit_logistic(X, y, best, prior)
+    return {
+        "terms": list(terms), "coefficients": dict(zip(terms, b.tolist())),
+        "covariance": cov.tolist(), "l2": best, "n_iter": n_iter,
+        "n_sessions": int(len(y)), "event_rate": float(np.mean(y)),
+        "cv": {str(k): v for k, v in cv.items()},
+    }
+
+
+# ---------- Features από snapshots ----------
+
+
+def hypotension_design(inputs, coef: Coefficients = DEFAULT_COEFFICIENTS):
+    """(X, y) για τις συνεδρίες με actuals (r_used_last) και outcome_last 0/1."""
+    plan = plan_batch(inputs, coef)
+    learn = learn_batch(inputs, coef, plan)
+    x = as_columns(inputs)
+    X = hypotension_features(x, plan["tmp_slope"], plan["vp_trend"], learn["r_used_last"])
+    y = np.broadcast_to(np.asarray(inputs.get("outcome_last", 0), dtype=np.float64), (X.shape[0],))
+    keep = np.isfinite(X).all(axis=1) & ((y == 0) | (y == 1))
+    return X[keep], y[keep]
+
+
+def overhydration_design(inputs, labels):
+    """(X, y) για τις συνεδρίες με label 0/1."""
+    X = overhydration_features(as_columns(inputs))
+    y = np.asarray(labels, dtype=np.float64)
+    keep = np.isfinite(X).all(axis=1) & ((y == 0) | (y == 1))
+    return X[keep], y[keep]
+
+
+def fit_cohort(rows: Iterable[dict], base: Coefficients = DEFAULT_COEFFICIENTS, l2_grid=(1.0,),
+               folds: int = 5, workers: int = 1, over_label: Optional[str] = None, seed: int = 0) -> dict:
+    """Flat snapshot rows → fitted coefficients + report (JSON-ready)."""
+    rows = list(rows)
+    inputs = rows_to_inputs(rows)
+    report = {"coefficients": base.as_dict(), "models": {}}
+
+    X, y = hypotension_design(inputs, base)
+    if len(y) and 0 < y.sum() < len(y):
+        report["models"]["hypotension"] = fit_model(X, y, HYPOTENSION_TERMS, base, l2_grid, folds, workers, seed)
+
+    if over_label:
+        labels = [parse_float(r.get(over_label)) for r in rows]
+        X, y = overhydration_design(inputs, labels)
+        if len(y) and 0 < y.sum() < len(y):
+            report["models"]["overhydration"] = fit_model(X, y, OVERHYDRATION_TERMS, base, l2_grid, folds, workers, seed)
+
+    for model in report["models"].values():
+        report["coefficients"].update(model["coefficients"])
+    return report
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Refit hypotension/overhydration coefficients from session history.")
+    ap.add_argument("inputs", nargs="*", help="snapshot files (.ndjson / .csv)")
+    ap.add_argument("--store", help="SQLite session store αντί για αρχεία")
+    ap.add_argument("-o", "--output", required=True, help="JSON με τους νέους συντελεστές + report")
+    ap.add_argument("--coefficients", help="αρχικοί συντελεστές / prior (default: sidebar defaults)")
+    ap.add_argument("--l2", type=float, nargs="+", default=[1.0], help="ridge λ grid (CV αν >1 τιμές)")
+    ap.add_argument("--folds", type=int, default=5)
+    ap.add_argument("--workers", type=int, default=1, help="process pool για το CV, 0 = όλοι οι πυρήνες")
+    ap.add_argument("--over-label", help="στήλη 0/1 για το μοντέλο υπερυδάτωσης")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    if args.store:
+        rows = (flatten(s) for s in SessionStore(args.store).iter_sessions())
+    elif args.inputs:
+        def file_rows():
+            for path in args.inputs:
+                fmt = guess_format(path, "ndjson")
+                with open(path, newline="", encoding="utf-8") as f:
+                    it = read_rows(f, fmt)
+                    if fmt == "csv":
+                        header = next(it, [])
+                        for r in it:
+                            yield dict(zip(header, r))
+                    else:
+                        yield from it
+        rows = file_rows()
+    else:
+        ap.error("δώστε αρχεία ή --store")
+
+    base = load_coefficients(args.coefficients) if args.coefficients else DEFAULT_COEFFICIENTS
+    report = fit_cohort(rows, base, args.l2, args.folds, args.workers or os.cpu_count() or 1,
+                        args.over_label, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    for name, model in report["models"].items():
+        print(f"{name}: n={model['n_sessions']} λ={model['l2']} iters={model['n_iter']}", file=sys.stderr)
+    if not report["models"]:
+        print("Δεν υπάρχουν αρκετά δεδομένα (και των δύο κλάσεων) για fit.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""Bulk import παλιών session.json (downloads του app) σε columnar πίνακα.
+
+Σαρώνει ένα δέντρο φακέλων για *.json, τα διαβάζει και τα ελέγχει με
+uf_snapshot.validate() σε process pool (chunks αρχείων ανά worker, ώστε το IPC
+να είναι ένα Arrow batch ανά chunk και όχι ένα dict ανά αρχείο). Τα χαλασμένα
+αρχεία αναφέρονται χωρίς να σταματά το run. Διπλότυπα στο (patient_id, session_dt)
+κρατούν το πιο πρόσφατα τροποποιημένο αρχείο. Το αποτέλεσμα είναι pyarrow Table
+με τις flat στήλες του snapshot, ταξινομημένο όπως το store.
+
+    python uf_import.py downloads/ -o history.parquet
+    python uf_import.py downloads/ --store uf_sessions.sqlite3 --errors bad.txt
+"""
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional
+
+from uf_export import arrow_schema
+from uf_snapshot import COLUMNS, nest, validate
+from uf_store import SessionStore
+
+
+def scan(root: str, suffix: str = ".json") -> Iterator[str]:
+    """Yield every file under `root` ending in `suffix` (os.scandir, χωρίς stat ανά αρχείο)."""
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(suffix):
+                    yield entry.path
+
+
+def chunked(it, size: int) -> Iterator[list]:
+    chunk = []
+    for x in it:
+        chunk.append(x)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _schema():
+    import pyarrow as pa
+
+    return arrow_schema().append(pa.field("_mtime", pa.float64())).append(pa.field("_path", pa.string()))
+
+
+def _arrays(cols: dict, mtimes: list, paths: list, schema) -> list:
+    import pyarrow as pa
+
+    arrays = [pa.array(cols[name], type=schema.field(name).type) for name in COLUMNS]
+    return arrays + [pa.array(mtimes, type=pa.float64()), pa.array(paths, type=pa.string())]
+
+
+def parse_chunk(paths: list) -> tuple:
+    """Read + validate a chunk of files → (Arrow RecordBatch με _mtime/_path, [(path, error)]).
+
+    Κάθε αποτυχία αφορά μόνο το δικό της αρχείο: καταγράφεται και το chunk συνεχίζει.
+    """
+    import pyarrow as pa
+
+    schema = _schema()
+    rows, errors = [], []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                row = validate(json.loads(f.read()))
+                mtime = os.fstat(f.fileno()).st_mtime
+        except Exception as e:  # noqa: BLE001 — JSON/Unicode/Overflow/OS: το αρχείο απορρίπτεται
+            errors.append((path, f"{type(e).__name__}: {e}"))
+            continue
+        rows.append((path, mtime, row))
+
+    def build(rows):
+        cols = {name: [row[name] for _, _, row in rows] for name in COLUMNS}
+        return _arrays(cols, [m for _, m, _ in rows], [p for p, _, _ in rows], schema)
+
+    try:
+        arrays = build(rows)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # Σπάνιο: κάποια γραμμή δεν χωράει στο schema — απομόνωση ανά αρχείο
+        good = []
+        for r in rows:
+            try:
+                build([r])
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError) as e:
+                errors.append((r[0], f"{type(e).__name__}: {e}"))
+            else:
+                good.append(r)
+        arrays = build(good)
+    return pa.RecordBatch.from_arrays(arrays, schema=schema), errors
+
+
+def dedup(table):
+    """Ένα row ανά (patient_id, session_dt): το πιο πρόσφατο _mtime (μετά το _path)."""
+    import numpy as np
+
+    table = table.sort_by([("patient_id", "ascending"), ("session_dt", "ascending"),
+                           ("_mtime", "descending"), ("_path", "descending")])
+    if table.num_rows < 2:
+        return table
+    pid = table.column("patient_id").to_numpy(zero_copy_only=False)
+    dt = table.column("session_dt").to_numpy(zero_copy_only=False)
+    keep = np.ones(table.num_rows, dtype=bool)
+    keep[1:] = (pid[1:] != pid[:-1]) | (dt[1:] != dt[:-1])
+    return table.filter(keep)
+
+
+def import_sessions(root: str, workers: int = 0, chunk_size: int = 1000, on_error=None) -> dict:
+    """Scan `root`, parse/validate in parallel and dedup.
+
+    Returns {"table": pyarrow Table (COLUMNS + _mtime/_path), "files", "errors", "duplicates"}.
+    `on_error(path, message)` καλείται για κάθε χαλασμένο αρχείο όσο τρέχει το import.
+    """
+    import pyarrow as pa
+
+    workers = workers or os.cpu_count() or 1
+    batches, n_errors, n_files = [], 0, 0
+
+    def collect(batch, errors):
+        nonlocal n_errors, n_files
+        batches.append(batch)
+        n_errors += len(errors)
+        n_files += batch.num_rows + len(errors)
+        if on_error is not None:
+            for path, msg in errors:
+                on_error(path, msg)
+
+    chunks = chunked(scan(root), max(1, chunk_size))
+    if workers == 1:
+        for paths in chunks:
+            collect(*parse_chunk(paths))
+    else:
+        # Φραγμένος αριθμός chunks σε πτήση (όπως στο uf_batch) — η σάρωση προχωρά παράλληλα
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for paths in chunks:
+                pending.append(pool.submit(parse_chunk, paths))
+                if len(pending) >= 4 * workers:
+                    collect(*pending.popleft().result())
+            while pending:
+                collect(*pending.popleft().result())
+
+    table = pa.Table.from_batches(batches, schema=_schema())
+    unique = dedup(table)
+    return {"table": unique, "files": n_files, "errors": n_errors, "duplicates": table.num_rows - unique.num_rows}
+
+
+def sessions_table(table):
+    """Χωρίς τις βοηθητικές στήλες _mtime/_path."""
+    return table.select(list(COLUMNS))
+
+
+def write_table(table, path: str) -> None:
+    """Parquet (default) ή Arrow IPC/Feather για .arrow/.feather."""
+    if path.lower().endswith((".arrow", ".feather")):
+        import pyarrow.feather as feather
+        feather.write_feather(table, path, compression="zstd")
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, compression="zstd")
+
+
+def load_into_store(table, store: SessionStore, batch_size: int = 10_000) -> int:
+    """Upsert τα imported snapshots στο session store (nested, όπως τα γράφει το app)."""
+    n = 0
+    for batch in table.to_batches(batch_size):
+        n += store.append_many(nest(row) for row in batch.to_pylist())
+    return n
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Parallel import of session.json files (validate + dedup).")
+    ap.add_argument("root", help="φάκελος με session.json (αναδρομικά)")
+    ap.add_argument("-o", "--output", help="columnar έξοδος (.parquet, .arrow/.feather)")
+    ap.add_argument("--store", help="upsert και στο SQLite session store")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size, 0 = όλοι οι πυρήνες")
+    ap.add_argument("--chunk-size", type=int, default=1000, help="αρχεία ανά task του pool")
+    ap.add_argument("--errors", help="γράψε 'path<TAB>error' για κάθε χαλασμένο αρχείο εδώ (default stderr)")
+    args = ap.parse_args(argv)
+    if not args.output and not args.store:
+        ap.error("χρειάζεται -o και/ή --store")
+
+    err = open(args.errors, "w", encoding="utf-8") if args.errors else sys.stderr
+    try:
+        result = import_sessions(args.root, args.workers, args.chunk_size,
+                                 on_error=lambda path, msg: print(f"{path}\t{msg}", file=err))
+    finally:
+        if err is not sys.stderr:
+            err.close()
+
+    table = sessions_table(result["table"])
+    if args.output:
+        write_table(table, args.output)
+    if args.store:
+        load_into_store(table, SessionStore(args.store))
+    print(f"{result['files']} files: {table.num_rows} sessions imported, "
+          f"{result['duplicates']} duplicates dropped, {result['errors']} malformed", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
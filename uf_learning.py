@@ -0,0 +1,97 @@
+"""Per-patient γ0_offset learning across the full session history.
+
+Το state ανά ασθενή είναι μόνο το offset μετά την τελευταία συνεδρία: κάθε νέα
+συνεδρία το ενημερώνει σε O(1) (βλ. uf_store.SessionStore.append_many).
+Το replay ξαναχτίζει όλες τις τροχιές από τα αποθηκευμένα snapshots, π.χ. όταν
+αλλάζει το α ή οι συντελεστές γ: όλοι οι ασθενείς προχωρούν μαζί, ένα βήμα
+(k-οστή συνεδρία) τη φορά, με vectorized update πάνω σε όλους.
+
+    python uf_learning.py --alpha 0.2 --coefficients unit.json
+"""
+import argparse
+import sys
+from typing import Mapping, Optional
+
+import numpy as np
+
+from uf_model import DEFAULT_COEFFICIENTS, Coefficients, learn_batch, load_coefficients, update_offset
+from uf_snapshot import flatten, rows_to_inputs
+from uf_store import DEFAULT_PATH, SessionStore
+
+
+def replay_offsets(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS,
+                   alpha: Optional[float] = None, initial_offset: float = 0.0) -> dict:
+    """Replay the γ0_offset recursion for every patient in `inputs`.
+
+    `inputs` are columns as from rows_to_inputs(), including patient_id and
+    session_dt (any order). `alpha` overrides the per-session α. Returns
+    per-session gamma0_offset_current/updated aligned with the input rows, and
+    per-patient final offsets.
+    """
+    patient_id = np.asarray(inputs["patient_id"], dtype=object)
+    session_dt = np.asarray(inputs["session_dt"], dtype=object)
+    n = patient_id.size
+
+    # Όροι που δεν εξαρτώνται από το offset: ένα vectorized pass για όλες τις συνεδρίες
+    learn = learn_batch(inputs, coef)
+    lin_old_base = np.broadcast_to(learn["lin_old_base"], n)
+    p_target = np.broadcast_to(learn["p_target"], n)
+    alphas = np.broadcast_to(np.asarray(inputs.get("alpha", 0.2) if alpha is None else alpha, dtype=np.float64), n)
+
+    patients, pat = np.unique(patient_id.astype(str), return_inverse=True)
+    order = np.lexsort((session_dt.astype(str), pat))
+    counts = np.bincount(pat, minlength=patients.size)
+    starts = np.cumsum(counts) - counts
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - np.repeat(starts, counts)
+
+    # Ομαδοποίηση ανά k: by_k[bounds[k]:bounds[k+1]] = οι k-οστές συνεδρίες όλων των ασθενών
+    by_k = np.argsort(rank, kind="stable")
+    bounds = np.searchsorted(rank[by_k], np.arange(counts.max(initial=0) + 1))
+
+    offset = np.full(patients.size, initial_offset, dtype=np.float64)
+    current = np.empty(n)
+    updated = np.empty(n)
+    for k in range(bounds.size - 1):
+        rows = by_k[bounds[k]:bounds[k + 1]]
+        p = pat[rows]
+        current[rows] = offset[p]
+        _, _, new = update_offset(lin_old_base[rows], p_target[rows], offset[p], alphas[rows])
+        updated[rows] = new
+        offset[p] = new
+
+    last_dt = session_dt[order[starts + counts - 1]]
+    return {
+        "gamma0_offset_current": current, "gamma0_offset_updated": updated,
+        "patients": patients, "final_offset": offset, "n_sessions": counts,
+        "last_session_dt": last_dt,
+    }
+
+
+def rebuild_learning_state(store: SessionStore, coef: Coefficients = DEFAULT_COEFFICIENTS,
+                           alpha: Optional[float] = None) -> dict:
+    """Replay όλο το ιστορικό του store και αντικατάσταση του learning_state."""
+    rows = [flatten(s) for s in store.iter_sessions()]
+    result = replay_offsets(rows_to_inputs(rows), coef, alpha)
+    store.replace_learning_states(zip(
+        result["patients"].tolist(), result["final_offset"].tolist(),
+        result["n_sessions"].tolist(), [str(d) for d in result["last_session_dt"]],
+    ))
+    return result
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Rebuild per-patient γ0_offset state from stored sessions.")
+    ap.add_argument("--store", default=DEFAULT_PATH)
+    ap.add_argument("--coefficients", help="JSON με συντελεστές (default: sidebar defaults)")
+    ap.add_argument("--alpha", type=float, help="learning rate για όλες τις συνεδρίες (default: το α κάθε snapshot)")
+    args = ap.parse_args(argv)
+
+    coef = load_coefficients(args.coefficients) if args.coefficients else DEFAULT_COEFFICIENTS
+    result = rebuild_learning_state(SessionStore(args.store), coef, args.alpha)
+    print(f"{result['patients'].size} patients, {int(result['n_sessions'].sum())} sessions replayed", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Live intra-session TMP/VP monitoring από το feed των μηχανημάτων.
+
+Κάθε γραμμή του feed είναι ένα δείγμα ανά chair, NDJSON
+{"chair": "A1", "t": 1718000000.0, "tmp": 82.0, "vp": 121.0} ή CSV
+chair,t,tmp,vp (t σε δευτερόλεπτα). Για κάθε chair κρατάμε ring buffer
+σταθερού μεγέθους και αθροίσματα ελαχίστων τετραγώνων, οπότε το slope
+ενημερώνεται σε O(1) ανά δείγμα. Σε κάθε tick το r_max_dyn και τα alerts
+ξαναϋπολογίζονται για όλες τις chairs σε ένα plan_batch().
+
+    python uf_live.py feed.ndjson --roster shift.csv --follow
+    python uf_live.py --listen 127.0.0.1:9100 --roster shift.csv
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from array import array
+from typing import Iterator, Mapping, Optional
+
+import numpy as np
+
+from uf_model import DEFAULT_COEFFICIENTS, PLAN_INPUTS, Coefficients, alert_strings, load_coefficients, plan_batch
+from uf_snapshot import parse_float, table_to_inputs
+
+
+class ChairTrend:
+    """Ring buffer των τελευταίων `capacity` δειγμάτων + online slope (mmHg/h) για TMP και VP."""
+
+    __slots__ = ("capacity", "t", "tmp", "vp", "head", "n", "t0", "evictions",
+                 "s_t", "s_tt", "s_tmp", "s_vp", "s_ttmp", "s_tvp", "last_t")
+
+    def __init__(self, capacity: int = 1800):
+        self.capacity = capacity
+        self.t = array("d", bytes(8 * capacity))
+        self.tmp = array("d", bytes(8 * capacity))
+        self.vp = array("d", bytes(8 * capacity))
+        self.head = 0  # θέση της επόμενης εγγραφής
+        self.n = 0
+        self.t0 = None
+        self.evictions = 0
+        self.last_t = None
+        self.s_t = self.s_tt = self.s_tmp = self.s_vp = self.s_ttmp = self.s_tvp = 0.0
+
+    def add(self, t_sec: float, tmp: float, vp: float) -> None:
+        if self.t0 is None:
+            self.t0 = t_sec
+        th = (t_sec - self.t0) / 3600.0  # ώρες από το πρώτο δείγμα
+        i = self.head
+        if self.n == self.capacity:
+            ot, otmp, ovp = self.t[i], self.tmp[i], self.vp[i]
+            self.s_t -= ot; self.s_tt -= ot * ot
+            self.s_tmp -= otmp; self.s_vp -= ovp
+            self.s_ttmp -= ot * otmp; self.s_tvp -= ot * ovp
+            self.evictions += 1
+        else:
+            self.n += 1
+        self.t[i], self.tmp[i], self.vp[i] = th, tmp, vp
+        self.s_t += th; self.s_tt += th * th
+        self.s_tmp += tmp; self.s_vp += vp
+        self.s_ttmp += th * tmp; self.s_tvp += th * vp
+        self.head = (i + 1) % self.capacity
+        self.last_t = t_sec
+        # Περιοδικός επανυπολογισμός των αθροισμάτων: όχι συσσώρευση σφάλματος (O(1) amortized)
+        if self.evictions >= self.capacity:
+            self._resum()
+
+    def _resum(self) -> None:
+        t = np.frombuffer(self.t, dtype=np.float64)
+        tmp = np.frombuffer(self.tmp, dtype=np.float64)
+        vp = np.frombuffer(self.vp, dtype=np.float64)
+        self.s_t, self.s_tt = float(t.sum()), float(t @ t)
+        self.s_tmp, self.s_vp = float(tmp.sum()), float(vp.sum())
+        self.s_ttmp, self.s_tvp = float(t @ tmp), float(t @ vp)
+        self.evictions = 0
+
+    def slopes(self) -> tuple:
+        """(tmp_slope, vp_trend) σε mmHg/h· NaN με <2 δείγματα ή μηδενικό χρονικό εύρος."""
+        n = self.n
+        if n < 2:
+            return math.nan, math.nan
+        mean_t = self.s_t / n
+        sxx = self.s_tt - self.s_t * mean_t
+        if sxx <= 1e-12:
+            return math.nan, math.nan
+        return (self.s_ttmp - mean_t * self.s_tmp) / sxx, (self.s_tvp - mean_t * self.s_vp) / sxx
+
+
+class Ward:
+    """Chairs της βάρδιας: online trends + vectorized plan για όλες μαζί."""
+
+    def __init__(self, roster: Optional[Mapping] = None, coef: Coefficients = DEFAULT_COEFFICIENTS,
+                 capacity: int = 1800):
+        self.coef = coef
+        self.capacity = capacity
+        self.chairs = []  # σειρά = γραμμή στα arrays
+        self.index = {}
+        self.trends = []
+        self.inputs = {k: [] for k in PLAN_INPUTS}
+        self.patient_ids = []
+        self.dropped = 0  # δείγματα με μη πεπερασμένο t/tmp/vp (κενά κελιά, NaN)
+        self._roster = dict(roster or {})
+
+    def _chair(self, chair: str) -> int:
+        i = self.index.get(chair)
+        if i is None:
+            i = self.index[chair] = len(self.chairs)
+            self.chairs.append(chair)
+            self.trends.append(ChairTrend(self.capacity))
+            row = self._roster.get(chair, {})
+            for k, default in PLAN_INPUTS.items():
+                self.inputs[k].append(row.get(k, default))
+            self.patient_ids.append(row.get("patient_id", ""))
+        return i
+
+    def ingest(self, chair: str, t_sec: float, tmp: float, vp: float) -> bool:
+        """Add one sample; non-finite samples are counted in `dropped` and skipped."""
+        if not (math.isfinite(t_sec) and math.isfinite(tmp) and math.isfinite(vp)):
+            self.dropped += 1
+            return False
+        self.trends[self._chair(chair)].add(t_sec, tmp, vp)
+        return True
+
+    def evaluate(self) -> dict:
+        """Plan outputs for every chair with the live slopes (roster estimate where NaN)."""
+        slopes = np.array([tr.slopes() for tr in self.trends], dtype=np.float64).reshape(-1, 2)
+        cols = {k: np.asarray(v, dtype=np.float64) for k, v in self.inputs.items()}
+        out = plan_batch(cols, self.coef, {"tmp_slope": slopes[:, 0], "vp_trend": slopes[:, 1]})
+        out["alert_text"] = alert_strings(out, self.coef)
+        return out
+
+
+def load_roster(path) -> dict:
+    """Roster CSV (path ή text file) με στήλη `chair` → {chair: {field: value}} (κενά → widget defaults)."""
+    f = open(path, newline="", encoding="utf-8") if isinstance(path, str) else path
+    try:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        rows = [[None if v == "" else v for v in r] for r in reader if r]
+    finally:
+        if f is not path:
+            f.close()
+    cols = table_to_inputs(header, rows)
+    chair_col = header.index("chair")
+    roster = {}
+    for j, r in enumerate(rows):
+        roster[r[chair_col]] = {k: (cols[k][j] if isinstance(cols[k], list) else float(cols[k][j]))
+                                for k in list(PLAN_INPUTS) + ["patient_id"]}
+    return roster
+
+
+def parse_sample(line: str) -> Optional[tuple]:
+    """NDJSON ή CSV γραμμή → (chair, t_sec, tmp, vp); None για header/κενές/άκυρες γραμμές."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        if line.startswith("{"):
+            d = json.loads(line)
+            return str(d["chair"]), float(d["t"]), float(d["tmp"]), float(d["vp"])
+        chair, t, tmp, vp = line.split(",")[:4]
+        return chair, parse_float(t), parse_float(tmp), parse_float(vp)
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def follow_lines(path: str, follow: bool = True, poll: float = 0.2) -> Iterator[Optional[str]]:
+    """Γραμμές αρχείου (tail -f με follow); None όταν δεν υπάρχει νέα γραμμή."""
+    with open(path, encoding="utf-8") as f:
+        pending = ""
+        while True:
+            chunk = f.readline()
+            if chunk:
+                pending += chunk
+                if pending.endswith("\n"):
+                    yield pending
+                    pending = ""
+                continue
+            if not follow:
+                if pending:
+                    yield pending
+                return
+            yield None
+            time.sleep(poll)
+
+
+def socket_lines(host: str, port: int, poll: float = 0.2) -> Iterator[Optional[str]]:
+    """TCP stand-in για το feed: κάθε σύνδεση στέλνει γραμμές· None σε idle."""
+    lines = queue.Queue()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                lines.put(raw.decode("utf-8", "replace"))
+
+    server = socketserver.ThreadingTCPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        while True:
+            try:
+                yield lines.get(timeout=poll)
+            except queue.Empty:
+                yield None
+    finally:
+        server.shutdown()
+
+
+def monitor(lines: Iterator[Optional[str]], ward: Ward, out=sys.stdout, interval: float = 1.0) -> None:
+    """Ingest samples; κάθε `interval` δευτ. γράφει NDJSON για chairs που άλλαξαν alerts ή r_max_dyn."""
+    last = {}
+    next_tick = time.monotonic() + interval
+
+    def tick():
+        res = ward.evaluate()
+        r_max = res["r_max_dyn"].tolist()
+        for i, chair in enumerate(ward.chairs):
+            state = (round(r_max[i], 2), res["alert_text"][i])
+            if last.get(chair) != state:
+                last[chair] = state
+                out.write(json.dumps({
+                    "chair": chair, "patient_id": ward.patient_ids[i], "t": ward.trends[i].last_t,
+                    "tmp_slope": float(res["tmp_slope"][i]), "vp_trend": float(res["vp_trend"][i]),
+                    "r_max_dyn": r_max[i], "UF_cap_L": float(res["UF_cap_L"][i]),
+                    "alerts": res["alert_text"][i],
+                }, ensure_ascii=False) + "\n")
+        out.flush()
+
+    for line in lines:
+        if line is not None:
+            sample = parse_sample(line)
+            if sample is not None:
+                ward.ingest(*sample)
+        if time.monotonic() >= next_tick:
+            tick()
+            next_tick = time.monotonic() + interval
+    tick()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Live TMP/VP trend monitoring per chair.")
+    ap.add_argument("feed", nargs="?", help="feed file (NDJSON/CSV), '-' για stdin")
+    ap.add_argument("--follow", action="store_true", help="tail -f του feed file")
+    ap.add_argument("--listen", help="host:port για TCP feed αντί για αρχείο")
+    ap.add_argument("--roster", help="CSV με στήλη chair + τα inputs του Plan tab")
+    ap.add_argument("--coefficients", help="JSON με συντελεστές/thresholds")
+    ap.add_argument("--window", type=int, default=1800, help="δείγματα ανά chair στο ring buffer")
+    ap.add_argument("--interval", type=float, default=1.0, help="δευτ. ανάμεσα στους επανυπολογισμούς")
+    args = ap.parse_args(argv)
+
+    coef = load_coefficients(args.coefficients) if args.coefficients else DEFAULT_COEFFICIENTS
+    ward = Ward(load_roster(args.roster) if args.roster else None, coef, args.window)
+    if args.listen:
+        host, port = args.listen.rsplit(":", 1)
+        lines = socket_lines(host, int(port))
+    elif args.feed and args.feed != "-":
+        if not os.path.exists(args.feed):
+            ap.error(f"feed not found: {args.feed}")
+        lines = follow_lines(args.feed, args.follow)
+    else:
+        lines = iter(sys.stdin)
+    try:
+        monitor(lines, ward, interval=args.interval)
+    except KeyboardInterrupt:
+        pass
+    if ward.dropped:
+        print(f"{ward.dropped} samples dropped (non-finite t/tmp/vp)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
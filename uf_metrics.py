@@ -0,0 +1,215 @@
+"""Opt-in χρονομέτρηση των stages του app.py ανά rerun.
+
+Ενεργοποίηση με UF_METRICS=1. Τότε κάθε stage (sidebar, plan inputs, plan compute,
+plan render, learning, export, bulk export, ward, schedule) καταγράφεται σε histogram ανά
+Streamlit session και συνολικά, με p50/p95/p99 από τα πιο πρόσφατα δείγματα.
+Προαιρετικά:
+
+    UF_METRICS_PORT=9464      Prometheus text στο http://127.0.0.1:9464/metrics
+    UF_METRICS_LOG=stages.log rotating log, μία γραμμή ανά stage
+
+Χωρίς UF_METRICS το stage_timer() επιστρέφει NULL_TIMER, με lap() που δεν κάνει τίποτα.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+import numpy as np
+
+METRICS_ENABLED = os.environ.get("UF_METRICS", "").strip().lower() not in ("", "0", "false", "no")
+
+STAGES = (
+    "sidebar", "plan_inputs", "plan_compute", "plan_render", "what_if", "uncertainty", "trajectory",
+    "learning", "export", "bulk_export", "history", "ward", "schedule",
+)
+QUANTILES = (0.5, 0.95, 0.99)
+# Prometheus buckets (δευτερόλεπτα): 0.1 ms … 2.5 s
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class LatencyHistogram:
+    """Cumulative-bucket histogram + τα τελευταία `window` δείγματα για quantiles."""
+
+    def __init__(self, window: int = 2048):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)  # τελευταίο = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.bucket_counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def quantiles(self, qs=QUANTILES) -> list:
+        if not self.recent:
+            return [float("nan")] * len(qs)
+        return np.quantile(np.fromiter(self.recent, dtype=np.float64), qs).tolist()
+
+
+class StageMetrics:
+    """Histogram ανά stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = LatencyHistogram()
+        hist.observe(seconds)
+
+    def summary(self) -> list:
+        """[{stage, count, p50_ms, p95_ms, p99_ms}] με τη σειρά του STAGES."""
+        order = sorted(self.stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES))
+        rows = []
+        for stage in order:
+            hist = self.stages[stage]
+            p50, p95, p99 = hist.quantiles()
+            rows.append({"stage": stage, "count": hist.count,
+                         "p50_ms": p50 * 1e3, "p95_ms": p95 * 1e3, "p99_ms": p99 * 1e3})
+        return rows
+
+
+class MetricsRegistry:
+    """Συνολικά + ανά session stage metrics (thread-safe), με προαιρετικό rotating log."""
+
+    def __init__(self, log_path: Optional[str] = None, max_sessions: int = 256):
+        self.total = StageMetrics()
+        self.sessions = OrderedDict()
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._log = None
+        if log_path:
+            self._log = logging.getLogger("uf_metrics")
+            self._log.setLevel(logging.INFO)
+            self._log.propagate = False
+            if not self._log.handlers:
+                handler = RotatingFileHandler(log_path, maxBytes=5_000_000, backupCount=3, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                self._log.addHandler(handler)
+
+    def observe(self, session: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.total.observe(stage, seconds)
+            metrics = self.sessions.get(session)
+            if metrics is None:
+                metrics = self.sessions[session] = StageMetrics()
+                if len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            else:
+                self.sessions.move_to_end(session)
+            metrics.observe(stage, seconds)
+        if self._log is not None:
+            self._log.info("session=%s stage=%s ms=%.3f", session, stage, seconds * 1e3)
+
+    def session_summary(self, session: str) -> list:
+        with self._lock:
+            metrics = self.sessions.get(session)
+            return metrics.summary() if metrics is not None else []
+
+    def total_summary(self) -> list:
+        with self._lock:
+            return self.total.summary()
+
+    def timer(self, session: str) -> "LapTimer":
+        return LapTimer(self, session)
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP uf_stage_seconds Latency of app.py stages per rerun.",
+            "# TYPE uf_stage_seconds histogram",
+        ]
+        quantile_lines = [
+            "# HELP uf_stage_seconds_recent Quantiles over the most recent samples.",
+            "# TYPE uf_stage_seconds_recent gauge",
+        ]
+        with self._lock:
+            for stage, hist in self.total.stages.items():
+                cumulative = 0
+                for le, n in zip(BUCKETS + (float("inf"),), hist.bucket_counts):
+                    cumulative += n
+                    le_text = "+Inf" if le == float("inf") else repr(le)
+                    lines.append(f'uf_stage_seconds_bucket{{stage="{stage}",le="{le_text}"}} {cumulative}')
+                lines.append(f'uf_stage_seconds_sum{{stage="{stage}"}} {hist.sum!r}')
+                lines.append(f'uf_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+                for q, v in zip(QUANTILES, hist.quantiles()):
+                    quantile_lines.append(f'uf_stage_seconds_recent{{stage="{stage}",quantile="{q}"}} {v!r}')
+            sessions = len(self.sessions)
+        lines += quantile_lines
+        lines += ["# TYPE uf_sessions_tracked gauge", f"uf_sessions_tracked {sessions}"]
+        return "\n".join(lines) + "\n"
+
+
+class LapTimer:
+    """lap(stage) καταγράφει τον χρόνο από το προηγούμενο lap/restart (ή τη δημιουργία) ως το stage."""
+
+    __slots__ = ("registry", "session", "t0")
+
+    def __init__(self, registry: MetricsRegistry, session: str):
+        self.registry = registry
+        self.session = session
+        self.t0 = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        t = time.perf_counter()
+        self.registry.observe(self.session, stage, t - self.t0)
+        self.t0 = t
+
+    def restart(self) -> None:
+        self.t0 = time.perf_counter()
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def lap(self, stage: str) -> None:
+        pass
+
+    def restart(self) -> None:
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+def serve(registry: MetricsRegistry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Prometheus text endpoint (GET /metrics) σε daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="uf-metrics-http", daemon=True).start()
+    return server
+
+
+def registry_from_env() -> Optional[MetricsRegistry]:
+    """MetricsRegistry (+ endpoint/log από τα UF_METRICS_* env vars), ή None αν UF_METRICS είναι off."""
+    if not METRICS_ENABLED:
+        return None
+    registry = MetricsRegistry(os.environ.get("UF_METRICS_LOG") or None)
+    port = os.environ.get("UF_METRICS_PORT")
+    if port:
+        serve(registry, int(port))
+    return registry
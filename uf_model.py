@@ -0,0 +1,413 @@
+"""UF model engine — pure, UI-independent NumPy version of the Plan tab math.
+
+Όλες οι συναρτήσεις δέχονται columnar inputs (dict με arrays ή scalars, ένα
+στοιχείο ανά συνεδρία) και επιστρέφουν dict με arrays, ώστε μία κλήση να
+υπολογίζει ολόκληρη βάρδια (ή ιστορικό) σε ένα NumPy pass.
+Τα ονόματα των πεδίων είναι ίδια με τα widgets/το "Export snapshot (JSON)".
+"""
+import json
+import math
+from dataclasses import dataclass, fields
+from typing import Mapping
+
+import numpy as np
+
+
+# ---------- Coefficients & thresholds (sidebar defaults) ----------
+@dataclass(frozen=True)
+class Coefficients:
+    # Hypotension model (logistic)
+    gamma0: float = -2.6
+    gamma1: float = 0.10
+    g_meds: float = 0.25
+    g_tmp: float = 0.10
+    g_vp: float = 0.08
+    g_age: float = 0.12
+    g_dm: float = 0.15
+    g_press: float = 0.07
+    # Safety bounds & guards
+    tau_default: float = 20.0
+    rmin: float = 0.5
+    rmax: float = 13.0
+    tmp_thr: float = 2.0
+    vp_thr: float = 1.5
+    bp_drop_thr: float = 20.0
+    safety_mult: float = 0.85
+    round_step: int = 5
+    # Overhydration model (logistic)
+    beta0: float = -2.2
+    b_OH: float = 0.55
+    b_dysp: float = 0.70
+    b_edm: float = 0.35
+    b_ef: float = 0.40
+    b_af: float = 0.30
+    omega_target: float = 10.0
+    # Cardio/renal modifiers
+    g_as: float = 0.40
+    g_mr: float = 0.05
+    b_dm_over: float = 0.12
+    b_mr_over: float = 0.25
+    b_urine: float = 0.35
+
+    def as_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "Coefficients":
+        types = {f.name: f.type for f in fields(cls)}
+        unknown = set(data) - set(types)
+        if unknown:
+            raise ValueError(f"Unknown coefficient(s): {', '.join(sorted(unknown))}")
+        return cls(**{k: types[k](v) for k, v in data.items()})
+
+
+DEFAULT_COEFFICIENTS = Coefficients()
+
+
+def coefficients_from_json(data: Mapping, base: Coefficients = DEFAULT_COEFFICIENTS) -> Coefficients:
+    """Coefficients από flat {field: value} ή από την έξοδο του uf_fit ({"coefficients": {...}, ...}).
+
+    Όσα πεδία λείπουν κρατούν την τιμή του `base`· άγνωστα πεδία → ValueError.
+    """
+    if isinstance(data.get("coefficients"), Mapping):
+        data = data["coefficients"]
+    return Coefficients.from_dict({**base.as_dict(), **data})
+
+
+def load_coefficients(path: str) -> Coefficients:
+    with open(path, encoding="utf-8") as f:
+        return coefficients_from_json(json.load(f))
+
+
+def load_profiles(path: str) -> dict:
+    """Named unit profiles από JSON {name: {field: value} ή έξοδος uf_fit}.
+
+    Returns {name: {"coefficients": Coefficients, "models": fitted models του uf_fit ή {}}}.
+    Κάθε προφίλ ξεκινά από τα sidebar defaults· ένα λάθος πεδίο → ValueError με το όνομα του προφίλ.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, Mapping):
+        raise ValueError(f"expected a JSON object of profiles, got {type(data).__name__}")
+    if isinstance(data.get("profiles"), Mapping):
+        data = data["profiles"]
+    profiles = {}
+    for name, entry in data.items():
+        try:
+            profiles[str(name)] = {
+                "coefficients": coefficients_from_json(entry),
+                "models": dict(entry.get("models") or {}),
+            }
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ValueError(f"profile {name!r}: {e}") from e
+    return profiles
+
+
+# ---------- Per-session inputs (Plan tab widget defaults) ----------
+PLAN_INPUTS = {
+    "age": 72, "weight": 72.0, "duration_min": 240,
+    "idwg": 2.9, "intake_L": 0.40, "rinseback_L": 0.36, "iv_L": 0.0,
+    "meds_recent": 1, "dm": 0, "dP_atm_10hPa": 0.0,
+    "sbp_pre": 150, "sbp_post": 130,
+    "headache": False, "cramps": False, "GI": False, "syncope": False,
+    "ef_percent": 55, "arrhythmia": False, "af_recent": False,
+    "tmp_start": 80.0, "tmp_end": 90.0, "vp_start": 120.0, "vp_end": 110.0,
+    "OH_L": 0.0, "dyspnea": False, "edema": False,
+    "residual_urine_mLd": 0, "severe_as": False, "severe_mr": False,
+}
+
+# ---------- Post-session inputs (Actuals & Learning tab) ----------
+# duration_actual_min: NaN → ίδια με duration_min (όπως το default του widget)
+LEARN_INPUTS = {
+    "UF_actual_total": 0.0, "duration_actual_min": math.nan, "outcome_last": 0,
+    "gamma0_offset_current": 0.0, "alpha": 0.2,
+}
+
+# Alert bit flags (ίδια σειρά με τα alerts του Plan tab)
+ALERT_UF_DEFICIT = 1
+ALERT_TMP_VP = 2
+ALERT_BP_DROP = 4
+ALERT_SYMPTOMS = 8
+ALERT_OVERHYDRATION = 16
+
+
+def as_columns(inputs: Mapping, defaults: Mapping = PLAN_INPUTS) -> dict:
+    """Return float64 arrays for every key in `defaults`; missing keys get the widget default."""
+    cols = {k: np.asarray(inputs[k], dtype=np.float64) for k in defaults if k in inputs}
+    shape = np.broadcast_shapes(*(v.shape for v in cols.values())) if cols else ()
+    for k, v in defaults.items():
+        if k not in cols:
+            cols[k] = np.full(shape, v, dtype=np.float64)
+    return cols
+
+
+def logit(p):
+    return np.log(p / (1 - p))
+
+
+def round_up_step(x, step):
+    """Vectorized `int(math.ceil(x/step) * step)`."""
+    return np.ceil(np.asarray(x) / step) * step
+
+
+# Όροι των δύο logistic μοντέλων, με τη σειρά των στηλών των design matrices
+HYPOTENSION_TERMS = ("gamma0", "gamma1", "g_meds", "g_tmp", "g_vp", "g_age", "g_dm", "g_press", "g_as", "g_mr")
+OVERHYDRATION_TERMS = ("beta0", "b_OH", "b_dysp", "b_edm", "b_ef", "b_af", "b_dm_over", "b_mr_over", "b_urine")
+
+
+def hypotension_features(x: Mapping, tmp_slope, vp_trend, r):
+    """Design matrix (n × HYPOTENSION_TERMS) of the hypotension logistic at UF rate r."""
+    age_over60_dec = np.maximum(0.0, (x["age"] - 60.0) / 10.0)
+    cols = np.broadcast_arrays(
+        1.0, r, x["meds_recent"], tmp_slope, vp_trend, age_over60_dec,
+        x["dm"], x["dP_atm_10hPa"], x["severe_as"], x["severe_mr"],
+    )
+    return np.column_stack([np.ravel(c) for c in cols]).astype(np.float64)
+
+
+def overhydration_features(x: Mapping):
+    """Design matrix (n × OVERHYDRATION_TERMS); the urine column is −L/day (β_Urine is protective)."""
+    low_ef = x["ef_percent"] < 40
+    arrhythmia_any = (x["arrhythmia"] != 0) | (x["af_recent"] != 0)
+    cols = np.broadcast_arrays(
+        1.0, x["OH_L"], x["dyspnea"], x["edema"], low_ef, arrhythmia_any,
+        x["dm"], x["severe_mr"], -(x["residual_urine_mLd"] / 1000.0),
+    )
+    return np.column_stack([np.ravel(c) for c in cols]).astype(np.float64)
+
+
+def hypotension_lin_terms(x: Mapping, coef: Coefficients, tmp_slope, vp_trend):
+    """Linear predictor of the hypotension logistic without the γ1·r term."""
+    c = coef
+    age_over60_dec = np.maximum(0.0, (x["age"] - 60.0) / 10.0)
+    return (
+        c.gamma0
+        + c.g_meds * x["meds_recent"]
+        + c.g_tmp * tmp_slope
+        + c.g_vp * vp_trend
+        + c.g_age * age_over60_dec
+        + c.g_dm * x["dm"]
+        + c.g_press * x["dP_atm_10hPa"]
+        + c.g_as * x["severe_as"]
+        + c.g_mr * x["severe_mr"]
+    )
+
+
+def solve_rate(lin_terms, coef: Coefficients, tau=None):
+    """Inverse solve of the hypotension logistic for r at risk τ, clipped to [rmin, rmax]."""
+    tau = coef.tau_default if tau is None else tau
+    logit_tau = logit(np.asarray(tau, dtype=np.float64) / 100.0)
+    gamma1 = np.asarray(coef.gamma1, dtype=np.float64)
+    r_raw = np.where(gamma1 != 0, (logit_tau - lin_terms) / np.where(gamma1 != 0, gamma1, 1.0), np.nan)
+    r_bounded = np.minimum(np.maximum(r_raw, coef.rmin), coef.rmax)
+    return r_raw, r_bounded
+
+
+def overhydration_logit(x: Mapping, coef: Coefficients):
+    c = coef
+    low_ef = x["ef_percent"] < 40
+    arrhythmia_any = (x["arrhythmia"] != 0) | (x["af_recent"] != 0)
+    return (
+        c.beta0
+        + c.b_OH * x["OH_L"]
+        + c.b_dysp * x["dyspnea"]
+        + c.b_edm * x["edema"]
+        + c.b_ef * low_ef
+        + c.b_af * arrhythmia_any
+        + c.b_dm_over * x["dm"]
+        + c.b_mr_over * x["severe_mr"]
+        - c.b_urine * (x["residual_urine_mLd"] / 1000.0)  # mL → L
+    )
+
+
+def plan_batch(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS, trends: Mapping = None) -> dict:
+    """All Plan tab outputs and alert flags for a batch of sessions.
+
+    `inputs` is columnar (keys of PLAN_INPUTS); coefficient fields may also be
+    arrays, as long as everything broadcasts against the session axis.
+    `trends` may give measured tmp_slope/vp_trend (mmHg/h) instead of the
+    (end − start)/hours estimate; NaN entries fall back to the estimate.
+    """
+    x = as_columns(inputs)
+    c = coef
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        duration_min = x["duration_min"]
+        weight = x["weight"]
+        hours = np.maximum(0.1, duration_min / 60.0)
+        tmp_slope = (x["tmp_end"] - x["tmp_start"]) / hours
+        vp_trend = (x["vp_end"] - x["vp_start"]) / hours
+        if trends is not None:
+            if "tmp_slope" in trends:
+                live = np.asarray(trends["tmp_slope"], dtype=np.float64)
+                tmp_slope = np.where(np.isnan(live), tmp_slope, live)
+            if "vp_trend" in trends:
+                live = np.asarray(trends["vp_trend"], dtype=np.float64)
+                vp_trend = np.where(np.isnan(live), vp_trend, live)
+        sbp_pre = x["sbp_pre"]
+        bp_drop_pct = np.where(
+            sbp_pre <= 0, 0.0,
+            np.maximum(0.0, (sbp_pre - x["sbp_post"]) * 100.0 / np.where(sbp_pre <= 0, 1.0, sbp_pre)),
+        )
+        hypo_symptoms_any = (x["headache"] != 0) | (x["cramps"] != 0) | (x["GI"] != 0) | (x["syncope"] != 0)
+
+        # Hypotension inverse solve
+        lin_terms = hypotension_lin_terms(x, c, tmp_slope, vp_trend)
+        r_raw, r_bounded = solve_rate(lin_terms, c)
+
+        # Guards
+        high_tmp_vp = (tmp_slope > c.tmp_thr) | (vp_trend > c.vp_thr)
+        bp_drop_hit = bp_drop_pct >= c.bp_drop_thr
+        guard_hit = high_tmp_vp | bp_drop_hit | hypo_symptoms_any
+        guard_mult = np.where(guard_hit, c.safety_mult, 1.0)
+        r_max_dyn = r_bounded * guard_mult
+
+        UF_cap_L = r_max_dyn * (duration_min / 60.0) * weight / 1000.0
+        UF_needed_L = x["idwg"] + x["intake_L"] - x["rinseback_L"] - x["iv_L"]
+        UF_recommended_L = np.minimum(UF_cap_L, UF_needed_L)
+        UF_deficit_L = np.maximum(0.0, UF_needed_L - UF_recommended_L)
+
+        # Overhydration risk (logistic)
+        x_over = overhydration_logit(x, c)
+        P_over = 1.0 / (1.0 + np.exp(-x_over))
+        over_high = P_over * 100 > c.omega_target
+
+        # Πρόταση παράτασης με ίδιο ασφαλές r όταν overload + deficit
+        extend = over_high & (UF_deficit_L > 0) & (r_max_dyn > 0)
+        extra_minutes_over = np.where(
+            extend,
+            round_up_step(UF_deficit_L * 1000.0 / (r_max_dyn * weight) * 60.0, c.round_step),
+            0.0,
+        )
+
+    alerts = (
+        np.where(UF_deficit_L > 0.0, ALERT_UF_DEFICIT, 0)
+        | np.where(high_tmp_vp, ALERT_TMP_VP, 0)
+        | np.where(bp_drop_hit, ALERT_BP_DROP, 0)
+        | np.where(hypo_symptoms_any, ALERT_SYMPTOMS, 0)
+        | np.where(over_high, ALERT_OVERHYDRATION, 0)
+    )
+    return {
+        "tmp_slope": tmp_slope, "vp_trend": vp_trend, "bp_drop_pct": bp_drop_pct,
+        "hypo_symptoms_any": hypo_symptoms_any, "lin_terms": lin_terms,
+        "r_raw": r_raw, "r_bounded": r_bounded, "guard_hit": guard_hit, "guard_mult": guard_mult,
+        "r_max_dyn": r_max_dyn, "UF_cap_L": UF_cap_L, "UF_needed_L": UF_needed_L,
+        "UF_recommended_L": UF_recommended_L, "UF_deficit_L": UF_deficit_L,
+        "x_over": x_over, "P_over": P_over, "extra_minutes_over": extra_minutes_over,
+        "alerts": alerts,
+    }
+
+
+def learning_target(outcome_last, coef: Coefficients):
+    """Στόχος πιθανότητας για το learning: τ/2 μετά από OK, 2τ (έως 0.8) μετά από υπόταση."""
+    tau = np.asarray(coef.tau_default, dtype=np.float64)
+    return np.where(np.asarray(outcome_last) == 0, tau / 200.0, np.minimum(0.8, 2 * (tau / 100.0)))
+
+
+def update_offset(lin_old_base, p_target, gamma0_offset_current, alpha):
+    """One learning step: γ0_offset + α·Δlogit, unchanged where p_old_last is undefined.
+
+    `lin_old_base` is the hypotension linear predictor at r_used_last without the
+    offset (NaN when there are no actuals). Returns (p_old_last, delta_logit, updated).
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        p_old_last = 1.0 / (1.0 + np.exp(-(lin_old_base + gamma0_offset_current)))
+        valid = (p_old_last > 0) & (p_old_last < 1)
+        delta_logit = np.where(valid, logit(p_target) - logit(p_old_last), np.nan)
+        updated = np.where(valid, gamma0_offset_current + alpha * delta_logit, gamma0_offset_current)
+    return p_old_last, delta_logit, updated
+
+
+def learn_batch(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS, plan: Mapping = None) -> dict:
+    """Actuals & Learning tab outputs: γ0_offset update and next-session plan.
+
+    Optional outputs (UF_actual_net, r_used_last, p_old_last, delta_logit) are
+    NaN where the tab shows None. Pass `plan` to reuse a plan_batch() result.
+    """
+    x = as_columns(inputs)
+    a = as_columns(inputs, LEARN_INPUTS)
+    plan = plan_batch(inputs, coef) if plan is None else plan
+    c = coef
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        weight = x["weight"]
+        duration_actual_min = np.where(np.isnan(a["duration_actual_min"]), x["duration_min"], a["duration_actual_min"])
+        UF_actual_total = a["UF_actual_total"]
+        UF_actual_net = np.where(
+            UF_actual_total > 0, UF_actual_total - x["rinseback_L"] - x["iv_L"] - x["intake_L"], np.nan
+        )
+        r_used_last = np.where(
+            ~np.isnan(UF_actual_net) & (duration_actual_min > 0) & (weight > 0),
+            UF_actual_net * 1000.0 * 60.0 / (weight * duration_actual_min),
+            np.nan,
+        )
+
+        # Εκτίμηση p_old_last για το r_used_last (χωρίς το offset, βλ. update_offset)
+        lin_old_base = (
+            c.gamma0
+            + c.gamma1 * r_used_last
+            + c.g_meds * x["meds_recent"] + c.g_tmp * plan["tmp_slope"] + c.g_vp * plan["vp_trend"]
+            + c.g_age * np.maximum(0.0, (x["age"] - 60.0) / 10.0) + c.g_dm * x["dm"] + c.g_press * x["dP_atm_10hPa"]
+            + c.g_as * x["severe_as"] + c.g_mr * x["severe_mr"]
+        )
+        p_target = learning_target(a["outcome_last"], c)
+        p_old_last, delta_logit, gamma0_offset_updated = update_offset(
+            lin_old_base, p_target, a["gamma0_offset_current"], a["alpha"]
+        )
+
+        # Next session planning (+15% cap από βάση)
+        _, r_next_bounded = solve_rate(plan["lin_terms"] + gamma0_offset_updated, c)
+        r_next_capped = np.minimum(r_next_bounded, 1.15 * plan["r_bounded"])
+        r_next_dyn = np.where(plan["guard_hit"], c.safety_mult, 1.0) * r_next_capped
+
+        UF_cap_next_L = r_next_dyn * (duration_actual_min / 60.0) * weight / 1000.0
+
+        # Extra χρόνος αν υπάρχει έλλειμμα στην επόμενη
+        UF_deficit_L_next = np.maximum(0.0, plan["UF_needed_L"] - UF_cap_next_L)
+        extra_minutes = np.where(
+            (r_next_dyn > 0) & (UF_deficit_L_next > 0),
+            UF_deficit_L_next * 1000.0 / (r_next_dyn * weight) * 60.0,
+            0.0,
+        )
+        recommended_total_minutes = round_up_step(duration_actual_min + np.maximum(0.0, extra_minutes), c.round_step)
+
+    return {
+        "UF_actual_net": UF_actual_net, "duration_actual_min": duration_actual_min,
+        "r_used_last": r_used_last, "lin_old_base": lin_old_base, "p_old_last": p_old_last, "p_target": p_target,
+        "delta_logit": delta_logit, "gamma0_offset_updated": gamma0_offset_updated,
+        "r_max_next_dyn": r_next_dyn, "UF_cap_next_L": UF_cap_next_L,
+        "extra_minutes": extra_minutes, "recommended_total_minutes": recommended_total_minutes,
+    }
+
+
+def alert_text(alerts: int, UF_deficit_L: float, coef: Coefficients = DEFAULT_COEFFICIENTS) -> str:
+    """Το " | "-joined μήνυμα του st.error για ένα alert bitmask."""
+    parts = []
+    if alerts & ALERT_UF_DEFICIT: parts.append(f"UF deficit {UF_deficit_L:.2f} L")
+    if alerts & ALERT_TMP_VP: parts.append("High TMP/VP")
+    if alerts & ALERT_BP_DROP: parts.append(f"SBP drop ≥{coef.bp_drop_thr:.0f}%")
+    if alerts & ALERT_SYMPTOMS: parts.append("Συμπτώματα υπότασης")
+    if alerts & ALERT_OVERHYDRATION: parts.append("P_overhydration πάνω από στόχο")
+    return " | ".join(parts)
+
+
+def alert_strings(out: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS) -> list:
+    """alert_text() for every row of a plan_batch() result ("" when no alert)."""
+    alerts = np.asarray(out["alerts"]).ravel()
+    deficit = np.asarray(out["UF_deficit_L"]).ravel()
+    texts = [""] * alerts.size
+    for i in np.flatnonzero(alerts):
+        texts[i] = alert_text(int(alerts[i]), float(deficit[i]), coef)
+    return texts
+
+
+def plan_one(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS) -> dict:
+    """plan_batch() for a single session, unpacked to Python scalars."""
+    return {k: v.item() for k, v in plan_batch(inputs, coef).items()}
+
+
+def learn_one(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS, plan: Mapping = None) -> dict:
+    """learn_batch() for a single session; NaN optionals become None."""
+    out = {k: v.item() for k, v in learn_batch(inputs, coef, plan).items()}
+    for k in ("UF_actual_net", "r_used_last", "p_old_last", "delta_logit"):
+        if math.isnan(out[k]):
+            out[k] = None
+    return out
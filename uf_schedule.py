@@ -0,0 +1,285 @@
+"""Shift scheduler: χωράνε οι παρατάσεις (extra_minutes) στις chairs της μονάδας;
+
+Κάθε συνεδρία έχει ημέρα, βάρδια (1..S), prescribed duration_min και ζητούμενα
+extra_minutes. Σε κάθε ημέρα κάθε chair τρέχει τις βάρδιες στη σειρά: μια
+συνεδρία ξεκινά στο άνοιγμα της βάρδιας ή όταν ελευθερωθεί η chair (+ turnover),
+και ό,τι τελειώνει μετά το κλείσιμο της βάρδιας μετράει ως overtime. Ο scheduler
+διαλέγει chair ανά συνεδρία και πόσα από τα extra λεπτά δίνονται, ελαχιστοποιώντας
+
+    unmet extra minutes + overtime_weight × overtime minutes
+
+Heuristic (default): ανά βάρδια οι μεγαλύτερες συνεδρίες πάνε στις chairs που
+ελευθερώνονται νωρίτερα και η παράταση δίνεται μέχρι το slack της βάρδιας.
+Exact (exact=True, μικρά instances): DP ανά βάρδια πάνω στους χρόνους
+απελευθέρωσης των chairs, με παρατάσεις σε βήματα των `step` λεπτών.
+
+    python uf_schedule.py week.csv --chairs 20 -o assignment.csv
+    python uf_schedule.py week.csv --chairs 4 --exact
+"""
+import argparse
+import csv
+import itertools
+import math
+import re
+import sys
+from collections import defaultdict
+from typing import Iterable, Mapping, Optional
+
+from uf_snapshot import parse_float
+
+# Default παράθυρα βαρδιών (λεπτά από τα μεσάνυχτα): 07:00–11:30, 12:00–16:30, 17:00–21:30
+SHIFTS = ((420, 690), (720, 990), (1020, 1290))
+TURNOVER_MIN = 30
+OVERTIME_WEIGHT = 1.5
+SCHEDULE_COLUMNS = (
+    "patient_id", "day", "shift", "chair", "start", "end", "duration_min",
+    "extra_minutes", "granted_min", "unmet_min", "overtime_min",
+)
+
+
+def parse_shifts(text: str) -> tuple:
+    """'07:00-11:30,12:00-16:30' → ((420, 690), (720, 990))."""
+    def minutes(hhmm):
+        h, m = hhmm.strip().split(":")
+        return int(h) * 60 + int(m)
+
+    shifts = []
+    for part in text.split(","):
+        start, end = part.split("-")
+        shifts.append((minutes(start), minutes(end)))
+    return tuple(shifts)
+
+
+def hhmm(minutes: float) -> str:
+    m = int(round(minutes))
+    return f"{m // 60:02d}:{m % 60:02d}"
+
+
+def normalize_sessions(rows: Iterable[Mapping]) -> list:
+    """Roster rows → μία εγγραφή ανά συνεδρία {patient_id, day, shift, duration_min, extra_minutes}.
+
+    `days` ("Mon/Wed/Fri", "Mon Wed Fri") αναπτύσσεται σε μία συνεδρία ανά ημέρα·
+    χωρίς extra_minutes, χρησιμοποιείται recommended_total_minutes − duration_min.
+    """
+    sessions = []
+    for r in rows:
+        base = parse_float(r.get("duration_min"))
+        extra = parse_float(r.get("extra_minutes"))
+        if math.isnan(extra):
+            total = parse_float(r.get("recommended_total_minutes"))
+            extra = total - base if not math.isnan(total) else 0.0
+        if math.isnan(base):
+            raise ValueError(f"{r.get('patient_id', '?')}: missing duration_min")
+        days = [r["day"]] if r.get("day") not in (None, "") else re.split(r"[\s/,;]+", str(r.get("days", "")).strip())
+        for day in days:
+            if day == "":
+                raise ValueError(f"{r.get('patient_id', '?')}: missing day/days")
+            sessions.append({
+                "patient_id": str(r.get("patient_id", "")), "day": str(day), "shift": int(parse_float(r.get("shift"))),
+                "duration_min": base, "extra_minutes": max(0.0, extra),
+            })
+    return sessions
+
+
+def _cost(free: float, base: float, grant: float, window: tuple, turnover: float, w: float, extra: float) -> tuple:
+    """(start, end, overtime, cost) μιας συνεδρίας σε chair ελεύθερη από `free`."""
+    start = max(window[0], free + turnover)
+    end = start + base + grant
+    overtime = max(0.0, end - window[1])
+    return start, end, overtime, (extra - grant) + w * overtime
+
+
+def _groups(sessions: list, n_shifts: int, chairs: int) -> dict:
+    """{day: [indices ανά βάρδια]} με έλεγχο χωρητικότητας."""
+    days = defaultdict(lambda: [[] for _ in range(n_shifts)])
+    for i, s in enumerate(sessions):
+        if not 1 <= s["shift"] <= n_shifts:
+            raise ValueError(f"{s['patient_id']}: shift {s['shift']} εκτός 1..{n_shifts}")
+        days[s["day"]][s["shift"] - 1].append(i)
+    for day, groups in days.items():
+        for k, idx in enumerate(groups):
+            if len(idx) > chairs:
+                raise ValueError(f"{day} βάρδια {k + 1}: {len(idx)} συνεδρίες > {chairs} chairs")
+    return days
+
+
+def _day_heuristic(groups: list, sessions: list, chairs: int, shifts: tuple, turnover: float,
+                   w: float, step: int) -> list:
+    free = [-math.inf] * chairs
+    out = []
+    for k, idx in enumerate(groups):
+        window = shifts[k]
+        # Η παράταση δεν πρέπει να καθυστερήσει την επόμενη βάρδια (αν έχει συνεδρίες)
+        last = k + 1 == len(groups) or not groups[k + 1]
+        limit = window[1] if last else min(window[1], shifts[k + 1][0] - turnover)
+        by_length = sorted(idx, key=lambda i: -(sessions[i]["duration_min"] + sessions[i]["extra_minutes"]))
+        by_free = sorted(range(chairs), key=lambda c: free[c])
+        for i, c in zip(by_length, by_free):
+            s = sessions[i]
+            start = max(window[0], free[c] + turnover)
+            if w < 1.0:
+                grant = s["extra_minutes"]  # overtime φθηνότερο από unmet: όλη η παράταση
+            else:
+                slack = max(0.0, limit - start - s["duration_min"])
+                grant = s["extra_minutes"] if slack >= s["extra_minutes"] else step * math.floor(slack / step)
+            _, end, _, _ = _cost(free[c], s["duration_min"], grant, window, turnover, w, s["extra_minutes"])
+            free[c] = end
+            out.append((i, c, grant))
+    return out
+
+
+def _grant_options(free: float, base: float, extra: float, window: tuple, next_open: float, turnover: float,
+                   w: float, step: int) -> list:
+    """Μη-κυριαρχούμενες παρατάσεις μιας συνεδρίας σε chair ελεύθερη από `free`.
+
+    Ό,τι τελειώνει πριν την επόμενη (μη κενή) βάρδια χωρίς overtime δεν επηρεάζει
+    τίποτα άλλο, άρα η μεγαλύτερη τέτοια παράταση κυριαρχεί στις μικρότερες· με
+    w ≥ 1 κάθε παράταση που προκαλεί overtime κυριαρχείται από τη μέγιστη χωρίς.
+    """
+    start = max(window[0], free + turnover)
+    grants = sorted(set(list(range(0, int(extra) + 1, step)) + [extra]))
+    harmless = min(window[1], next_open - turnover) - start - base
+    low = max([g for g in grants if g <= harmless], default=0)
+    return [g for g in grants if g >= low and (w < 1.0 or g == low or start + base + g <= window[1])]
+
+
+def _day_exact(groups: list, sessions: list, chairs: int, shifts: tuple, turnover: float,
+               w: float, step: int, max_nodes: int) -> list:
+    # Οι chairs είναι ισοδύναμες: state = ταξινομημένοι χρόνοι απελευθέρωσης, με τις
+    # ετικέτες των chairs δίπλα μόνο για την ανακατασκευή των αποφάσεων.
+    # Το κόστος του heuristic είναι άνω φράγμα (το κόστος δεν μειώνεται ποτέ).
+    bound = sum(c for _, _, _, _, c in _replay(groups, sessions, chairs, shifts, turnover, w,
+                                               _day_heuristic(groups, sessions, chairs, shifts, turnover, w, step)))
+    states = {tuple([-math.inf] * chairs): (0.0, tuple(range(chairs)), ())}
+    nodes = 0
+    for k, idx in enumerate(groups):
+        window = shifts[k]
+        next_open = next((shifts[j][0] for j in range(k + 1, len(groups)) if groups[j]), math.inf)
+        new_states = {}
+        for free, (cost, labels, plan) in states.items():
+            seen = set()
+            for perm in itertools.permutations(range(chairs), len(idx)):
+                # θέσεις με ίδιο χρόνο απελευθέρωσης δίνουν ισοδύναμες αντιστοιχίσεις
+                key = tuple(free[p] for p in perm)
+                if key in seen:
+                    continue
+                seen.add(key)
+                options = [
+                    _grant_options(free[p], sessions[i]["duration_min"], sessions[i]["extra_minutes"], window,
+                                   next_open, turnover, w, step)
+                    for i, p in zip(idx, perm)
+                ]
+                for grants in itertools.product(*options):
+                    nodes += 1
+                    if nodes > max_nodes:
+                        raise ValueError(f"instance πολύ μεγάλο για exact solver (> {max_nodes} nodes)")
+                    ends = list(free)
+                    total = cost
+                    for i, p, g in zip(idx, perm, grants):
+                        s = sessions[i]
+                        _, ends[p], _, c = _cost(free[p], s["duration_min"], g, window, turnover, w, s["extra_minutes"])
+                        total += c
+                    if total > bound + 1e-9:
+                        continue
+                    order = sorted(range(chairs), key=ends.__getitem__)
+                    state = tuple(ends[p] for p in order)
+                    best = new_states.get(state)
+                    if best is None or total < best[0]:
+                        decided = tuple((i, labels[p], g) for i, p, g in zip(idx, perm, grants))
+                        new_states[state] = (total, tuple(labels[p] for p in order), plan + decided)
+        states = new_states
+    return list(min(states.values(), key=lambda v: v[0])[2])
+
+
+def _replay(groups: list, sessions: list, chairs: int, shifts: tuple, turnover: float, w: float,
+            decisions: list) -> list:
+    """(session index, start, end, overtime, cost) για δοσμένες αποφάσεις (i, chair, grant)."""
+    chosen = {i: (c, g) for i, c, g in decisions}
+    free = [-math.inf] * chairs
+    out = []
+    for k, idx in enumerate(groups):
+        for i in sorted(idx, key=lambda i: chosen[i][0]):
+            c, g = chosen[i]
+            s = sessions[i]
+            start, end, overtime, cost = _cost(free[c], s["duration_min"], g, shifts[k], turnover, w,
+                                               s["extra_minutes"])
+            free[c] = end
+            out.append((i, start, end, overtime, cost))
+    return out
+
+
+def schedule(sessions: list, chairs: int, shifts: tuple = SHIFTS, turnover: float = TURNOVER_MIN,
+             overtime_weight: float = OVERTIME_WEIGHT, step: int = 5, exact: bool = False,
+             max_nodes: int = 2_000_000) -> dict:
+    """Assign every session to a chair and grant extensions (see module docstring).
+
+    `sessions` as from normalize_sessions(). Returns {"rows": [... SCHEDULE_COLUMNS],
+    "unmet_min", "overtime_min", "cost"}; rows are grouped by day (roster order), shift, chair.
+    """
+    days = _groups(sessions, len(shifts), chairs)
+    solve = _day_exact if exact else _day_heuristic
+    args = (max_nodes,) if exact else ()
+    rows, unmet_total, overtime_total = [], 0.0, 0.0
+    for day, groups in days.items():
+        decisions = solve(groups, sessions, chairs, shifts, turnover, overtime_weight, step, *args)
+        chosen = {i: (c, g) for i, c, g in decisions}
+        for i, start, end, overtime, _ in _replay(groups, sessions, chairs, shifts, turnover, overtime_weight,
+                                                  decisions):
+            s = sessions[i]
+            c, grant = chosen[i][0], float(chosen[i][1])
+            unmet = s["extra_minutes"] - grant
+            unmet_total += unmet
+            overtime_total += overtime
+            rows.append({
+                "patient_id": s["patient_id"], "day": day, "shift": s["shift"], "chair": c + 1,
+                "start": hhmm(start), "end": hhmm(end), "duration_min": s["duration_min"],
+                "extra_minutes": s["extra_minutes"], "granted_min": grant, "unmet_min": unmet,
+                "overtime_min": overtime,
+            })
+    return {
+        "rows": rows, "unmet_min": unmet_total, "overtime_min": overtime_total,
+        "cost": unmet_total + overtime_weight * overtime_total,
+    }
+
+
+def read_roster(f) -> list:
+    """Weekly roster CSV (patient_id, day ή days, shift, duration_min, extra_minutes) → sessions."""
+    return normalize_sessions({k: (None if v == "" else v) for k, v in r.items()} for r in csv.DictReader(f))
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Pack extended session durations onto chairs and shifts.")
+    ap.add_argument("roster", help="weekly roster CSV, '-' για stdin")
+    ap.add_argument("-o", "--output", default="-", help="assignment CSV, default stdout")
+    ap.add_argument("--chairs", type=int, required=True)
+    ap.add_argument("--shifts", default="07:00-11:30,12:00-16:30,17:00-21:30", help="παράθυρα βαρδιών")
+    ap.add_argument("--turnover", type=float, default=TURNOVER_MIN, help="λεπτά καθαρισμού/αλλαγής ανά chair")
+    ap.add_argument("--overtime-weight", type=float, default=OVERTIME_WEIGHT, help="κόστος overtime / unmet λεπτό")
+    ap.add_argument("--step", type=int, default=5, help="βήμα παράτασης (λεπτά) για τον exact solver")
+    ap.add_argument("--exact", action="store_true", help="exact DP (μόνο για μικρά instances)")
+    args = ap.parse_args(argv)
+
+    src = sys.stdin if args.roster == "-" else open(args.roster, newline="", encoding="utf-8")
+    try:
+        sessions = read_roster(src)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+    result = schedule(sessions, args.chairs, parse_shifts(args.shifts), args.turnover,
+                      args.overtime_weight, args.step, args.exact)
+
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        writer = csv.DictWriter(dst, SCHEDULE_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(result["rows"])
+    finally:
+        if dst is not sys.stdout:
+            dst.close()
+    print(f"{len(result['rows'])} sessions: unmet {result['unmet_min']:.0f} min, "
+          f"overtime {result['overtime_min']:.0f} min", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""Session snapshot schema — το payload του "📤 Export snapshot (JSON)".
+
+Κάθε πεδίο ορίζεται ως (path στο JSON, flat όνομα στήλης, τύπος). Τα nested
+objects (symptoms, dialysate) γίνονται flat στήλες για CSV / columnar χρήση,
+με τα ίδια ονόματα που έχουν οι μεταβλητές στο app.py.
+"""
+import json
+import math
+from typing import Iterator, Mapping
+
+import numpy as np
+
+from uf_model import (
+    DEFAULT_COEFFICIENTS, LEARN_INPUTS, PLAN_INPUTS, Coefficients, learn_batch, plan_batch,
+)
+
+FIELDS = (
+    (("session_dt",), "session_dt", str), (("patient_id",), "patient_id", str),
+    (("age",), "age", int), (("weight",), "weight", float), (("duration_min",), "duration_min", int),
+    (("idwg",), "idwg", float), (("intake_L",), "intake_L", float),
+    (("rinseback_L",), "rinseback_L", float), (("iv_L",), "iv_L", float),
+    (("meds_recent",), "meds_recent", int), (("dm",), "dm", int), (("dP_atm_10hPa",), "dP_atm_10hPa", float),
+    (("sbp_pre",), "sbp_pre", int), (("sbp_post",), "sbp_post", int), (("bp_drop_pct",), "bp_drop_pct", float),
+    (("symptoms", "headache"), "headache", bool), (("symptoms", "cramps"), "cramps", bool),
+    (("symptoms", "GI"), "GI", bool), (("symptoms", "syncope"), "syncope", bool),
+    (("ef_percent",), "ef_percent", int), (("arrhythmia",), "arrhythmia", bool), (("af_recent",), "af_recent", bool),
+    (("tmp_start",), "tmp_start", float), (("tmp_end",), "tmp_end", float), (("tmp_slope",), "tmp_slope", float),
+    (("vp_start",), "vp_start", float), (("vp_end",), "vp_end", float), (("vp_trend",), "vp_trend", float),
+    (("dialysate", "Na"), "dial_Na", int), (("dialysate", "HCO3"), "dial_HCO3", int),
+    (("dialysate", "cond"), "dial_cond", float), (("dialysate", "K"), "dial_K", float),
+    (("dialysate", "Ca"), "dial_Ca", float),
+    (("OH_L",), "OH_L", float), (("dyspnea",), "dyspnea", bool), (("edema",), "edema", bool),
+    (("chest_symp",), "chest_symp", bool),
+    (("residual_urine_mLd",), "residual_urine_mLd", int),
+    (("severe_as",), "severe_as", bool), (("severe_mr",), "severe_mr", bool),
+    (("tau",), "tau", float), (("r_max_dyn",), "r_max_dyn", float), (("UF_cap_L",), "UF_cap_L", float),
+    (("UF_needed_L",), "UF_needed_L", float), (("UF_recommended_L",), "UF_recommended_L", float),
+    (("P_overhydration_risk",), "P_overhydration_risk", float),
+    (("UF_actual_total",), "UF_actual_total", float), (("UF_actual_net",), "UF_actual_net", float),
+    (("duration_actual_min",), "duration_actual_min", int), (("r_used_last",), "r_used_last", float),
+    (("outcome_last",), "outcome_last", int), (("alpha",), "alpha", float),
+    (("gamma0_offset_current",), "gamma0_offset_current", float),
+    (("gamma0_offset_updated",), "gamma0_offset_updated", float),
+    (("r_max_next_dyn",), "r_max_next_dyn", float), (("UF_cap_next_L",), "UF_cap_next_L", float),
+    (("extra_minutes",), "extra_minutes", float),
+    (("recommended_total_minutes",), "recommended_total_minutes", int),
+)
+COLUMNS = tuple(name for _, name, _ in FIELDS)
+KINDS = {name: kind for _, name, kind in FIELDS}
+
+# Όσα πεδία δεν υπολογίζει το engine — defaults των widgets
+EXTRA_INPUTS = {
+    "session_dt": "", "patient_id": "", "chest_symp": False,
+    "dial_Na": 138, "dial_HCO3": 32, "dial_cond": 13.6, "dial_K": 2.0, "dial_Ca": 1.5,
+}
+INPUT_DEFAULTS = {**EXTRA_INPUTS, **PLAN_INPUTS, **LEARN_INPUTS}
+
+
+_GROUPS = {path[0] for path, _, _ in FIELDS if len(path) > 1}
+
+
+def flatten(snapshot: Mapping) -> dict:
+    """Nested snapshot → flat {column: value}; missing fields are left out, extra keys kept."""
+    flat = {}
+    for path, name, _ in FIELDS:
+        node = snapshot
+        for key in path:
+            if not isinstance(node, Mapping) or key not in node:
+                break
+            node = node[key]
+        else:
+            flat[name] = node
+    # ήδη flat γραμμές (π.χ. CSV roster) και επιπλέον στήλες (π.χ. labels) περνούν όπως είναι
+    for name, value in snapshot.items():
+        if name not in flat and name not in _GROUPS:
+            flat[name] = value
+    return flat
+
+
+def nest(flat: Mapping) -> dict:
+    """Flat {column: value} → snapshot dict with the app's key order and nesting."""
+    out = {}
+    for path, name, _ in FIELDS:
+        node = out
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = flat.get(name)
+    return out
+
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _checked(name: str, value, kind):
+    if kind is str:
+        if not isinstance(value, str):
+            raise ValueError(f"{name}: expected string, got {type(value).__name__}")
+        return value
+    if not isinstance(value, (int, float)):
+        raise ValueError(f"{name}: expected number, got {type(value).__name__}")
+    if value != value:
+        return None  # NaN: όπως ένα κενό πεδίο
+    if isinstance(value, float) and math.isinf(value):
+        raise ValueError(f"{name}: expected finite number, got {value!r}")
+    if kind is bool:
+        if value not in (0, 1):
+            raise ValueError(f"{name}: expected boolean, got {value!r}")
+        return bool(value)
+    if kind is int:
+        if value != int(value):
+            raise ValueError(f"{name}: expected integer, got {value!r}")
+        if not _INT64_MIN <= value <= _INT64_MAX:
+            raise ValueError(f"{name}: integer out of range, got {value!r}")
+        return int(value)
+    return float(value)
+
+
+def validate(snapshot) -> dict:
+    """Check a parsed session.json (nested dict) against FIELDS; returns flat {column: value}.
+
+    Missing fields (π.χ. από παλαιότερες εκδόσεις του app) γίνονται None· λάθος
+    τύπος ή κενό patient_id / session_dt → ValueError με το όνομα του πεδίου.
+    """
+    if not isinstance(snapshot, dict):
+        raise ValueError(f"expected JSON object, got {type(snapshot).__name__}")
+    for group in _GROUPS:
+        if not isinstance(snapshot.get(group, {}), dict):
+            raise ValueError(f"{group}: expected object")
+    out = {}
+    for path, name, kind in FIELDS:
+        value = snapshot.get(path[0]) if len(path) == 1 else snapshot.get(path[0], {}).get(path[1])
+        out[name] = None if value is None else _checked(name, value, kind)
+    for name in ("patient_id", "session_dt"):
+        if not out[name]:
+            raise ValueError(f"{name}: missing")
+    return out
+
+
+def snapshot_columns(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS) -> dict:
+    """Inputs + plan + learning outputs as flat columns, one entry per snapshot field."""
+    plan = plan_batch(inputs, coef)
+    learn = learn_batch(inputs, coef, plan)
+    cols = {k: inputs[k] for k in INPUT_DEFAULTS if k in inputs}
+    cols.update({k: plan[k] for k in ("tmp_slope", "vp_trend", "bp_drop_pct", "r_max_dyn", "UF_cap_L",
+                                      "UF_needed_L", "UF_recommended_L")})
+    cols.update({k: learn[k] for k in ("UF_actual_net", "duration_actual_min", "r_used_last", "gamma0_offset_updated",
+                                       "r_max_next_dyn", "UF_cap_next_L", "extra_minutes",
+                                       "recommended_total_minutes")})
+    cols["P_overhydration_risk"] = plan["P_over"]
+    cols["tau"] = coef.tau_default
+    n = np.shape(plan["r_max_dyn"])
+    for k in COLUMNS:
+        if k not in cols:
+            cols[k] = INPUT_DEFAULTS[k]
+        if np.ndim(cols[k]) == 0:
+            cols[k] = np.broadcast_to(np.asarray(cols[k], dtype=object if KINDS[k] is str else None), n)
+    return cols
+
+
+def _python_values(values, kind) -> list:
+    """Column → list of JSON-ready Python values (NaN/±inf → None)."""
+    values = values.tolist() if isinstance(values, np.ndarray) else list(values)
+    if kind is str:
+        return ["" if v is None else str(v) for v in values]
+    if kind is bool:
+        return [bool(v) for v in values]
+    if kind is int:
+        return [None if v is None or not math.isfinite(v) else int(v) for v in values]
+    return [None if v is None or not math.isfinite(v) else float(v) for v in values]
+
+
+def records(columns: Mapping) -> Iterator[dict]:
+    """Yield one nested snapshot dict per row of flat `columns` (see snapshot_columns)."""
+    conv = [(name, _python_values(columns[name], KINDS[name])) for name in COLUMNS]
+    n = len(conv[0][1])
+    for i in range(n):
+        yield nest({name: vals[i] for name, vals in conv})
+
+
+def flat_rows(columns: Mapping) -> Iterator[list]:
+    """Yield one flat row (list in COLUMNS order) per row of `columns`."""
+    conv = [_python_values(columns[name], KINDS[name]) for name in COLUMNS]
+    return zip(*conv)
+
+
+def _json_tokens(values, kind) -> list:
+    """Column → list of JSON literals (NaN/±inf/None → null)."""
+    if kind is not str and isinstance(values, np.ndarray) and values.size > 1:
+        # Στήλες με λίγες διακριτές τιμές (defaults, flags, ηλικία...) κωδικοποιούνται μία φορά
+        uniq, inverse = np.unique(values, return_inverse=True)
+        if 2 * uniq.size < values.size:
+            tokens = _json_tokens(uniq, kind)
+            return [tokens[i] for i in inverse.ravel().tolist()]
+    values = _python_values(values, kind)
+    if kind is str:
+        enc = {v: json.dumps(v, ensure_ascii=False) for v in set(values)}
+        return [enc[v] for v in values]
+    if kind is bool:
+        return ["true" if v else "false" for v in values]
+    return ["null" if v is None else repr(v) for v in values]
+
+
+def _row_template() -> str:
+    """'%s' template of one snapshot line, same key order/nesting as nest()."""
+    parts, group = [], None
+    for path, _, _ in FIELDS:
+        if len(path) == 2 and path[0] != group:
+            if group is not None:
+                parts[-1] += "}"
+            group = path[0]
+            parts.append(f'{json.dumps(group)}: {{{json.dumps(path[1])}: %s')
+        elif len(path) == 2:
+            parts.append(f"{json.dumps(path[1])}: %s")
+        else:
+            if group is not None:
+                parts[-1] += "}"
+                group = None
+            parts.append(f"{json.dumps(path[0])}: %s")
+    return "{" + ", ".join(parts) + "}\n"
+
+
+_ROW_TEMPLATE = _row_template()
+
+
+def ndjson_lines(columns: Mapping) -> Iterator[str]:
+    """Yield one NDJSON line per row, identical to json.dumps(record, ensure_ascii=False)."""
+    tokens = [_json_tokens(columns[name], KINDS[name]) for name in COLUMNS]
+    template = _ROW_TEMPLATE
+    for row in zip(*tokens):
+        yield template % row
+
+
+def parse_float(v) -> float:
+    """Tolerant cell parser for roster files: '', None → NaN, true/false/yes/no → 1/0."""
+    if v is None:
+        return math.nan
+    if isinstance(v, (int, float)):
+        return float(v)
+    s = str(v).strip().lower()
+    if s in ("", "none", "null", "nan"):
+        return math.nan
+    if s in ("true", "yes", "y"):
+        return 1.0
+    if s in ("false", "no", "n"):
+        return 0.0
+    return float(s.replace(",", "."))
+
+
+def columns_to_inputs(raw: Mapping, n: int) -> dict:
+    """Raw roster columns {name: sequence of cells} → engine input columns.
+
+    Numeric cells are parsed with parse_float(); empty cells and missing columns
+    get the widget default.
+    """
+    cols = {}
+    for name, default in INPUT_DEFAULTS.items():
+        values = raw.get(name)
+        if isinstance(default, str):
+            cols[name] = [default] * n if values is None else ["" if v is None else str(v) for v in values]
+            continue
+        if values is None:
+            cols[name] = np.full(n, default, dtype=np.float64)
+            continue
+        try:
+            arr = np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            arr = np.array([parse_float(v) for v in values], dtype=np.float64)
+        if not math.isnan(default):
+            arr[np.isnan(arr)] = default
+        cols[name] = arr
+    return cols
+
+
+def rows_to_inputs(rows: list) -> dict:
+    """List of flat row dicts (e.g. flattened NDJSON snapshots) → engine input columns."""
+    raw = {name: [r.get(name) for r in rows] for name in INPUT_DEFAULTS if any(name in r for r in rows)}
+    return columns_to_inputs(raw, len(rows))
+
+
+def table_to_inputs(header: list, rows: list) -> dict:
+    """CSV-style header + list of row lists → engine input columns."""
+    raw = dict(zip(header, zip(*rows))) if rows else {}
+    return columns_to_inputs(raw, len(rows))
@@ -0,0 +1,203 @@
+"""Persistent session history — SQLite (WAL), ένα snapshot ανά (patient_id, session_dt).
+
+Τα snapshots αποθηκεύονται ως JSON (ίδιο payload με το "Export snapshot"),
+με index στο (patient_id, session_dt) ώστε το "τελευταίες N συνεδρίες" να είναι
+ένα index range scan. Οι εγγραφές από το UI περνούν από BackgroundWriter, ώστε
+το click να μην περιμένει τον δίσκο.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from typing import Iterable, Iterator, Mapping, Optional
+
+DEFAULT_PATH = os.environ.get("UF_STORE_PATH", "uf_sessions.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    patient_id TEXT NOT NULL,
+    session_dt TEXT NOT NULL,
+    snapshot   TEXT NOT NULL,
+    PRIMARY KEY (patient_id, session_dt)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS learning_state (
+    patient_id      TEXT PRIMARY KEY,
+    gamma0_offset   REAL NOT NULL,
+    n_sessions      INTEGER NOT NULL,
+    last_session_dt TEXT NOT NULL
+);
+"""
+_UPSERT = (
+    "INSERT INTO sessions (patient_id, session_dt, snapshot) VALUES (?, ?, ?) "
+    "ON CONFLICT(patient_id, session_dt) DO UPDATE SET snapshot = excluded.snapshot"
+)
+
+log = logging.getLogger("uf_store")
+
+
+def _filters(patient_id: Optional[str], since: Optional[str], until: Optional[str]) -> tuple:
+    """(' WHERE ...' ή '', args) για ασθενή / εύρος session_dt."""
+    where, args = [], []
+    if patient_id is not None:
+        where.append("patient_id = ?"); args.append(patient_id)
+    if since is not None:
+        where.append("session_dt >= ?"); args.append(since)
+    if until is not None:
+        where.append("session_dt <= ?"); args.append(until)
+    return (" WHERE " + " AND ".join(where) if where else ""), args
+
+
+# O(1) learning update: το offset μετά την τελευταία συνεδρία γίνεται το νέο state.
+# Συνεδρίες παλαιότερες από last_session_dt αγνοούνται (→ uf_learning.rebuild_learning_state).
+_ADVANCE_STATE = (
+    "INSERT INTO learning_state (patient_id, gamma0_offset, n_sessions, last_session_dt) VALUES (?, ?, 1, ?) "
+    "ON CONFLICT(patient_id) DO UPDATE SET "
+    "gamma0_offset = excluded.gamma0_offset, "
+    "n_sessions = n_sessions + (excluded.last_session_dt > last_session_dt), "
+    "last_session_dt = excluded.last_session_dt "
+    "WHERE excluded.last_session_dt >= learning_state.last_session_dt"
+)
+
+
+def connect(path: str = DEFAULT_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _row(snapshot: Mapping) -> tuple:
+    return (
+        str(snapshot.get("patient_id", "")),
+        str(snapshot.get("session_dt", "")),
+        json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")),
+    )
+
+
+class SessionStore:
+    """Reader/writer over the sessions table; one connection per thread."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        connect(path).close()  # δημιουργία schema / WAL μία φορά
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    def append(self, snapshot: Mapping) -> None:
+        self.append_many([snapshot])
+
+    def append_many(self, snapshots: Iterable[Mapping]) -> int:
+        """Upsert many snapshots in one transaction; returns how many were written."""
+        snapshots = list(snapshots)
+        rows = [_row(s) for s in snapshots]
+        states = [
+            (row[0], float(s["gamma0_offset_updated"]), row[1])
+            for row, s in zip(rows, snapshots) if s.get("gamma0_offset_updated") is not None
+        ]
+        with self.conn:
+            self.conn.executemany(_UPSERT, rows)
+            self.conn.executemany(_ADVANCE_STATE, states)
+        return len(rows)
+
+    def learning_state(self, patient_id: str) -> Optional[dict]:
+        """{gamma0_offset, n_sessions, last_session_dt} του ασθενή, ή None."""
+        row = self.conn.execute(
+            "SELECT gamma0_offset, n_sessions, last_session_dt FROM learning_state WHERE patient_id = ?",
+            (patient_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"gamma0_offset": row[0], "n_sessions": row[1], "last_session_dt": row[2]}
+
+    def replace_learning_states(self, states: Iterable[tuple]) -> None:
+        """Αντικατάσταση όλου του learning_state με (patient_id, gamma0_offset, n_sessions, last_session_dt)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM learning_state")
+            self.conn.executemany("INSERT INTO learning_state VALUES (?, ?, ?, ?)", states)
+
+    def last_sessions(self, patient_id: str, n: int = 10) -> list:
+        """Οι τελευταίες n συνεδρίες του ασθενή, νεότερη πρώτη."""
+        cur = self.conn.execute(
+            "SELECT snapshot FROM sessions WHERE patient_id = ? ORDER BY session_dt DESC LIMIT ?",
+            (patient_id, n),
+        )
+        return [json.loads(s) for (s,) in cur]
+
+    def iter_sessions(self, patient_id: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None) -> Iterator[dict]:
+        """Stream snapshots in (patient_id, session_dt) order; `since`/`until` are inclusive session_dt bounds."""
+        for s in self.iter_raw(patient_id, since, until):
+            yield json.loads(s)
+
+    def iter_raw(self, patient_id: Optional[str] = None, since: Optional[str] = None,
+                 until: Optional[str] = None, batch: int = 5000) -> Iterator[str]:
+        """Όπως iter_sessions, αλλά τα snapshots ως compact JSON text όπως αποθηκεύτηκαν (χωρίς parse)."""
+        where, args = _filters(patient_id, since, until)
+        cur = self.conn.execute(f"SELECT snapshot FROM sessions{where} ORDER BY patient_id, session_dt", args)
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                return
+            for (s,) in rows:
+                yield s
+
+    def patients(self) -> list:
+        return [p for (p,) in self.conn.execute("SELECT DISTINCT patient_id FROM sessions ORDER BY patient_id")]
+
+    def count(self, patient_id: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None) -> int:
+        where, args = _filters(patient_id, since, until)
+        return self.conn.execute(f"SELECT COUNT(*) FROM sessions{where}", args).fetchone()[0]
+
+
+class BackgroundWriter:
+    """Queue + daemon thread που γράφει snapshots στο store σε batches.
+
+    submit() επιστρέφει αμέσως· flush() περιμένει να αδειάσει η ουρά.
+    """
+
+    def __init__(self, store: SessionStore, max_batch: int = 500):
+        self.store = store
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="uf-store-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot: Mapping) -> None:
+        self._queue.put(dict(snapshot))
+
+    def flush(self) -> None:
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                self.store.append_many(s for s in batch if s is not None)
+            except Exception:  # noqa: BLE001 — ο writer πρέπει να επιζεί ενός κακού batch
+                log.exception("failed to write %d snapshot(s)", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
@@ -0,0 +1,101 @@
+"""Joint τ/ω plan και προσομοίωση του ισοζυγίου υγρών για την επόμενη εβδομάδα.
+
+Ο ρυθμός φράσσεται από το hypotension solve (r ≤ r_max_dyn για το τ), ενώ ο στόχος
+αφαίρεσης ορίζεται ώστε η επόμενη συνεδρία να ξεκινά με P_overhydration ≤ ω: το
+overhydration logit είναι γραμμικό στο OH_L, άρα το ω αντιστρέφεται σε μέγιστη
+περίσσεια υγρών πριν από συνεδρία. Η περίσσεια E (L πάνω από τον στόχο) εξελίσσεται
+
+    E_post = E_pre + intake − rinseback − iv − UF,    E_pre(επόμενη) = E_post + idwg/ημέρα × κενό
+
+ξεκινώντας από E_pre = carry-over UF_deficit_L + idwg. Όλα τα υποψήφια προγράμματα
+(pattern κενών × διάρκεια) προσομοιώνονται μαζί ως arrays (P, D), ένα βήμα ανά συνεδρία.
+Το residual_urine_mLd μπαίνει μέσω του overhydration logit (και στο idwg που μετρήθηκε).
+"""
+from typing import Mapping, Optional
+
+import numpy as np
+
+from uf_model import DEFAULT_COEFFICIENTS, PLAN_INPUTS, Coefficients, logit, plan_batch
+
+# Κενά (ημέρες) μετά από κάθε συνεδρία της εβδομάδας, ξεκινώντας από την τρέχουσα
+PATTERNS = {"3×/εβδ.": (2, 2, 3), "4×/εβδ.": (2, 2, 2, 1)}
+DURATIONS = np.arange(180.0, 365.0, 5.0)
+
+
+def simulate_week(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS, patterns: Optional[Mapping] = None,
+                  durations=None, gap_days: float = 2.0, carry_L: float = 0.0) -> dict:
+    """Forward fluid model for every pattern × duration (same duration for every session).
+
+    `inputs` are one patient's plan inputs (scalars); `idwg` is the gain over the
+    last `gap_days`. Per-session outputs have shape (P, D, S) with NaN after the
+    pattern's last session; P_next_over is the risk at the following pre-session state.
+    """
+    patterns = PATTERNS if patterns is None else patterns
+    durations = DURATIONS if durations is None else np.asarray(durations, dtype=np.float64)
+    names = list(patterns)
+    n_sessions = np.array([len(g) for g in patterns.values()])
+    gaps = np.zeros((len(names), n_sessions.max()))
+    for p, g in enumerate(patterns.values()):
+        gaps[p, :len(g)] = g
+
+    x = {k: float(inputs.get(k, v)) for k, v in PLAN_INPUTS.items()}
+    now = plan_batch(x, coef)
+    # Οι κλίσεις TMP/VP (mmHg/h) της τρέχουσας συνεδρίας μένουν ίδιες για κάθε διάρκεια
+    grid = plan_batch({**x, "duration_min": durations}, coef,
+                      {"tmp_slope": now["tmp_slope"], "vp_trend": now["vp_trend"]})
+    r_max = np.broadcast_to(grid["r_max_dyn"], durations.shape)
+    cap = r_max * durations / 60.0 * x["weight"] / 1000.0
+
+    per_day = x["idwg"] / gap_days
+    fixed = x["intake_L"] - x["rinseback_L"] - x["iv_L"]
+    e0 = carry_L + x["idwg"]
+    x0 = float(now["x_over"])
+    # Μέγιστη περίσσεια πριν από συνεδρία με P_over ≤ ω
+    e_max = e0 + (logit(coef.omega_target / 100.0) - x0) / coef.b_OH if coef.b_OH > 0 else np.inf
+
+    shape = (len(names), durations.size, gaps.shape[1])
+    out = {k: np.full(shape, np.nan) for k in ("E_pre", "UF_L", "rate", "UF_deficit_L", "E_next")}
+    e = np.full(shape[:2], e0)
+    for j in range(shape[2]):
+        active = (j < n_sessions)[:, None]
+        gain = per_day * gaps[:, j, None]
+        needed = e + fixed
+        # Πέρα από το needed, αφαίρεση ώστε E_pre της επόμενης ≤ e_max (μέχρι το cap του τ)
+        uf = np.clip(needed - np.minimum(0.0, e_max - gain), 0.0, cap)
+        e_next = needed - uf + gain
+        for k, v in (("E_pre", e), ("UF_L", uf), ("rate", uf * 1000.0 / x["weight"] / (durations / 60.0)),
+                     ("UF_deficit_L", np.maximum(0.0, needed - uf)), ("E_next", e_next)):
+            out[k][..., j] = np.where(active, v, np.nan)
+        e = np.where(active, e_next, e)
+
+    with np.errstate(over="ignore"):
+        out["P_next_over"] = 1.0 / (1.0 + np.exp(-(x0 + coef.b_OH * (out["E_next"] - e0))))
+    out["max_P_over"] = np.nanmax(out["P_next_over"], axis=2)
+    out["max_rate"] = np.nanmax(out["rate"], axis=2)
+    out["week_minutes"] = n_sessions[:, None] * durations
+    out["feasible"] = out["max_P_over"] * 100.0 <= coef.omega_target
+    out.update(patterns=names, n_sessions=n_sessions, durations=durations, r_max_dyn=r_max)
+    return out
+
+
+def optimize_plan(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS, patterns: Optional[Mapping] = None,
+                  durations=None, gap_days: float = 2.0, carry_L: float = 0.0) -> dict:
+    """simulate_week() + the best candidate.
+
+    Among candidates that keep every following P_over ≤ ω: fewest weekly minutes,
+    then fewer sessions, then lowest peak rate. If none does: lowest peak P_over.
+    """
+    sim = simulate_week(inputs, coef, patterns, durations, gap_days, carry_L)
+    n = np.broadcast_to(sim["n_sessions"][:, None], sim["week_minutes"].shape)
+    primary = np.where(sim["feasible"], 0.0, sim["max_P_over"])
+    order = np.lexsort((sim["max_rate"].ravel(), n.ravel(), sim["week_minutes"].ravel(), primary.ravel()))
+    p, d = np.unravel_index(order[0], primary.shape)
+    sim["best"] = {
+        "pattern": sim["patterns"][p], "n_sessions": int(sim["n_sessions"][p]),
+        "duration_min": float(sim["durations"][d]), "rate": float(sim["rate"][p, d, 0]),
+        "r_max_dyn": float(sim["r_max_dyn"][d]), "UF_L": float(sim["UF_L"][p, d, 0]),
+        "max_P_over": float(sim["max_P_over"][p, d]), "week_minutes": float(sim["week_minutes"][p, d]),
+        "feasible": bool(sim["feasible"][p, d]),
+    }
+    sim["best_index"] = (int(p), int(d))
+    return sim
@@ -0,0 +1,83 @@
+"""Monte Carlo uncertainty bands για τα r_max_dyn, UF_recommended_L και P_overhydration_risk.
+
+Οι συντελεστές γ/β δειγματοληπτούνται από πολυμεταβλητή κανονική με τη
+covariance του uf_fit (report["models"][...]["covariance"]) γύρω από τις
+τρέχουσες τιμές, και τα αβέβαια inputs (OH_L, IDWG, ΔP_atm) από κανονικές με
+δοσμένο SD. Όλα τα δείγματα περνούν μαζί από ένα plan_batch() (inverse solve +
+overhydration logistic), με seeded RNG ώστε τα bands να είναι αναπαραγώγιμα.
+"""
+from dataclasses import replace
+from typing import Mapping, Optional, Sequence
+
+import numpy as np
+
+from uf_model import (
+    DEFAULT_COEFFICIENTS, HYPOTENSION_TERMS, OVERHYDRATION_TERMS, PLAN_INPUTS, Coefficients, as_columns,
+    hypotension_features, overhydration_features, plan_batch,
+)
+
+# SD των αβέβαιων inputs (ίδιες μονάδες με τα widgets)
+INPUT_SD = {"OH_L": 0.5, "idwg": 0.2, "dP_atm_10hPa": 0.5}
+BAND_OUTPUTS = ("r_max_dyn", "UF_recommended_L", "P_over")
+PERCENTILES = (5.0, 50.0, 95.0)
+
+
+def active_terms(inputs: Mapping, sampled: Sequence[str], coef: Coefficients = DEFAULT_COEFFICIENTS) -> set:
+    """Coefficient names whose feature is non-zero for this patient (or depends on a sampled input).
+
+    Οι υπόλοιποι όροι πολλαπλασιάζονται με 0, άρα δεν χρειάζονται δείγματα· το
+    marginal ενός υποσυνόλου της κανονικής είναι ακριβώς ο αντίστοιχος υποπίνακας.
+    """
+    # Δύο γραμμές: οι τιμές του ασθενή και τα sampled inputs μετατοπισμένα κατά 1
+    shifted = {k: [inputs.get(k, PLAN_INPUTS[k]), inputs.get(k, PLAN_INPUTS[k]) + 1.0] for k in sampled}
+    x = as_columns({**inputs, **shifted})
+    x = {k: np.broadcast_to(v, (2,)) for k, v in x.items()}
+    plan = plan_batch(x, coef)
+    hypo = hypotension_features(x, plan["tmp_slope"], plan["vp_trend"], 1.0)
+    over = overhydration_features(x)
+    active = {t for t, col in zip(HYPOTENSION_TERMS, hypo.T) if np.any(col != 0)}
+    active |= {t for t, col in zip(OVERHYDRATION_TERMS, over.T) if np.any(col != 0)}
+    return active
+
+
+def coefficient_draws(coef: Coefficients, models: Mapping, n: int, rng: np.random.Generator,
+                      active: Optional[set] = None) -> dict:
+    """{field: n draws} for the terms of every fitted model in `models` (uf_fit report["models"]).
+
+    With `active`, only those terms are sampled (marginal of the joint normal).
+    """
+    draws = {}
+    for model in models.values():
+        idx = [i for i, t in enumerate(model["terms"]) if active is None or t in active]
+        if not idx:
+            continue
+        terms = [model["terms"][i] for i in idx]
+        mean = np.array([getattr(coef, t) for t in terms], dtype=np.float64)
+        cov = np.asarray(model["covariance"], dtype=np.float64)[np.ix_(idx, idx)]
+        chol = np.linalg.cholesky(cov)
+        sample = rng.standard_normal((n, len(terms))) @ chol.T + mean
+        draws.update({t: sample[:, i] for i, t in enumerate(terms)})
+    return draws
+
+
+def monte_carlo_plan(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS, n: int = 100_000,
+                     seed: int = 0, models: Optional[Mapping] = None, input_sd: Optional[Mapping] = None,
+                     percentiles: Sequence[float] = PERCENTILES) -> dict:
+    """Percentile bands of BAND_OUTPUTS for one patient's plan inputs (scalars).
+
+    Returns {"percentiles": [...], "n": n, output: array of len(percentiles)}.
+    """
+    rng = np.random.default_rng(seed)
+    sd = {k: s for k, s in (INPUT_SD if input_sd is None else input_sd).items() if s > 0}
+    draws = dict(inputs)
+    for k, s in sd.items():
+        draws[k] = rng.normal(float(inputs.get(k, PLAN_INPUTS[k])), s, size=n)
+    active = active_terms(inputs, list(sd), coef) if models else None
+    mc_coef = replace(coef, **coefficient_draws(coef, models or {}, n, rng, active))
+    plan = plan_batch(draws, mc_coef)
+
+    q = np.asarray(percentiles, dtype=np.float64)
+    bands = {"percentiles": q.tolist(), "n": n}
+    for k in BAND_OUTPUTS:
+        bands[k] = np.percentile(np.broadcast_to(plan[k], (n,)), q)
+    return bands
@@ -0,0 +1,119 @@
+"""Ward board: live plan metrics για όλες τις chairs της βάρδιας.
+
+Τα inputs κρατιούνται columnar (ένα float64 array ανά πεδίο του PLAN_INPUTS, μία
+θέση ανά chair) μαζί με τα τελευταία outputs. Μια αλλαγή σε inputs ασθενή
+σημαδεύει μόνο τη δική του γραμμή ως dirty· μια αλλαγή συντελεστών σημαδεύει
+όλες. Το refresh() περνά μόνο τις dirty γραμμές από ένα plan_batch() (ή όλο τον
+πίνακα μαζί όταν άλλαξαν οι συντελεστές) και ενημερώνει τα outputs επί τόπου.
+"""
+from typing import Mapping, Optional
+
+import numpy as np
+
+from uf_model import DEFAULT_COEFFICIENTS, PLAN_INPUTS, Coefficients, alert_strings, plan_batch
+
+BOARD_OUTPUTS = ("r_max_dyn", "UF_recommended_L", "UF_deficit_L", "P_over", "extra_minutes_over", "alerts")
+# Τα inputs που αλλάζουν συνήθως στη διάρκεια της βάρδιας (editable στο Ward tab)
+EDIT_INPUTS = (
+    "weight", "duration_min", "idwg", "intake_L", "OH_L", "sbp_pre", "sbp_post",
+    "tmp_start", "tmp_end", "vp_start", "vp_end",
+)
+
+
+class WardBoard:
+    """Chairs × plan inputs/outputs με dirty-row tracking."""
+
+    def __init__(self, roster: Optional[Mapping] = None, coef: Coefficients = DEFAULT_COEFFICIENTS):
+        roster = roster or {}
+        self.coef = coef
+        self.chairs = list(roster)
+        self.index = {chair: i for i, chair in enumerate(self.chairs)}
+        self.patient_ids = [str(roster[c].get("patient_id", "")) for c in self.chairs]
+        self.inputs = {
+            k: np.array([float(roster[c].get(k, default)) for c in self.chairs], dtype=np.float64)
+            for k, default in PLAN_INPUTS.items()
+        }
+        self.outputs = {k: np.zeros(len(self.chairs)) for k in BOARD_OUTPUTS}
+        self.alert_text = [""] * len(self.chairs)
+        self.dirty = np.ones(len(self.chairs), dtype=bool)
+        self.last_recomputed = 0
+
+    def __len__(self) -> int:
+        return len(self.chairs)
+
+    def add_chair(self, chair: str, patient_id: str = "", **inputs) -> int:
+        if chair in self.index:
+            raise ValueError(f"chair {chair!r} υπάρχει ήδη")
+        i = self.index[chair] = len(self.chairs)
+        self.chairs.append(chair)
+        self.patient_ids.append(patient_id)
+        for k, default in PLAN_INPUTS.items():
+            self.inputs[k] = np.append(self.inputs[k], float(inputs.get(k, default)))
+        for k in BOARD_OUTPUTS:
+            self.outputs[k] = np.append(self.outputs[k], 0.0)
+        self.alert_text.append("")
+        self.dirty = np.append(self.dirty, True)
+        return i
+
+    def update(self, chair: str, patient_id: Optional[str] = None, **changes) -> bool:
+        """Αλλαγή inputs μιας chair· dirty μόνο αν άλλαξε κάποια τιμή."""
+        i = self.index[chair]
+        if patient_id is not None:
+            self.patient_ids[i] = patient_id
+        changed = False
+        for k, v in changes.items():
+            if k not in self.inputs:
+                raise ValueError(f"άγνωστο input: {k}")
+            if self.inputs[k][i] != v:
+                self.inputs[k][i] = v
+                changed = True
+        self.dirty[i] |= changed
+        return changed
+
+    def update_columns(self, columns: Mapping) -> int:
+        """Vectorized update από ολόκληρες στήλες (π.χ. το data_editor)· NaN = χωρίς αλλαγή.
+
+        Returns the number of chairs that became dirty.
+        """
+        before = int(self.dirty.sum())
+        for k, values in columns.items():
+            if k not in self.inputs:
+                raise ValueError(f"άγνωστο input: {k}")
+            new = np.asarray(values, dtype=np.float64)
+            cur = self.inputs[k]
+            changed = (new != cur) & ~np.isnan(new)
+            if changed.any():
+                cur[changed] = new[changed]
+                self.dirty |= changed
+        return int(self.dirty.sum()) - before
+
+    def set_coefficients(self, coef: Coefficients) -> None:
+        if coef != self.coef:
+            self.coef = coef
+            self.dirty[:] = True
+
+    def refresh(self) -> int:
+        """Recompute the dirty rows (one plan_batch call); returns how many."""
+        rows = np.flatnonzero(self.dirty)
+        self.last_recomputed = rows.size
+        if rows.size == 0:
+            return 0
+        # Όλες dirty (π.χ. νέοι συντελεστές): ένα pass πάνω στα arrays χωρίς αντιγραφή
+        cols = self.inputs if rows.size == len(self.chairs) else {k: v[rows] for k, v in self.inputs.items()}
+        out = plan_batch(cols, self.coef)
+        for k in BOARD_OUTPUTS:
+            self.outputs[k][rows] = out[k]
+        for i, text in zip(rows.tolist(), alert_strings(out, self.coef)):
+            self.alert_text[i] = text
+        self.dirty[:] = False
+        return self.last_recomputed
+
+    def table(self) -> dict:
+        """Columns για st.dataframe: chair, patient_id, τα BOARD_OUTPUTS (P_over σε %) και alerts."""
+        self.refresh()
+        return {
+            "chair": self.chairs, "patient_id": self.patient_ids,
+            "r_max_dyn": self.outputs["r_max_dyn"], "UF_recommended_L": self.outputs["UF_recommended_L"],
+            "UF_deficit_L": self.outputs["UF_deficit_L"], "P_over_%": self.outputs["P_over"] * 100.0,
+            "extra_min": self.outputs["extra_minutes_over"], "alerts": self.alert_text,
+        }
@@ -0,0 +1,49 @@
+"""What-if sensitivity surface του Plan για έναν ασθενή.
+
+Ένα plan_batch() πάνω σε πλέγμα τ × διάρκεια × r_max (άνω όριο UF rate) ×
+guards on/off: τα inputs του ασθενή είναι scalars και οι άξονες του πλέγματος
+μπαίνουν ως broadcastable arrays στα inputs/συντελεστές. Το UI κρατά το
+αποτέλεσμα στο cache και απλώς κόβει slices όταν αλλάζει ένα slider.
+"""
+from dataclasses import replace
+from typing import Mapping, Optional, Sequence
+
+import numpy as np
+
+from uf_model import DEFAULT_COEFFICIENTS, Coefficients, plan_batch
+
+# Default πλέγμα: όλο το εύρος του τ στο sidebar × 2–7 ώρες
+TAU_GRID = np.linspace(1.0, 80.0, 100)
+DURATION_GRID = np.arange(120.0, 420.0, 5.0)
+
+SURFACE_OUTPUTS = (
+    "guard_hit", "r_max_dyn", "UF_cap_L", "UF_recommended_L", "UF_deficit_L", "P_over", "extra_minutes_over",
+)
+
+
+def sensitivity_surface(inputs: Mapping, coef: Coefficients = DEFAULT_COEFFICIENTS,
+                        tau: Optional[Sequence[float]] = None,
+                        duration_min: Optional[Sequence[float]] = None,
+                        rmax: Optional[Sequence[float]] = None) -> dict:
+    """Plan outputs on the grid tau × duration_min × rmax × guard (on, off).
+
+    `inputs` are one patient's plan inputs (scalars). Every output in
+    SURFACE_OUTPUTS has shape (len(tau), len(duration_min), len(rmax), 2);
+    guard index 0 applies the safety multiplier as the app does, index 1 ignores it.
+    """
+    tau = TAU_GRID if tau is None else np.asarray(tau, dtype=np.float64)
+    duration_min = DURATION_GRID if duration_min is None else np.asarray(duration_min, dtype=np.float64)
+    rmax = np.array([coef.rmax], dtype=np.float64) if rmax is None else np.asarray(rmax, dtype=np.float64)
+
+    grid_coef = replace(
+        coef,
+        tau_default=tau[:, None, None, None],
+        rmax=rmax[None, None, :, None],
+        safety_mult=np.array([coef.safety_mult, 1.0])[None, None, None, :],
+    )
+    plan = plan_batch({**inputs, "duration_min": duration_min[None, :, None, None]}, grid_coef)
+
+    shape = (tau.size, duration_min.size, rmax.size, 2)
+    surface = {k: np.broadcast_to(plan[k], shape) for k in SURFACE_OUTPUTS}
+    surface.update(tau=tau, duration_min=duration_min, rmax=rmax)
+    return surface